@@ -0,0 +1,335 @@
+"""Copy-path load test: synthetic masters and slaves, stub gateways, latency report.
+
+Seeds a scratch Postgres schema (all migrations) with M telegram masters
+(auto-execute), C copysets per master and N slave accounts split between MT5 and
+cTrader, starts stand-ins for the MT5 gateway (same HTTP API as windows/mt5-gateway,
+stdlib server, one per --gateways) and the cTrader executor, then drives synthetic
+signals at --rate per second through the Telegram parser, persists them as the
+ingest does and runs the real worker.jobs.execute_trade_intent on --workers
+threads (fan-out inline, EXEC_SHARDS=0). Latency and error rates of the stubs are
+injectable. The report gives throughput, per-stage latency from the timings stored
+on each intent, signal -> first order / last ack percentiles and the per-order
+gateway latency from execution_logs. Exit status 1 when an intent did not finish
+or signal -> last ack p99 exceeds --max-p99-ms, so it can gate a deploy.
+
+Needs Postgres and Redis (POSTGRES_* / REDIS_URL as for the services); the scratch
+schema is dropped at the end unless --keep. Use a Redis database of its own: the
+account states of the bench slaves land in its hash (removed at the end) and
+events go to EVENTS_CHANNEL=dupli:events:bench. From the compose stack:
+
+    docker compose run --rm -v "$PWD:/src" -e REDIS_URL=redis://redis:6379/15 worker \\
+        python /src/bench/copy_load.py --slaves 5000 --signals 200 --rate 2 --gateway-ms 20 --error-rate 0.01
+"""
+import argparse, json, os, random, statistics, sys, threading, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "worker"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "telegram"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "common"))
+
+# symbol -> (price, SL distance): risk sizing needs both
+SYMBOLS = {"XAUUSD": (2350.0, 8.0), "EURUSD": (1.085, 0.003), "US30": (39000.0, 120.0), "NAS100": (18000.0, 60.0)}
+
+SEED_SQL = [
+    """INSERT INTO prop_firms (id, name, weekend_trading) VALUES (gen_random_uuid(), 'bench-prop', true)""",
+    """INSERT INTO risk_profiles (id, name, method, risk_percent, fixed_lot, max_lot)
+       VALUES (gen_random_uuid(), 'bench-risk', 'risk_per_trade', 0.5, 0.01, 5.0)""",
+    """INSERT INTO masters (id, name, source, is_active, auto_execute)
+       SELECT gen_random_uuid(), 'bench-master-' || g, 'telegram', true, true FROM generate_series(1, %(masters)s) g""",
+    """INSERT INTO copy_sets (id, name, master_id, is_active)
+       SELECT gen_random_uuid(), 'bench-cs-' || g, m.id, true FROM masters m, generate_series(1, %(copysets)s) g""",
+    # slave i: MT5 login 9000000+i unless it falls in the cTrader share
+    """INSERT INTO accounts (id, name, platform, prop_firm_id, risk_profile_id, external_id)
+       SELECT gen_random_uuid(), 'bench-slave-' || g,
+              CASE WHEN g %% 1000 < %(ctrader_permille)s THEN 'CTRADER' ELSE 'MT5' END,
+              (SELECT id FROM prop_firms), (SELECT id FROM risk_profiles), (9000000 + g)::text
+       FROM generate_series(0, %(slaves)s - 1) g""",
+    # every slave follows one copyset (round robin), so each master fans out to slaves / masters
+    """WITH cs AS (SELECT id, row_number() OVER (ORDER BY id) - 1 AS n, count(*) OVER () AS total FROM copy_sets),
+            acc AS (SELECT id, row_number() OVER (ORDER BY external_id) - 1 AS n FROM accounts)
+       INSERT INTO copy_set_slaves (id, copy_set_id, account_id)
+       SELECT gen_random_uuid(), cs.id, acc.id FROM acc JOIN cs ON cs.n = acc.n %% cs.total""",
+]
+# optional: one non-blocking rule set on the prop, so the rules stage is exercised
+RULES_SQL = """INSERT INTO rule_sets (id, name, prop_firm_id, rules, is_active)
+               VALUES (gen_random_uuid(), 'bench-rules', (SELECT id FROM prop_firms), %s, true)"""
+
+def is_ctrader(i: int, ctrader_share: float) -> bool:
+    return i % 1000 < int(ctrader_share * 1000)
+
+class StubGateway(ThreadingHTTPServer):
+    """MT5 gateway stand-in: POST /v1/orders, /v1/orders:batch, GET /v1/accounts."""
+    daemon_threads = True
+
+    def __init__(self, logins: list[str], latency_ms: float, jitter_ms: float, per_order_ms: float,
+                 error_rate: float, http_error_rate: float):
+        super().__init__(("127.0.0.1", 0), _GatewayHandler)
+        self.logins, self.latency_ms, self.jitter_ms, self.per_order_ms = logins, latency_ms, jitter_ms, per_order_ms
+        self.error_rate, self.http_error_rate = error_rate, http_error_rate
+        self.requests = self.orders = self.http_errors = 0
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+        threading.Thread(target=self.serve_forever, name="stub-gateway", daemon=True).start()
+
+    def delay(self, orders: int) -> float:
+        # fixed part + exponential tail, plus the per-order work of a batch
+        return (self.latency_ms + (random.expovariate(1 / self.jitter_ms) if self.jitter_ms else 0.0)
+                + self.per_order_ms * orders) / 1000.0
+
+    def reply(self, order: dict) -> dict:
+        if random.random() < self.error_rate:
+            return {"ok": False, "error": "stub reject", "ts": time.time()}
+        return {"ok": True, "ticket": random.randrange(10 ** 8), "ts": time.time()}
+
+class _GatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, as waitress
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != "/v1/accounts":
+            return self._send(404, {"error": "not found"})
+        now = time.time()
+        self._send(200, {"accounts": [{"account_external_id": login, "equity": 100000.0, "balance": 100000.0,
+                                       "free_margin": 90000.0, "positions": [], "day_start_equity": 100000.0,
+                                       "spreads": {}, "ts": now} for login in self.server.logins], "ts": now})
+
+    def do_POST(self):
+        gw = self.server
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        orders = body.get("orders") if self.path == "/v1/orders:batch" else [body]
+        gw.requests += 1
+        gw.orders += len(orders or [])
+        time.sleep(gw.delay(len(orders or [])))
+        if random.random() < gw.http_error_rate:
+            gw.http_errors += 1
+            return self._send(503, {"error": "stub unavailable"})
+        if self.path == "/v1/orders:batch":
+            self._send(200, {"ok": True, "results": [{"account_external_id": o.get("account_external_id"), **gw.reply(o)}
+                                                     for o in orders], "ts": time.time()})
+        elif self.path == "/v1/orders":
+            self._send(200, gw.reply(body))
+        else:
+            self._send(404, {"error": "not found"})
+
+def ctrader_stub(latency_ms: float, jitter_ms: float, error_rate: float):
+    """Stand-in for worker.executors.exec_ctrader (in-process in the worker)."""
+    from worker.executors import ExecResult
+    def exec_ctrader(account_external_id: str, intent: dict) -> ExecResult:
+        time.sleep((latency_ms + (random.expovariate(1 / jitter_ms) if jitter_ms else 0.0)) / 1000.0)
+        if random.random() < error_rate:
+            return ExecResult(ok=False, message="stub reject")
+        return ExecResult(ok=True, message=json.dumps({"ok": True, "positionId": random.randrange(10 ** 8)}))
+    return exec_ctrader
+
+def signal_text(rnd: random.Random) -> str:
+    sym = rnd.choice(list(SYMBOLS))
+    px, dist = SYMBOLS[sym]
+    px *= rnd.uniform(0.99, 1.01)
+    side = rnd.choice(["BUY", "SELL"])
+    sign = -1 if side == "BUY" else 1
+    return f"{sym} {side} NOW {px:.5g}\nSL {px + sign * dist:.5g}\nTP1 {px - sign * dist:.5g} TP2 {px - 2 * sign * dist:.5g}"
+
+def pct(xs: list, p: float) -> float:
+    return xs[min(len(xs) - 1, int(len(xs) * p))] if xs else float("nan")
+
+def row(name: str, xs: list) -> str:
+    xs = sorted(xs)
+    if not xs:
+        return f"{name:<28} {'-':>8}"
+    return (f"{name:<28} {statistics.median(xs):>8.1f} {pct(xs, 0.95):>8.1f} {pct(xs, 0.99):>8.1f} "
+            f"{xs[-1]:>8.1f} {len(xs):>8}")
+
+def seed(engine, schema: str, args) -> None:
+    from dupli_core.migrate import autocommit_connection
+    t0 = time.perf_counter()
+    with autocommit_connection(engine, schema) as conn:
+        params = {**vars(args), "ctrader_permille": int(args.ctrader_share * 1000)}
+        for sql in SEED_SQL:
+            conn.execute(sql, params)
+        if args.rules:
+            conn.execute(RULES_SQL, (json.dumps({"symbol_whitelist": list(SYMBOLS), "max_open_trades": 50,
+                                                 "max_lot_per_symbol": {"*": 5.0}}),))
+        conn.execute("ANALYZE prop_firms, risk_profiles, masters, copy_sets, accounts, copy_set_slaves, rule_sets")
+    print(f"Seeded {args.masters} masters x {args.copysets} copysets, {args.slaves} slaves "
+          f"({args.ctrader_share:.0%} cTrader) in {time.perf_counter() - t0:.1f} s", flush=True)
+
+def persist(masters: list, text: str, timings: dict, rnd: random.Random):
+    """Parser -> TradeIntent row, as telegram_ingest.run.persist_signal (minus Redis)."""
+    from telegram_ingest.parser import parse
+    from worker.db import SessionLocal
+    from dupli_core.models import TradeIntent
+    ps = parse(text)
+    timings["parsed"] = time.time()
+    if ps is None:
+        raise RuntimeError(f"parser rejected the synthetic signal {text!r}")
+    db = SessionLocal()
+    try:
+        ti = TradeIntent(id=uuid.uuid4(), master_id=rnd.choice(masters), symbol=ps.symbol, side=ps.side,
+                         order_type=ps.order_type, entry=ps.entry, zone_low=ps.zone_low, zone_high=ps.zone_high,
+                         sl=ps.sl, tps=ps.tps_json, raw_text=text, status="QUEUED", timings=json.dumps(timings),
+                         action="OPEN")
+        db.add(ti); db.commit()
+        timings["persisted"] = timings["enqueued"] = time.time()
+        return str(ti.id), ti.created_at.isoformat()
+    finally:
+        db.close()
+
+def drive(args, masters: list) -> tuple[float, list]:
+    """Offer args.signals signals at args.rate/s; returns (seconds, execute results)."""
+    from worker.jobs import execute_trade_intent
+    rnd = random.Random(args.seed)
+    ingest = ThreadPoolExecutor(args.ingest_threads, thread_name_prefix="ingest")
+    workers = ThreadPoolExecutor(args.workers, thread_name_prefix="worker")
+    results, lock = [], threading.Lock()
+
+    def handle(text: str, received: float) -> None:
+        timings = {"received": received}
+        intent_id, created_at = persist(masters, text, timings, rnd)
+        fut = workers.submit(execute_trade_intent, intent_id, timings, created_at)
+        with lock:
+            results.append(fut)
+
+    t0 = time.time()
+    pending = []
+    for i in range(args.signals):
+        lag = t0 + i / args.rate - time.time()
+        if lag > 0:
+            time.sleep(lag)
+        pending.append(ingest.submit(handle, signal_text(rnd), time.time()))
+    for f in pending:
+        f.result()
+    out = [f.result() for f in results]
+    took = time.time() - t0
+    ingest.shutdown(); workers.shutdown()
+    return took, out
+
+def report(engine, schema: str, args, took: float, results: list, gateways: list) -> bool:
+    from dupli_core.metrics import STAGES
+    from dupli_core.migrate import autocommit_connection
+    with autocommit_connection(engine, schema) as conn:
+        intents = conn.execute("SELECT status, timings FROM trade_intents").fetchall()
+        logs = conn.execute("SELECT status, count(*) FROM execution_logs GROUP BY status").fetchall()
+        order_ms = [r[0] for r in conn.execute("SELECT latency_ms FROM execution_logs WHERE latency_ms IS NOT NULL")]
+    by_status: dict = {}
+    stages = {s: [] for s in STAGES[1:]}
+    first_order, last_ack = [], []
+    for status, raw in intents:
+        by_status[status] = by_status.get(status, 0) + 1
+        t = json.loads(raw) if raw else {}
+        prev = None
+        for s in STAGES:
+            if s not in t:
+                continue
+            if prev is not None:
+                stages[s].append((t[s] - prev) * 1000)
+            prev = t[s]
+        if "received" in t and "first_order" in t:
+            first_order.append((t["first_order"] - t["received"]) * 1000)
+        if "received" in t and "last_ack" in t:
+            last_ack.append((t["last_ack"] - t["received"]) * 1000)
+    logs = dict(logs)
+    orders = logs.get("OK", 0) + logs.get("ERROR", 0)
+    errors = [r for r in results if isinstance(r, dict) and "error" in r]
+
+    print(f"\n{args.signals} signals offered at {args.rate:g}/s, sent in {took:.1f} s "
+          f"({args.signals / took:.2f}/s incl. drain); intents {by_status}")
+    print(f"orders {orders} ({logs.get('ERROR', 0)} errors, {logs.get('SKIPPED', 0)} skipped): "
+          f"{orders / took:.0f} orders/s")
+    for gw in gateways:
+        print(f"  gateway {gw.url}: {gw.requests} requests, {gw.orders} orders, {gw.http_errors} HTTP 503")
+    print(f"\n{'latency ms':<28} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'n':>8}")
+    for s, xs in stages.items():
+        if xs:
+            print(row(f"  stage {s}", xs))
+    print(row("signal -> first order", first_order))
+    print(row("signal -> last ack", last_ack))
+    print(row("order send -> ack", order_ms))
+
+    ok = not errors and by_status.get("DONE", 0) == args.signals
+    if not ok:
+        print(f"FAIL: {args.signals - by_status.get('DONE', 0)} intents not DONE {errors[:3]}")
+    p99 = pct(sorted(last_ack), 0.99)
+    if args.max_p99_ms and not p99 <= args.max_p99_ms:
+        print(f"FAIL: signal -> last ack p99 {p99:.1f} ms > {args.max_p99_ms:g} ms")
+        ok = False
+    return ok
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--masters", type=int, default=5)
+    ap.add_argument("--copysets", type=int, default=2, help="copysets per master")
+    ap.add_argument("--slaves", type=int, default=1000, help="slave accounts, spread over all copysets")
+    ap.add_argument("--ctrader-share", type=float, default=0.1, help="fraction of slaves on cTrader")
+    ap.add_argument("--rules", action="store_true", help="add a (non-blocking) prop rule set")
+    ap.add_argument("--signals", type=int, default=100)
+    ap.add_argument("--rate", type=float, default=2.0, help="signals per second offered")
+    ap.add_argument("--workers", type=int, default=1, help="threads running execute_trade_intent")
+    ap.add_argument("--ingest-threads", type=int, default=3)
+    ap.add_argument("--gateways", type=int, default=1, help="stub MT5 gateways (slaves assigned round robin)")
+    ap.add_argument("--gateway-ms", type=float, default=15.0, help="stub gateway latency per request")
+    ap.add_argument("--gateway-per-order-ms", type=float, default=0.2, help="extra latency per order in a batch")
+    ap.add_argument("--ctrader-ms", type=float, default=40.0, help="stub cTrader latency per order")
+    ap.add_argument("--jitter-ms", type=float, default=5.0, help="mean of the exponential latency tail")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of orders rejected")
+    ap.add_argument("--http-error-rate", type=float, default=0.0, help="fraction of gateway requests answered 503")
+    ap.add_argument("--max-p99-ms", type=float, default=0.0, help="fail when signal -> last ack p99 is above this")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--keep", action="store_true", help="keep the scratch schema")
+    args = ap.parse_args()
+    random.seed(args.seed)
+
+    # stub gateways first: the worker reads MT5_GATEWAY_URL / MT5_GATEWAY_MAP at import
+    logins = [[] for _ in range(args.gateways)]
+    for i in range(args.slaves):
+        if not is_ctrader(i, args.ctrader_share):
+            logins[i % args.gateways].append(str(9000000 + i))
+    gateways = [StubGateway(ls, args.gateway_ms, args.jitter_ms, args.gateway_per_order_ms,
+                            args.error_rate, args.http_error_rate) for ls in logins]
+    gw_map = {login: gw.url for gw, ls in zip(gateways, logins) for login in ls} if args.gateways > 1 else {}
+    schema = f"copy_load_{os.getpid()}"
+    os.environ.update({"MT5_GATEWAY_URL": gateways[0].url, "MT5_GATEWAY_MAP": json.dumps(gw_map),
+                       "MT5_STREAM_PORT": "0", "EXEC_SHARDS": "0", "PGOPTIONS": f"-c search_path={schema}"})
+    os.environ.setdefault("EVENTS_CHANNEL", "dupli:events:bench")
+    os.environ.setdefault("MT5_POOL_SIZE", str(max(16, args.gateways * 4)))
+
+    from worker import jobs
+    from worker.account_state import ACCOUNT_STATE_KEY, get_account_states, state_key
+    from worker.logwriter import close_log_writer
+    from worker.redisconn import get_redis
+    from dupli_core.db import get_engine
+    from dupli_core.migrate import autocommit_connection, migrate
+    jobs.exec_ctrader = ctrader_stub(args.ctrader_ms, args.jitter_ms, args.error_rate)
+
+    engine = get_engine()
+    with autocommit_connection(engine) as conn:
+        conn.execute(f"CREATE SCHEMA {schema}")
+    try:
+        migrate(engine, search_path=schema)
+        seed(engine, schema, args)
+        with autocommit_connection(engine, schema) as conn:
+            masters = [r[0] for r in conn.execute("SELECT id FROM masters")]
+        jobs.warm_up()  # schema check, log writer, gateway sessions, account-state refresh
+        get_account_states().refresh()  # equity from the stub gateways before the first signal
+        took, results = drive(args, masters)
+        close_log_writer()  # flush the execution logs
+        return 0 if report(engine, schema, args, took, results, gateways) else 1
+    finally:
+        keys = [state_key("MT5", login) for ls in logins for login in ls]
+        for i in range(0, len(keys), 1000):
+            get_redis().hdel(ACCOUNT_STATE_KEY, *keys[i:i + 1000])
+        if not args.keep:
+            with autocommit_connection(engine) as conn:
+                conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Load test for the live event stream (GET /api/events).
+
+Opens N concurrent SSE listeners against a running API, publishes synthetic
+`intent` events on the events channel at a fixed rate and reports, per run,
+how many listeners got every event and the publish-to-receive latency. Each
+API process serves all of its listeners from one Redis subscription.
+
+    docker compose run --rm -v "$PWD:/src" api python /src/bench/events_bench.py \
+        --url http://api:8000 --listeners 500 --events 2000 --rate 200
+"""
+import argparse, asyncio, json, os, statistics, sys, time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "api"))
+from app.events import EVENTS_CHANNEL  # noqa: E402
+
+async def listen(url: str, groups: str, ready: asyncio.Event, connected: list,
+                 latencies: list, counts: list, idx: int) -> None:
+    u = urlsplit(url)
+    reader, writer = await asyncio.open_connection(u.hostname, u.port or 80)
+    writer.write((f"GET {u.path}?{u.query} HTTP/1.1\r\nHost: {u.netloc}\r\nAccept: text/event-stream\r\n"
+                  f"X-Auth-Request-Preferred-Username: bench-{idx}\r\nX-Auth-Request-Groups: {groups}\r\n\r\n").encode())
+    await writer.drain()
+    status = await reader.readline()
+    if b" 200 " not in status:
+        raise RuntimeError(f"listener {idx}: {status.decode().strip()}")
+    connected.append(idx)
+    if len(connected) == len(counts):
+        ready.set()
+    buf = b""
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            now = time.time()
+            # chunked transfer encoding: size lines are not "data:" lines, so skipping them is enough
+            *lines, buf = (buf + data).split(b"\n")
+            for line in lines:
+                if line.startswith(b"data: {\"type\""):
+                    ev = json.loads(line[6:])
+                    if ev.get("status") == "BENCH":
+                        latencies.append((now - ev["ts"]) * 1000)
+                        counts[idx] += 1
+    finally:
+        writer.close()
+
+async def publish(redis_url: str, n: int, rate: float, batch: int) -> float:
+    import redis.asyncio as aioredis
+    async with aioredis.from_url(redis_url) as r:
+        t0 = time.perf_counter()
+        for i in range(0, n, batch):
+            events = [{"type": "intent", "ts": time.time(), "id": f"bench-{j}", "status": "BENCH"}
+                      for j in range(i, min(i + batch, n))]
+            await r.publish(EVENTS_CHANNEL, json.dumps(events))
+            lag = t0 + (i + batch) / rate - time.perf_counter()
+            if lag > 0:
+                await asyncio.sleep(lag)
+        return time.perf_counter() - t0
+
+def pct(xs: list, p: float) -> float:
+    return xs[min(len(xs) - 1, int(len(xs) * p))] if xs else float("nan")
+
+async def run(args) -> None:
+    url = f"{args.url.rstrip('/')}/api/events?types=intent"
+    ready = asyncio.Event()
+    connected, latencies, counts = [], [], [0] * args.listeners
+    t0 = time.perf_counter()
+    listeners = [asyncio.create_task(listen(url, args.groups, ready, connected, latencies, counts, i))
+                 for i in range(args.listeners)]
+    try:
+        await asyncio.wait_for(ready.wait(), args.connect_timeout)
+    except asyncio.TimeoutError:
+        pass
+    for t in listeners:
+        if t.done() and t.exception():
+            raise t.exception()
+    print(f"{len(connected)}/{args.listeners} listeners connected in {time.perf_counter() - t0:.2f} s")
+    await asyncio.sleep(0.5)  # the hub subscribes to Redis on the first listener
+    took = await publish(args.redis_url, args.events, args.rate, args.batch)
+    deadline = time.monotonic() + args.drain_s
+    while sum(counts) < args.events * len(connected) and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    for t in listeners:
+        t.cancel()
+    await asyncio.gather(*listeners, return_exceptions=True)
+
+    lat = sorted(latencies)
+    complete = sum(1 for i in connected if counts[i] == args.events)
+    print(f"published {args.events} events in {took:.2f} s ({args.events / took:.0f}/s, batch {args.batch})")
+    print(f"delivered {len(lat)}/{args.events * len(connected)} "
+          f"({complete}/{len(connected)} listeners got every event)")
+    if lat:
+        print(f"latency ms  p50 {statistics.median(lat):.1f}  p95 {pct(lat, 0.95):.1f}  "
+              f"p99 {pct(lat, 0.99):.1f}  max {lat[-1]:.1f}")
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default="http://127.0.0.1:8000", help="API base URL (behind no auth proxy)")
+    ap.add_argument("--redis-url", default=os.getenv("REDIS_URL", "redis://redis:6379/0"))
+    ap.add_argument("--listeners", type=int, default=200)
+    ap.add_argument("--events", type=int, default=1000)
+    ap.add_argument("--rate", type=float, default=200.0, help="events per second")
+    ap.add_argument("--batch", type=int, default=1, help="events per published message")
+    ap.add_argument("--groups", default="viewer", help="roles sent as X-Auth-Request-Groups")
+    ap.add_argument("--connect-timeout", type=float, default=30.0)
+    ap.add_argument("--drain-s", type=float, default=10.0, help="wait this long for late events")
+    asyncio.run(run(ap.parse_args()))
+
+if __name__ == "__main__":
+    main()
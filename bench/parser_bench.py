@@ -0,0 +1,76 @@
+"""Signal parser benchmark.
+
+Runs telegram_ingest.parser over the message corpus in bench/corpus plus
+synthetic signals/chatter and reports messages per second and memory
+allocated per message (tracemalloc peak above baseline), split by signals
+and non-signals.
+
+    python bench/parser_bench.py --synthetic 20000 --chatter-ratio 0.8
+"""
+import argparse, os, random, sys, time, tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "telegram"))
+from telegram_ingest.parser import parse  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(__file__), "corpus", "telegram_messages.txt")
+SYMBOLS = ["XAUUSD", "EURUSD", "GBPJPY", "US30", "NAS100", "BTCUSD", "USDJPY"]
+CHATTER = ["Good morning traders!", "TP1 hit, move SL to BE", "Market update: waiting for CPI data",
+           "Another great week for the team 💰", "Close half now", "Who is online? London session starting soon"]
+
+def load_corpus(path: str) -> list[str]:
+    with open(path, encoding="utf-8") as f:
+        return [m.strip() for m in f.read().split("%%") if m.strip()]
+
+def synthetic(n: int, chatter_ratio: float, seed: int = 7) -> list[str]:
+    rnd = random.Random(seed)
+    out = []
+    for _ in range(n):
+        if rnd.random() < chatter_ratio:
+            out.append(rnd.choice(CHATTER) + " " + " ".join(rnd.choice(["gold", "pips", "today", "risk", "🔥"]) for _ in range(rnd.randint(3, 30))))
+            continue
+        px = rnd.uniform(1, 5000)
+        sym, side = rnd.choice(SYMBOLS), rnd.choice(["BUY", "SELL"])
+        otype = rnd.choice(["ZONE", "LIMIT", "NOW", "STOP"])
+        zone = f"{px:.2f}-{px * 1.001:.2f}" if otype == "ZONE" else ("" if otype == "NOW" else f"{px:.2f}")
+        tps = " ".join(f"TP{i} {px * (1 + i / 100):.2f}" for i in range(1, rnd.randint(2, 5)))
+        out.append(f"{sym} {side} {otype} {zone}\nSL {px * 0.99:.2f}\n{tps}")
+    return out
+
+def throughput(messages: list[str], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for m in messages:
+            parse(m)
+    return len(messages) * repeat / (time.perf_counter() - start)
+
+def alloc_per_message(messages: list[str]) -> float:
+    tracemalloc.start()
+    total = 0
+    for m in messages:
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        parse(m)
+        total += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return total / max(len(messages), 1)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--synthetic", type=int, default=20000)
+    ap.add_argument("--chatter-ratio", type=float, default=0.8)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    messages = load_corpus(CORPUS) + synthetic(args.synthetic, args.chatter_ratio)
+    signals = [m for m in messages if parse(m) is not None]
+    chatter = [m for m in messages if parse(m) is None]
+    print(f"corpus: {len(messages)} messages ({len(signals)} signals, {len(chatter)} non-signals)")
+    for name, msgs in (("all", messages), ("signals", signals), ("non-signals", chatter)):
+        if not msgs:
+            continue
+        rate = throughput(msgs, args.repeat)
+        print(f"{name:12s} {rate:12,.0f} msg/s   {1e6 / rate:7.2f} us/msg   "
+              f"{alloc_per_message(msgs[:5000]):8.1f} bytes allocated/msg (peak)")
+
+if __name__ == "__main__":
+    main()
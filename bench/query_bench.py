@@ -0,0 +1,171 @@
+"""Hot-query benchmark: plans and latencies before/after the index migration.
+
+Creates a scratch schema, applies the baseline migration (tables only), seeds
+synthetic masters / copysets / accounts / intents / execution logs, then runs the
+hot queries of the services (and a keyset vs OFFSET page of the intent list)
+with EXPLAIN ANALYZE and timed repeats. It then applies the remaining migrations
+(indexes, monthly partitions), re-analyzes and runs them again. The scratch schema
+is dropped at the end unless --keep is given.
+
+    python bench/query_bench.py --intents 200000 --repeat 20
+"""
+import argparse, json, os, statistics, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "common"))
+from dupli_core.migrate import autocommit_connection, migrate  # noqa: E402
+
+SEED_SQL = [
+    """INSERT INTO masters (id, name, source, is_active, auto_execute)
+       SELECT gen_random_uuid(), 'master-' || g, CASE WHEN g %% 10 = 0 THEN 'telegram' ELSE 'manual' END,
+              g %% 7 <> 0, false
+       FROM generate_series(1, %(masters)s) g""",
+    """INSERT INTO accounts (id, name, platform, external_id)
+       SELECT gen_random_uuid(), 'acct-' || g, 'MT5', (100000 + g)::text FROM generate_series(1, %(accounts)s) g""",
+    """INSERT INTO copy_sets (id, name, master_id, is_active)
+       SELECT gen_random_uuid(), 'cs-' || g, m.id, random() > 0.2
+       FROM masters m, generate_series(1, %(copysets)s) g""",
+    """WITH acc AS (SELECT array_agg(id) AS ids FROM accounts)
+       INSERT INTO copy_set_slaves (id, copy_set_id, account_id)
+       SELECT gen_random_uuid(), cs.id, acc.ids[1 + floor(random() * array_length(acc.ids, 1))::int]
+       FROM copy_sets cs, generate_series(1, %(slaves)s), acc""",
+    """WITH m AS (SELECT array_agg(id) AS ids FROM masters)
+       INSERT INTO trade_intents (id, master_id, symbol, side, order_type, entry, sl, status, action,
+                                  source_chat_id, source_message_id, created_at)
+       SELECT gen_random_uuid(), m.ids[1 + floor(random() * array_length(m.ids, 1))::int],
+              (ARRAY['XAUUSD', 'EURUSD', 'US30', 'NAS100'])[1 + g %% 4], CASE WHEN g %% 2 = 0 THEN 'BUY' ELSE 'SELL' END,
+              'MARKET', 2000 + random() * 50, 1990,
+              CASE WHEN g %% 997 = 0 THEN 'QUEUED' WHEN g %% 50 = 0 THEN 'FAILED' ELSE 'DONE' END, 'OPEN',
+              -1000000000000 - g %% 20, g, now() - random() * interval '180 days'
+       FROM generate_series(1, %(intents)s) g, m""",
+    """WITH acc AS (SELECT array_agg(id) AS ids FROM accounts)
+       INSERT INTO execution_logs (id, trade_intent_id, account_id, status, latency_ms, created_at)
+       SELECT gen_random_uuid(), t.id, acc.ids[1 + floor(random() * array_length(acc.ids, 1))::int], 'OK',
+              random() * 50, t.created_at
+       FROM trade_intents t, generate_series(1, %(logs)s), acc""",
+]
+
+TABLES = "masters, accounts, copy_sets, copy_set_slaves, trade_intents, execution_logs"
+
+# name -> (sql, params built from sample rows)
+QUERIES = {
+    "routing_snapshot": (
+        """SELECT cs.master_id, cs.id, a.id FROM copy_sets cs
+           LEFT JOIN copy_set_slaves s ON s.copy_set_id = cs.id LEFT JOIN accounts a ON a.id = s.account_id
+           WHERE cs.is_active ORDER BY cs.master_id, cs.id, s.id""", lambda p: ()),
+    "copysets_of_master": (
+        "SELECT id FROM copy_sets WHERE master_id = %s AND is_active", lambda p: (p["master_id"],)),
+    "slaves_of_copyset": (
+        "SELECT account_id FROM copy_set_slaves WHERE copy_set_id = %s ORDER BY id", lambda p: (p["copy_set_id"],)),
+    "latest_intents": (
+        "SELECT * FROM trade_intents ORDER BY created_at DESC LIMIT 200", lambda p: ()),
+    "intents_of_master": (
+        "SELECT * FROM trade_intents WHERE master_id = %s ORDER BY created_at DESC LIMIT 200",
+        lambda p: (p["master_id"],)),
+    "intents_keyset_page": (
+        """SELECT id, symbol, status, created_at FROM trade_intents WHERE (created_at, id) < (%s, %s)
+           ORDER BY created_at DESC, id DESC LIMIT 201""", lambda p: (p["created_at"], p["intent_id"])),
+    "intents_offset_page": (
+        """SELECT id, symbol, status, created_at FROM trade_intents
+           ORDER BY created_at DESC, id DESC OFFSET %s LIMIT 201""", lambda p: (p["offset"],)),
+    "intents_of_symbol": (
+        """SELECT id, status, created_at FROM trade_intents WHERE symbol = %s
+           ORDER BY created_at DESC, id DESC LIMIT 201""", lambda p: ("XAUUSD",)),
+    "failed_intents": (
+        """SELECT id, symbol, created_at FROM trade_intents WHERE status = 'FAILED'
+           ORDER BY created_at DESC, id DESC LIMIT 201""", lambda p: ()),
+    "open_intents": (
+        "SELECT id FROM trade_intents WHERE status IN ('NEW', 'QUEUED') ORDER BY created_at LIMIT 100", lambda p: ()),
+    "telegram_master": (
+        "SELECT * FROM masters WHERE source = 'telegram' AND is_active LIMIT 1", lambda p: ()),
+    "reply_lookup": (
+        "SELECT id FROM trade_intents WHERE source_chat_id = %s AND source_message_id = %s",
+        lambda p: (p["chat_id"], p["message_id"])),
+    "logs_of_intent": (
+        "SELECT * FROM execution_logs WHERE trade_intent_id = %s", lambda p: (p["intent_id"],)),
+}
+
+def _plan_summary(plan: dict) -> str:
+    nodes = []
+    def walk(n):
+        target = n.get("Index Name") or n.get("Relation Name")
+        if "Scan" in n["Node Type"]:
+            nodes.append(f"{n['Node Type']}({target})")
+        for c in n.get("Plans", []):
+            walk(c)
+    walk(plan["Plan"])
+    return ", ".join(nodes) or plan["Plan"]["Node Type"]
+
+def run_queries(conn, params: dict, repeat: int) -> dict:
+    out = {}
+    for name, (sql, args) in QUERIES.items():
+        a = args(params)
+        plan = conn.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, a).fetchone()[0]
+        plan = plan[0] if isinstance(plan, list) else json.loads(plan)[0]
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            conn.execute(sql, a).fetchall()
+            times.append((time.perf_counter() - t0) * 1000)
+        out[name] = (statistics.median(times), _plan_summary(plan))
+    return out
+
+def _run(conn, engine, schema: str, args) -> None:
+    t0 = time.perf_counter()
+    for sql in SEED_SQL:
+        conn.execute(sql, vars(args))
+    conn.execute(f"ANALYZE {TABLES}")
+    print(f"Seeded {args.intents} intents, {args.intents * args.logs} execution logs, "
+          f"{args.masters * args.copysets * args.slaves} copyset slaves in {time.perf_counter() - t0:.1f} s")
+    params = {
+        "master_id": conn.execute("SELECT master_id FROM copy_sets ORDER BY random() LIMIT 1").fetchone()[0],
+        "copy_set_id": conn.execute("SELECT id FROM copy_sets ORDER BY random() LIMIT 1").fetchone()[0],
+    }
+    params["intent_id"], params["created_at"] = conn.execute(
+        "SELECT id, created_at FROM trade_intents ORDER BY random() LIMIT 1").fetchone()
+    # same page depth as the keyset cursor above
+    params["offset"] = conn.execute("SELECT count(*) FROM trade_intents WHERE (created_at, id) >= (%s, %s)",
+                                    (params["created_at"], params["intent_id"])).fetchone()[0]
+    params["chat_id"], params["message_id"] = conn.execute(
+        "SELECT source_chat_id, source_message_id FROM trade_intents ORDER BY random() LIMIT 1").fetchone()
+
+    before = run_queries(conn, params, args.repeat)
+    t0 = time.perf_counter()
+    applied = migrate(engine, search_path=schema)
+    conn.execute(f"ANALYZE {TABLES}")
+    print(f"Applied {', '.join(map(str, applied)) or 'nothing'} in {time.perf_counter() - t0:.1f} s\n")
+    after = run_queries(conn, params, args.repeat)
+
+    print(f"{'query':<20} {'before ms':>10} {'after ms':>10} {'speedup':>8}  plan before -> after")
+    for name in QUERIES:
+        (b, b_plan), (a, a_plan) = before[name], after[name]
+        print(f"{name:<20} {b:>10.2f} {a:>10.2f} {b / a if a else float('inf'):>7.1f}x  {b_plan} -> {a_plan}")
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--masters", type=int, default=200)
+    ap.add_argument("--copysets", type=int, default=3, help="copysets per master")
+    ap.add_argument("--slaves", type=int, default=20, help="slaves per copyset")
+    ap.add_argument("--accounts", type=int, default=5000)
+    ap.add_argument("--intents", type=int, default=100000)
+    ap.add_argument("--logs", type=int, default=3, help="execution logs per intent")
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--keep", action="store_true", help="keep the scratch schema")
+    args = ap.parse_args()
+
+    from dupli_core.db import configure, get_engine
+    configure("query_bench", pool_size=2, max_overflow=0)
+    engine = get_engine()
+    schema = f"query_bench_{os.getpid()}"
+    with autocommit_connection(engine) as conn:
+        conn.execute(f"CREATE SCHEMA {schema}")
+    try:
+        migrate(engine, target=1, search_path=schema)
+        with autocommit_connection(engine, schema) as conn:
+            _run(conn, engine, schema, args)
+    finally:
+        if not args.keep:
+            with autocommit_connection(engine) as conn:
+                conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+
+if __name__ == "__main__":
+    main()
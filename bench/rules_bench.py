@@ -0,0 +1,114 @@
+"""RuleSet benchmark: compiled vectorized predicates vs per-slave interpretation.
+
+Builds N synthetic slave routes spread over a few props, each prop and some
+accounts carrying a rule set (whitelist, max open trades, daily loss, max lot per
+symbol, spread cap), plus random account state. Times worker.rulesets.evaluate
+(table cached per routing snapshot, and cold) against a loop that reads every
+slave's rule JSON on each intent, and checks both block the same slaves.
+
+    python bench/rules_bench.py --slaves 10,100,1000,5000,20000
+"""
+import argparse, json, os, random, sys, time, uuid
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "worker"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "common"))
+from worker.routing import SlaveRoute  # noqa: E402
+from worker.rulesets import RuleInputs, RuleSpec, RuleTable, evaluate, rule_table  # noqa: E402
+
+SYMBOLS = ["XAUUSD", "EURUSD", "US30", "NAS100", "BTCUSD"]
+
+def random_rules(rnd: random.Random) -> dict:
+    rules = {}
+    if rnd.random() < 0.5:
+        rules["symbol_whitelist"] = rnd.sample(SYMBOLS, 3)
+    if rnd.random() < 0.7:
+        rules["max_open_trades"] = rnd.choice([3, 5, 10])
+    if rnd.random() < 0.7:
+        rules["daily_loss_limit"] = rnd.choice([200.0, 500.0, 1000.0])
+    if rnd.random() < 0.5:
+        rules["max_lot_per_symbol"] = {"XAUUSD": rnd.choice([0.5, 1.0, 2.0]), "*": 5.0}
+    if rnd.random() < 0.5:
+        rules["max_spread"] = {"XAUUSD": rnd.choice([0.2, 0.4])}
+    return rules
+
+def make_routes(n: int, props: int = 8, seed: int = 1):
+    rnd = random.Random(seed)
+    prop_rules = {uuid.uuid4(): (f"prop-{p}", json.dumps(random_rules(rnd))) for p in range(props)}
+    prop_ids = list(prop_rules)
+    routes, raw = [], []
+    for i in range(n):
+        pid = rnd.choice(prop_ids)
+        owned = [prop_rules[pid]]
+        if rnd.random() < 0.2:
+            owned.append((f"acct-{i}", json.dumps(random_rules(rnd))))
+        raw.append(owned)
+        routes.append(SlaveRoute(
+            copy_set_id=None, account_id=uuid.uuid4(), account_name=f"slave-{i}", platform="MT5",
+            external_id=str(100000 + i), prop_firm_id=pid, prop_name=prop_rules[pid][0], weekend_trading=True,
+            news_red_block=False, news_blackout=False, risk_profile_id=None, risk_method=None, risk_percent=None,
+            fixed_lot=None, max_lot=None, rules=tuple(RuleSpec.from_json(name, js) for name, js in owned)))
+    return tuple(routes), raw
+
+def make_inputs(n: int, seed: int = 2) -> RuleInputs:
+    rng = np.random.default_rng(seed)
+    unknown = rng.random(n) < 0.1  # stale / missing state
+    cols = [rng.integers(0, 12, n).astype(float), rng.uniform(-300, 1200, n),
+            rng.choice([0.0, 0.5, 1.0], n), rng.uniform(0.1, 0.5, n)]
+    for c in cols:
+        c[unknown] = np.nan
+    return RuleInputs(*cols)
+
+def check_loop(raw, symbol, lots, inputs):
+    # what per-slave `if` branches cost: parse and walk each slave's rules every intent
+    blocked = set()
+    for i, owned in enumerate(raw):
+        val = lambda a: None if np.isnan(a[i]) else float(a[i])
+        open_trades, loss, held, spread = (val(inputs.open_trades), val(inputs.daily_loss),
+                                           val(inputs.symbol_lots), val(inputs.spread))
+        for _, js in owned:
+            d = json.loads(js)
+            wl = d.get("symbol_whitelist")
+            caps = d.get("max_lot_per_symbol") or {}
+            cap = caps.get(symbol, caps.get("*"))
+            spreads = d.get("max_spread") or {}
+            scap = spreads.get(symbol, spreads.get("*"))
+            if ((wl is not None and symbol not in wl)
+                    or (d.get("max_open_trades") is not None and open_trades is not None and open_trades >= d["max_open_trades"])
+                    or (d.get("daily_loss_limit") is not None and loss is not None and loss >= d["daily_loss_limit"])
+                    or (cap is not None and (held or 0.0) + lots[i] > cap + 1e-9)
+                    or (scap is not None and spread is not None and spread > scap)):
+                blocked.add(i)
+                break
+    return blocked
+
+def bench(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--slaves", default="10,100,1000,5000,20000")
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    symbol = "XAUUSD"
+    print(f"{'slaves':>8} {'cached us':>10} {'cold us':>10} {'loop us':>10} {'speedup':>8} {'blocked':>8}")
+    for n in (int(x) for x in args.slaves.split(",")):
+        routes, raw = make_routes(n)
+        inputs = make_inputs(n)
+        lots = np.random.default_rng(3).choice([0.1, 0.5, 1.0, 3.0], n)
+        blocked = evaluate(rule_table(routes), symbol, lots, inputs)
+        assert set(blocked) == check_loop(raw, symbol, lots, inputs), "vectorized and loop rules disagree"
+        cached = bench(lambda: evaluate(rule_table(routes), symbol, lots, inputs), args.repeat)
+        cold = bench(lambda: evaluate(RuleTable.from_routes(routes), symbol, lots, inputs), max(1, args.repeat // 4))
+        loop = bench(lambda: check_loop(raw, symbol, lots, inputs), max(1, args.repeat // 4))
+        print(f"{n:>8} {cached * 1e6:>10.1f} {cold * 1e6:>10.1f} {loop * 1e6:>10.1f} {loop / cached:>7.1f}x {len(blocked):>8}")
+
+if __name__ == "__main__":
+    main()
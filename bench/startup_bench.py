@@ -0,0 +1,88 @@
+"""Startup-time benchmark for the CORE services.
+
+Each run is a fresh interpreter that imports the service entry module, creates the
+engine, opens the first connection and runs the schema check, timing every phase.
+The median of --repeat runs is reported per service; --importtime lists the
+slowest imports (python -X importtime, cumulative).
+
+The services are imported from this checkout (services/common + services/<name>).
+
+    python bench/startup_bench.py api worker telegram --repeat 5
+    python bench/startup_bench.py worker --no-db      # imports + engine only
+    docker compose run --rm -v "$PWD:/src" worker python /src/bench/startup_bench.py worker
+"""
+import argparse, json, os, statistics, subprocess, sys
+
+SERVICES = {"api": "app.main", "worker": "worker.run", "telegram": "telegram_ingest.run"}
+SERVICES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "services"))
+
+PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import importlib
+importlib.import_module(sys.argv[1])
+t = {"import": time.perf_counter() - t0}
+from dupli_core import db
+s = time.perf_counter(); engine = db.get_engine(); t["engine"] = time.perf_counter() - s
+if sys.argv[2] == "db":
+    from sqlalchemy import text
+    s = time.perf_counter()
+    with engine.connect() as c:
+        c.execute(text("SELECT 1"))
+    t["connect"] = time.perf_counter() - s
+    s = time.perf_counter(); db.check_schema(engine, mode="warn"); t["schema_check"] = time.perf_counter() - s
+t["total"] = time.perf_counter() - t0
+print("STARTUP " + json.dumps(t))
+"""
+
+def _env(service: str) -> dict:
+    env = dict(os.environ)
+    paths = [os.path.join(SERVICES_DIR, "common"), os.path.join(SERVICES_DIR, service)]
+    env["PYTHONPATH"] = os.pathsep.join(paths + [p for p in [env.get("PYTHONPATH")] if p])
+    return env
+
+def run_once(service: str, with_db: bool) -> dict:
+    out = subprocess.run([sys.executable, "-c", PROBE, SERVICES[service], "db" if with_db else "nodb"],
+                         env=_env(service), capture_output=True, text=True, timeout=120)
+    for line in out.stdout.splitlines():
+        if line.startswith("STARTUP "):
+            return json.loads(line[8:])
+    raise RuntimeError(f"{service} probe failed:\n{out.stderr.strip()[-2000:]}")
+
+def slowest_imports(service: str, top: int) -> list[tuple[int, str]]:
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {SERVICES[service]}"],
+                         env=_env(service), capture_output=True, text=True, timeout=120)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (x.strip() for x in line[len("import time:"):].split("|"))
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("services", nargs="*", help=f"any of {', '.join(SERVICES)} (default: all)")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--no-db", action="store_true", help="skip connect + schema check (no Postgres needed)")
+    ap.add_argument("--importtime", type=int, default=0, metavar="N", help="show the N slowest imports")
+    args = ap.parse_args()
+    unknown = set(args.services) - set(SERVICES)
+    if unknown:
+        ap.error(f"unknown service(s): {', '.join(sorted(unknown))}")
+    args.services = args.services or list(SERVICES)
+
+    phases = ["import", "engine"] + ([] if args.no_db else ["connect", "schema_check"]) + ["total"]
+    print(f"{'service':<10}" + "".join(f"{p + ' ms':>16}" for p in phases))
+    for service in args.services:
+        try:
+            runs = [run_once(service, not args.no_db) for _ in range(args.repeat)]
+        except Exception as e:
+            print(f"{service:<10} failed: {e}")
+            continue
+        print(f"{service:<10}" + "".join(f"{statistics.median(r[p] for r in runs) * 1000:>16.1f}" for p in phases))
+        for us, name in slowest_imports(service, args.importtime) if args.importtime else []:
+            print(f"{'':<10}  {us / 1000:>8.1f} ms  {name}")
+
+if __name__ == "__main__":
+    main()
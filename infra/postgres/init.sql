@@ -1,4 +1,4 @@
 -- Extensions
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 
--- Minimal schema (v0.1). Use migrations later.
+-- Tables and indexes are created by the migrate service (services/common/dupli_core/migrations).
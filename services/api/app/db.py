@@ -1,15 +1,4 @@
-import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from dupli_core.db import SessionLocal, check_schema, configure, get_engine
 
-def _dsn() -> str:
-    user = os.getenv("POSTGRES_USER")
-    pwd = os.getenv("POSTGRES_PASSWORD")
-    host = os.getenv("POSTGRES_HOST", "postgres")
-    port = os.getenv("POSTGRES_PORT", "5432")
-    db = os.getenv("POSTGRES_DB")
-    return f"postgresql+psycopg://{user}:{pwd}@{host}:{port}/{db}"
-
-engine = create_engine(_dsn(), pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+# Request threads (FastAPI sync endpoints) with idle periods in between.
+configure("api", pool_size=10, max_overflow=20, pool_pre_ping=True)
@@ -0,0 +1,116 @@
+import asyncio, json, os, time
+from dataclasses import dataclass, field
+import redis
+from dupli_core.keys import EVENTS_CHANNEL
+from .queue import get_redis
+
+# Live execution events (GET /api/events, Server-Sent Events). The worker publishes
+# intent status transitions and execution log rows as JSON arrays on EVENTS_CHANNEL
+# (worker/events.py). Each API process holds ONE Redis subscription and fans every
+# message out to its connected dashboards, so listeners cost neither Postgres
+# queries nor Redis connections. Each event is framed once and shared by all
+# clients; a client whose queue fills up (stalled browser) is dropped with an
+# `overflow` event and reconnects. Nothing is replayed: after a reconnect,
+# reload the lists from /api/trade_intents.
+EVENTS_CLIENT_QUEUE = int(os.getenv("EVENTS_CLIENT_QUEUE", "1000"))
+EVENTS_HEARTBEAT_S = float(os.getenv("EVENTS_HEARTBEAT_S", "15"))
+EVENT_TYPES = ("intent", "exec")
+
+def publish_events(events: list[dict]) -> None:
+    try:
+        get_redis().publish(EVENTS_CHANNEL, json.dumps(events, default=str))
+    except redis.RedisError as e:
+        print(f"WARN: event publish failed ({len(events)} events): {e}", flush=True)
+
+@dataclass(eq=False)
+class EventClient:
+    types: frozenset
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(EVENTS_CLIENT_QUEUE))
+    overflow: bool = False
+
+class EventHub:
+    def __init__(self, channel: str = EVENTS_CHANNEL):
+        self.channel = channel
+        self._clients: set[EventClient] = set()
+        self._task = None
+        self.messages = 0
+        self.overflows = 0
+
+    def subscribe(self, types) -> EventClient:
+        """Register a client (call from the event loop); starts the Redis subscription on first use."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        c = EventClient(types=frozenset(types))
+        self._clients.add(c)
+        return c
+
+    def unsubscribe(self, c: EventClient) -> None:
+        self._clients.discard(c)
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {"clients": len(self._clients), "messages": self.messages, "overflows": self.overflows}
+
+    async def _run(self) -> None:
+        import redis.asyncio as aioredis
+        while True:
+            try:
+                async with aioredis.from_url(os.getenv("REDIS_URL", "redis://redis:6379/0")) as r, \
+                        r.pubsub(ignore_subscribe_messages=True) as p:
+                    await p.subscribe(self.channel)
+                    async for msg in p.listen():
+                        self.fanout(msg["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"WARN: event subscription: {e}", flush=True)
+                await asyncio.sleep(1)
+
+    def fanout(self, data) -> None:
+        self.messages += 1
+        try:
+            events = json.loads(data)
+        except ValueError:
+            return
+        chunks: dict[str, list[str]] = {}
+        for ev in events if isinstance(events, list) else [events]:
+            t = ev.get("type")
+            chunks.setdefault(t, []).append(f"event: {t}\ndata: {json.dumps(ev, separators=(',', ':'))}\n\n")
+        frames = {t: "".join(f) for t, f in chunks.items()}
+        for c in list(self._clients):
+            for t, frame in frames.items():
+                if t not in c.types:
+                    continue
+                try:
+                    c.queue.put_nowait(frame)
+                except asyncio.QueueFull:
+                    c.overflow = True
+                    self.overflows += 1
+                    self._clients.discard(c)
+                    break
+
+    async def stream(self, c: EventClient):
+        """SSE body for one client: queued frames, or a comment every EVENTS_HEARTBEAT_S when idle."""
+        try:
+            yield f"retry: 2000\n: connected {time.time():.3f}\n\n"
+            while True:
+                if c.overflow and c.queue.empty():
+                    yield "event: overflow\ndata: {}\n\n"
+                    return
+                try:
+                    frames = [await asyncio.wait_for(c.queue.get(), EVENTS_HEARTBEAT_S)]
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                # under load, everything queued meanwhile goes out in one write
+                while not c.queue.empty():
+                    frames.append(c.queue.get_nowait())
+                yield "".join(frames)
+        finally:
+            self.unsubscribe(c)
+
+hub = EventHub()
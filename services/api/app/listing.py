@@ -0,0 +1,113 @@
+import base64, hashlib, json, os, time, uuid
+from collections import OrderedDict
+from datetime import date, datetime
+from threading import Lock
+from typing import Callable, Optional
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import tuple_
+
+# List endpoints page with an opaque keyset cursor on (sort column, id): the next
+# page is `WHERE (sort, id) < (last sort, last id)`, an index range scan however
+# deep the page, instead of OFFSET. Bodies stay plain JSON arrays; the cursor of
+# the next page (if any) is in the X-Next-Cursor header.
+#
+# Rendered responses are kept per process for LIST_CACHE_TTL_S and carry an ETag,
+# so dashboard polls are served from memory and answered 304 when nothing
+# changed. API writes drop the cache (see notify.py); intents written by the
+# worker / telegram ingest show up after at most one TTL.
+LIST_CACHE_TTL_S = float(os.getenv("API_LIST_CACHE_TTL_S", "2"))
+LIST_CACHE_MAX_ENTRIES = int(os.getenv("API_LIST_CACHE_MAX_ENTRIES", "256"))
+PAGE_LIMIT_MAX = int(os.getenv("API_PAGE_LIMIT_MAX", "1000"))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def _json_default(v):
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    if isinstance(v, uuid.UUID):
+        return str(v)
+    raise TypeError(f"not JSON serializable: {type(v).__name__}")
+
+def dumps(obj) -> bytes:
+    return json.dumps(obj, default=_json_default, separators=(",", ":")).encode()
+
+def encode_cursor(sort_value, id_value) -> str:
+    return base64.urlsafe_b64encode(dumps([sort_value, id_value])).decode().rstrip("=")
+
+def decode_cursor(cursor: str, parse: Callable = lambda v: v) -> tuple:
+    try:
+        sort_value, id_value = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return parse(sort_value), uuid.UUID(id_value)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"invalid cursor: {e}")
+
+def keyset_page(stmt, sort_col, id_col, cursor: Optional[str], limit: int, desc: bool = True,
+                parse: Callable = lambda v: v):
+    """Order `stmt` by (sort_col, id_col), resume after `cursor`, fetch one row past `limit`."""
+    if cursor:
+        after = tuple_(sort_col, id_col)
+        key = tuple_(*decode_cursor(cursor, parse))
+        stmt = stmt.where(after < key if desc else after > key)
+    order = (sort_col.desc(), id_col.desc()) if desc else (sort_col.asc(), id_col.asc())
+    return stmt.order_by(*order).limit(max(1, min(limit, PAGE_LIMIT_MAX)) + 1)
+
+def split_page(rows: list, limit: int, sort_key: str, id_key: str = "id") -> tuple[list, Optional[str]]:
+    """(page rows, cursor of the next page or None) from the limit+1 rows of keyset_page()."""
+    limit = max(1, min(limit, PAGE_LIMIT_MAX))
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last[sort_key], last[id_key])
+
+def parse_ts(v: str) -> datetime:
+    return datetime.fromisoformat(v)
+
+_cache: OrderedDict = OrderedDict()  # key -> (expires, etag, body, media_type, headers)
+_generation = 0  # bumped by invalidate_cache(); a build that raced a write is not stored
+_lock = Lock()
+
+def invalidate_cache() -> None:
+    global _generation
+    with _lock:
+        _cache.clear()
+        _generation += 1
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+def _respond(request: Request, etag: str, body: bytes, media_type: str, headers: dict) -> Response:
+    headers = {**headers, "ETag": etag, "Cache-Control": f"private, max-age={int(LIST_CACHE_TTL_S)}"}
+    inm = request.headers.get("if-none-match")
+    if inm and etag in (t.strip().removeprefix("W/") for t in inm.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+def cached_response(request: Request, build: Callable[[], tuple], vary: tuple = (),
+                    media_type: str = "application/json") -> Response:
+    """Serve `build()` -> (body, next_cursor) through the TTL cache, with ETag / If-None-Match.
+
+    The key is path + query string (+ `vary`, e.g. the user for pages that show it).
+    A non-bytes body is JSON-encoded.
+    """
+    key = (request.url.path, str(request.query_params), vary)
+    now = time.monotonic()
+    with _lock:
+        hit = _cache.get(key)
+        if hit and hit[0] > now:
+            _cache.move_to_end(key)
+            return _respond(request, *hit[1:])
+        generation = _generation
+    body, next_cursor = build()
+    if not isinstance(body, bytes):
+        body = dumps(body)
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+    entry = (now + LIST_CACHE_TTL_S, _etag(body), body, media_type, headers)
+    if LIST_CACHE_TTL_S > 0:
+        with _lock:
+            if generation != _generation:
+                return _respond(request, *entry[1:])
+            _cache[key] = entry
+            _cache.move_to_end(key)
+            while len(_cache) > LIST_CACHE_MAX_ENTRIES:
+                _cache.popitem(last=False)
+    return _respond(request, *entry[1:])
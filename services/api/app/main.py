@@ -1,20 +1,51 @@
-from fastapi import FastAPI, Depends, Request
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Depends, Request, Query, HTTPException
+from fastapi.responses import HTMLResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import select, func, update
 from datetime import datetime, timezone
+from typing import Optional
+import json, time, uuid
 
-from .db import Base, engine, SessionLocal
-from .models import PropFirm, RiskProfile, Account, Master, CopySet, CopySetSlave, TradeIntent, ExecutionLog
-from .schemas import PropFirmIn, RiskProfileIn, AccountIn, MasterIn, CopySetIn, CopySetSlaveIn, TradeIntentOut
+from .db import SessionLocal, check_schema
+from dupli_core.models import (PropFirm, RiskProfile, Account, Master, CopySet, CopySetSlave, TradeIntent, ExecutionLog,
+                     TelegramChannel, TelegramChannelHealth, RuleSet)
+from .schemas import (PropFirmIn, RiskProfileIn, AccountIn, MasterIn, MasterPatch, CopySetIn, CopySetSlaveIn,
+                      TelegramChannelIn, TradeIntentOut, RuleSetIn, RuleSetPatch, RuleSpec)
 from .auth import get_user, require_role
-from .queue import get_queue
+from .queue import enqueue_execution, queue_stats, account_states, ACCOUNT_STATE_MAX_AGE_S
+from .notify import notify_routing_change, notify_master_change
+from .listing import cached_response, keyset_page, split_page, parse_ts, invalidate_cache
+from .events import hub, publish_events, EVENT_TYPES
 from .rules import can_trade_now
-
-Base.metadata.create_all(bind=engine)
+from dupli_core import metrics
 
 app = FastAPI(title="Dupli-Clone v0.1")
 
+@app.on_event("startup")
+def verify_schema():
+    # schema changes are applied by the migrate service (dupli_core.migrate)
+    check_schema()
+
+@app.on_event("startup")
+def serve_metrics():
+    # own port (api:9100), on the internal network only: /metrics is not an API route
+    metrics.serve()
+
+@app.on_event("shutdown")
+async def close_event_hub():
+    await hub.close()
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    # dupli_http_request_seconds by route template (not raw path: ids would explode the label set)
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    if path != "/api/events":
+        metrics.HTTP_SECONDS.labels(request.method, path, response.status_code).observe(time.perf_counter() - t0)
+    return response
+
 def db_dep():
     db = SessionLocal()
     try:
@@ -35,12 +66,23 @@ def home(request: Request):
     </ul>
     </body></html>"""
 
+UI_ROWS = 50
+
 @app.get("/ui", response_class=HTMLResponse)
 def ui(request: Request, db: Session = Depends(db_dep)):
     u = get_user(request)
-    props = db.execute(select(PropFirm).order_by(PropFirm.name)).scalars().all()
-    masters = db.execute(select(Master).order_by(Master.created_at.desc())).scalars().all()
-    intents = db.execute(select(TradeIntent).order_by(TradeIntent.created_at.desc()).limit(50)).scalars().all()
+    return cached_response(request, lambda: (_ui_page(db, u).encode(), None),
+                           vary=(u.username, tuple(sorted(u.roles))), media_type="text/html")
+
+def _ui_page(db: Session, u) -> str:
+    # only the displayed columns, and the latest UI_ROWS masters / intents (full lists: /api/*)
+    props = db.execute(select(PropFirm.name, PropFirm.weekend_trading, PropFirm.news_red_block)
+                       .order_by(PropFirm.name).limit(UI_ROWS)).all()
+    masters = db.execute(select(Master.name, Master.source, Master.is_active)
+                         .order_by(Master.created_at.desc()).limit(UI_ROWS)).all()
+    intents = db.execute(select(TradeIntent.created_at, TradeIntent.symbol, TradeIntent.side, TradeIntent.order_type,
+                                TradeIntent.status)
+                         .order_by(TradeIntent.created_at.desc(), TradeIntent.id.desc()).limit(UI_ROWS)).all()
     def li(x): return "<li>" + x + "</li>"
     return f"""<html><body>
     <h2>Minimal UI</h2>
@@ -66,19 +108,27 @@ def create_prop(payload: PropFirmIn, request: Request, db: Session = Depends(db_
     u = get_user(request); require_role(u, "admin", "operator")
     obj = PropFirm(**payload.model_dump())
     db.add(obj); db.commit(); db.refresh(obj)
+    notify_routing_change()
     return {"id": str(obj.id)}
 
 @app.get("/api/props", tags=["props"])
-def list_props(request: Request, db: Session = Depends(db_dep)):
+def list_props(request: Request, cursor: Optional[str] = None, limit: int = Query(200, ge=1),
+               db: Session = Depends(db_dep)):
+    # pages of `limit` by name; next page: ?cursor=<X-Next-Cursor>
     u = get_user(request); require_role(u, "admin", "operator", "viewer")
-    items = db.execute(select(PropFirm).order_by(PropFirm.name)).scalars().all()
-    return [{"id": str(p.id), "name": p.name, "weekend_trading": p.weekend_trading, "news_red_block": p.news_red_block} for p in items]
+    def build():
+        stmt = select(PropFirm.id, PropFirm.name, PropFirm.weekend_trading, PropFirm.news_red_block,
+                      PropFirm.news_blackout)
+        rows = db.execute(keyset_page(stmt, PropFirm.name, PropFirm.id, cursor, limit, desc=False)).mappings().all()
+        return split_page([dict(r) for r in rows], limit, "name")
+    return cached_response(request, build)
 
 @app.post("/api/risk_profiles", tags=["risk"])
 def create_risk(payload: RiskProfileIn, request: Request, db: Session = Depends(db_dep)):
     u = get_user(request); require_role(u, "admin", "operator")
     obj = RiskProfile(**payload.model_dump())
     db.add(obj); db.commit(); db.refresh(obj)
+    notify_routing_change()
     return {"id": str(obj.id)}
 
 @app.post("/api/accounts", tags=["accounts"])
@@ -86,28 +136,72 @@ def create_account(payload: AccountIn, request: Request, db: Session = Depends(d
     u = get_user(request); require_role(u, "admin", "operator")
     obj = Account(**payload.model_dump())
     db.add(obj); db.commit(); db.refresh(obj)
+    notify_routing_change()
     return {"id": str(obj.id)}
 
 @app.get("/api/accounts", tags=["accounts"])
-def list_accounts(request: Request, db: Session = Depends(db_dep)):
+def list_accounts(request: Request, platform: Optional[str] = None, prop_firm_id: Optional[uuid.UUID] = None,
+                  cursor: Optional[str] = None, limit: int = Query(200, ge=1), db: Session = Depends(db_dep)):
+    # newest first, pages of `limit`; next page: ?cursor=<X-Next-Cursor>
     u = get_user(request); require_role(u, "admin", "operator", "viewer")
-    items = db.execute(select(Account).order_by(Account.created_at.desc())).scalars().all()
-    return [{"id": str(a.id), "name": a.name, "platform": a.platform, "external_id": a.external_id,
-             "prop_firm_id": str(a.prop_firm_id) if a.prop_firm_id else None,
-             "risk_profile_id": str(a.risk_profile_id) if a.risk_profile_id else None} for a in items]
+    def build():
+        stmt = select(Account.id, Account.name, Account.platform, Account.external_id, Account.prop_firm_id,
+                      Account.risk_profile_id, Account.created_at)
+        if platform:
+            stmt = stmt.where(Account.platform == platform.upper())
+        if prop_firm_id:
+            stmt = stmt.where(Account.prop_firm_id == prop_firm_id)
+        rows = db.execute(keyset_page(stmt, Account.created_at, Account.id, cursor, limit, parse=parse_ts)).mappings().all()
+        items, next_cursor = split_page([dict(r) for r in rows], limit, "created_at")
+        for a in items:
+            del a["created_at"]
+        return items, next_cursor
+    return cached_response(request, build)
+
+@app.get("/api/accounts/state", tags=["accounts"])
+def list_account_states(request: Request, db: Session = Depends(db_dep)):
+    # live equity/margin/positions cached by the worker; age_s tells how fresh each one is
+    u = get_user(request); require_role(u, "admin", "operator", "viewer")
+    states = account_states()
+    now = time.time()
+    out = []
+    for a in db.execute(select(Account).order_by(Account.name)).scalars().all():
+        st = states.get(f"{(a.platform or '').upper()}:{a.external_id}")
+        out.append({"account_id": str(a.id), "name": a.name, "platform": a.platform, "external_id": a.external_id,
+                    "equity": st.get("equity") if st else None, "balance": st.get("balance") if st else None,
+                    "free_margin": st.get("free_margin") if st else None,
+                    "open_positions": len(st.get("positions") or []) if st else None,
+                    "updated_at": st.get("updated_at") if st else None,
+                    "age_s": round(now - st["updated_at"], 3) if st else None,
+                    "stale": st is None or now - st["updated_at"] > ACCOUNT_STATE_MAX_AGE_S})
+    return out
 
 @app.post("/api/masters", tags=["masters"])
 def create_master(payload: MasterIn, request: Request, db: Session = Depends(db_dep)):
     u = get_user(request); require_role(u, "admin", "operator")
     obj = Master(**payload.model_dump())
     db.add(obj); db.commit(); db.refresh(obj)
+    notify_master_change(str(obj.id))
     return {"id": str(obj.id)}
 
+@app.patch("/api/masters/{master_id}", tags=["masters"])
+def update_master(master_id: str, payload: MasterPatch, request: Request, db: Session = Depends(db_dep)):
+    u = get_user(request); require_role(u, "admin", "operator")
+    obj = db.get(Master, master_id)
+    if not obj:
+        return {"error": "not_found"}
+    for k, v in payload.model_dump(exclude_unset=True).items():
+        setattr(obj, k, v)
+    db.commit()
+    notify_master_change(master_id)
+    return {"id": master_id}
+
 @app.post("/api/copysets", tags=["copysets"])
 def create_copyset(payload: CopySetIn, request: Request, db: Session = Depends(db_dep)):
     u = get_user(request); require_role(u, "admin", "operator")
     obj = CopySet(**payload.model_dump())
     db.add(obj); db.commit(); db.refresh(obj)
+    notify_routing_change()
     return {"id": str(obj.id)}
 
 @app.post("/api/copysets/slaves", tags=["copysets"])
@@ -115,35 +209,165 @@ def add_slave(payload: CopySetSlaveIn, request: Request, db: Session = Depends(d
     u = get_user(request); require_role(u, "admin", "operator")
     obj = CopySetSlave(**payload.model_dump())
     db.add(obj); db.commit(); db.refresh(obj)
+    notify_routing_change()
+    return {"id": str(obj.id)}
+
+def _rules_json(spec: RuleSpec) -> str:
+    rules = spec.model_dump(exclude_none=True)
+    # symbols are matched upper-case by the worker
+    if "symbol_whitelist" in rules:
+        rules["symbol_whitelist"] = sorted({s.upper() for s in rules["symbol_whitelist"]})
+    for k in ("max_lot_per_symbol", "max_spread"):
+        if k in rules:
+            rules[k] = {s.upper(): v for s, v in rules[k].items()}
+    return json.dumps(rules)
+
+def _ruleset_out(rs: RuleSet) -> dict:
+    return {"id": str(rs.id), "name": rs.name,
+            "prop_firm_id": str(rs.prop_firm_id) if rs.prop_firm_id else None,
+            "account_id": str(rs.account_id) if rs.account_id else None,
+            "rules": json.loads(rs.rules or "{}"), "is_active": rs.is_active}
+
+@app.post("/api/rulesets", tags=["rules"])
+def create_ruleset(payload: RuleSetIn, request: Request, db: Session = Depends(db_dep)):
+    u = get_user(request); require_role(u, "admin", "operator")
+    if bool(payload.prop_firm_id) == bool(payload.account_id):
+        return {"error": "exactly one of prop_firm_id / account_id is required"}
+    obj = RuleSet(name=payload.name, prop_firm_id=payload.prop_firm_id, account_id=payload.account_id,
+                  rules=_rules_json(payload.rules), is_active=payload.is_active)
+    db.add(obj); db.commit(); db.refresh(obj)
+    notify_routing_change()
     return {"id": str(obj.id)}
 
+@app.get("/api/rulesets", tags=["rules"])
+def list_rulesets(request: Request, db: Session = Depends(db_dep)):
+    u = get_user(request); require_role(u, "admin", "operator", "viewer")
+    items = db.execute(select(RuleSet).order_by(RuleSet.name)).scalars().all()
+    return [_ruleset_out(rs) for rs in items]
+
+@app.patch("/api/rulesets/{ruleset_id}", tags=["rules"])
+def update_ruleset(ruleset_id: str, payload: RuleSetPatch, request: Request, db: Session = Depends(db_dep)):
+    u = get_user(request); require_role(u, "admin", "operator")
+    obj = db.get(RuleSet, ruleset_id)
+    if not obj:
+        return {"error": "not_found"}
+    changes = payload.model_dump(exclude_unset=True)
+    if "rules" in changes:
+        changes["rules"] = _rules_json(payload.rules or RuleSpec())
+    for k, v in changes.items():
+        setattr(obj, k, v)
+    db.commit()
+    notify_routing_change()
+    return _ruleset_out(obj)
+
+@app.post("/api/telegram/channels", tags=["telegram"])
+def create_telegram_channel(payload: TelegramChannelIn, request: Request, db: Session = Depends(db_dep)):
+    u = get_user(request); require_role(u, "admin", "operator")
+    obj = TelegramChannel(**payload.model_dump())
+    db.add(obj); db.commit(); db.refresh(obj)
+    notify_master_change(str(obj.master_id) if obj.master_id else "")
+    return {"id": str(obj.id)}
+
+@app.get("/api/telegram/channels", tags=["telegram"])
+def list_telegram_channels(request: Request, db: Session = Depends(db_dep)):
+    # config + health/lag reported by the ingest shards
+    u = get_user(request); require_role(u, "admin", "operator", "viewer")
+    rows = db.execute(
+        select(TelegramChannel, TelegramChannelHealth)
+        .outerjoin(TelegramChannelHealth, TelegramChannelHealth.chat_id == TelegramChannel.chat_id)
+        .order_by(TelegramChannel.chat_id)
+    ).all()
+    now = datetime.now(timezone.utc)
+    return [{"id": str(c.id), "chat_id": c.chat_id, "title": c.title, "session_name": c.session_name,
+             "grammar": c.grammar,
+             "master_id": str(c.master_id) if c.master_id else None, "is_active": c.is_active,
+             "shard": h.shard if h else None,
+             "messages_total": h.messages_total if h else 0, "signals_total": h.signals_total if h else 0,
+             "last_message_at": h.last_message_at if h else None,
+             "last_lag_ms": h.last_lag_ms if h else None, "max_lag_ms": h.max_lag_ms if h else None,
+             "heartbeat_age_s": round((now - h.updated_at).total_seconds(), 1) if h and h.updated_at else None}
+            for c, h in rows]
+
+# the TradeIntentOut fields, read as plain columns (no ORM objects / per-row models)
+TRADE_INTENT_COLUMNS = [func.coalesce(TradeIntent.action, "OPEN").label(f) if f == "action" else getattr(TradeIntent, f)
+                        for f in TradeIntentOut.model_fields]
+
 @app.get("/api/trade_intents", tags=["trade"])
-def list_trade_intents(request: Request, db: Session = Depends(db_dep)):
+def list_trade_intents(request: Request, status: Optional[str] = None, master_id: Optional[uuid.UUID] = None,
+                       symbol: Optional[str] = None, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                       cursor: Optional[str] = None, limit: int = Query(200, ge=1), db: Session = Depends(db_dep)):
+    # newest first; status=QUEUED,FAILED  master_id=  symbol=  since/until (ISO, created_at range);
+    # next page: same filters + ?cursor=<X-Next-Cursor>
     u = get_user(request); require_role(u, "admin", "operator", "viewer")
-    items = db.execute(select(TradeIntent).order_by(TradeIntent.created_at.desc()).limit(200)).scalars().all()
-    return [TradeIntentOut(
-        id=str(t.id), master_id=str(t.master_id), symbol=t.symbol, side=t.side, order_type=t.order_type,
-        entry=t.entry, zone_low=t.zone_low, zone_high=t.zone_high, sl=t.sl, tps=t.tps, status=t.status,
-        created_at=t.created_at
-    ).model_dump() for t in items]
+    def build():
+        stmt = select(*TRADE_INTENT_COLUMNS)
+        if status:
+            stmt = stmt.where(TradeIntent.status.in_([s.strip().upper() for s in status.split(",") if s.strip()]))
+        if master_id:
+            stmt = stmt.where(TradeIntent.master_id == master_id)
+        if symbol:
+            stmt = stmt.where(TradeIntent.symbol == symbol.upper())
+        if since:
+            stmt = stmt.where(TradeIntent.created_at >= since)
+        if until:
+            stmt = stmt.where(TradeIntent.created_at < until)
+        rows = db.execute(keyset_page(stmt, TradeIntent.created_at, TradeIntent.id, cursor, limit,
+                                      parse=parse_ts)).mappings().all()
+        return split_page([dict(r) for r in rows], limit, "created_at")
+    return cached_response(request, build)
 
 # --- Actions: queue execution ---
-def _enqueue_execution(trade_intent_id: str):
-    q = get_queue()
-    job = q.enqueue("worker.jobs.execute_trade_intent", trade_intent_id)
-    return job.id
+# only never-run or failed intents; a QUEUED/DISPATCHED/DONE one would trade again
+QUEUEABLE_STATUSES = ("NEW", "FAILED")
 
 @app.post("/api/trade_intents/{intent_id}/queue", tags=["trade"])
 def queue_intent(intent_id: str, request: Request, db: Session = Depends(db_dep)):
     u = get_user(request); require_role(u, "admin", "operator")
-    t = db.get(TradeIntent, intent_id)
-    if not t:
+    try:
+        key = uuid.UUID(intent_id)
+    except ValueError:
         return {"error": "not_found"}
-    t.status = "QUEUED"
+    # one conditional UPDATE: two concurrent clicks cannot both queue it. The URL has only
+    # the id, so this probes every attached partition (an index lookup each, see README_DEPLOY);
+    # from here on the worker reads the row by (id, created_at)
+    t = db.execute(update(TradeIntent)
+                   .where(TradeIntent.id == key, TradeIntent.status.in_(QUEUEABLE_STATUSES))
+                   .values(status="QUEUED")
+                   .returning(TradeIntent.master_id, TradeIntent.symbol, TradeIntent.action, TradeIntent.timings,
+                              TradeIntent.created_at)).first()
+    if t is None:
+        current = db.execute(select(TradeIntent.status).where(TradeIntent.id == key)).scalar()
+        if not current:
+            return {"error": "not_found"}
+        raise HTTPException(status_code=409, detail=f"intent is {current}; only {', '.join(QUEUEABLE_STATUSES)} "
+                                                    f"intents can be queued")
     db.commit()
-    job_id = _enqueue_execution(intent_id)
+    invalidate_cache()
+    publish_events([{"type": "intent", "ts": time.time(), "id": intent_id, "master_id": str(t.master_id),
+                     "symbol": t.symbol, "action": t.action or "OPEN", "status": "QUEUED"}])
+    timings = json.loads(t.timings) if t.timings else {}
+    timings["enqueued"] = time.time()
+    job_id = enqueue_execution(intent_id, timings, t.created_at)
     return {"job_id": job_id}
 
+@app.get("/api/queues", tags=["system"])
+def queues(request: Request):
+    # execution backlog: intent stream + per-account shards (depth, pending, oldest age)
+    u = get_user(request); require_role(u, "admin", "operator", "viewer")
+    return {**queue_stats(), "events": hub.stats()}
+
+@app.get("/api/events", tags=["system"])
+async def events(request: Request, types: str = ",".join(EVENT_TYPES)):
+    # Server-Sent Events: `intent` (status transitions) and `exec` (execution logs), e.g.
+    # new EventSource("/api/events?types=intent"); one shared Redis subscription per process
+    u = get_user(request); require_role(u, "admin", "operator", "viewer")
+    wanted = {t.strip() for t in types.split(",") if t.strip()}
+    if not wanted or wanted - set(EVENT_TYPES):
+        raise HTTPException(status_code=400, detail=f"types: any of {', '.join(EVENT_TYPES)}")
+    client = hub.subscribe(wanted)
+    return StreamingResponse(hub.stream(client), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.get("/api/health", tags=["system"])
 def health(request: Request):
     u = get_user(request)
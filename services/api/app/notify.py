@@ -0,0 +1,24 @@
+import redis
+from dupli_core.keys import MASTERS_CHANNEL, ROUTING_VERSION_KEY
+from .listing import invalidate_cache
+from .queue import get_redis
+
+# Workers keep an in-memory routing snapshot (master -> slaves + prop + risk) and
+# reload it when ROUTING_VERSION_KEY moves. Telegram ingest caches active masters
+# and drops its cache on messages on MASTERS_CHANNEL.
+
+def notify_routing_change() -> None:
+    invalidate_cache()  # every API write ends here: drop this process's cached list responses
+    try:
+        get_redis().incr(ROUTING_VERSION_KEY)
+    except redis.RedisError as e:
+        # workers fall back to ROUTING_MAX_AGE_S, so a missed bump only delays the reload
+        print(f"WARN: routing version bump failed: {e}", flush=True)
+
+def notify_master_change(master_id: str) -> None:
+    invalidate_cache()
+    try:
+        get_redis().publish(MASTERS_CHANNEL, master_id)
+    except redis.RedisError as e:
+        # ingest caches expire after MASTER_CACHE_TTL_S anyway
+        print(f"WARN: master change notification failed: {e}", flush=True)
@@ -1,7 +1,78 @@
-import os
+import os, json
+from datetime import datetime
 import redis
-from rq import Queue
+from dupli_core.keys import (ACCOUNT_STATE_KEY, EXEC_DEAD_STREAM, EXEC_GROUP, EXEC_SHARDS, EXEC_STREAM,
+                              EXEC_STREAM_MAXLEN, SHARD_GROUP, lease_key, shard_stream)
 
-def get_queue() -> Queue:
-    r = redis.from_url(os.getenv("REDIS_URL"))
-    return Queue("exec", connection=r, default_timeout=60)
+# Execution requests are entries on a Redis Stream consumed by the worker's
+# consumer group (see worker/consumer.py). MAXLEN trims acknowledged history.
+
+_redis = None
+
+def get_redis() -> redis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = redis.from_url(os.getenv("REDIS_URL"))
+    return _redis
+
+def enqueue_execution(trade_intent_id: str, timings: dict | None = None, created_at: datetime | None = None) -> str:
+    # created_at lets the worker read the intent from its month's partition only
+    fields = {"intent_id": trade_intent_id, "timings": json.dumps(timings or {})}
+    if created_at is not None:
+        fields["created_at"] = created_at.isoformat()
+    entry_id = get_redis().xadd(EXEC_STREAM, fields, maxlen=EXEC_STREAM_MAXLEN, approximate=True)
+    return entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+
+# Dashboard stats of the intent stream and the shard streams written by the worker
+# (see worker/shards.py).
+
+def _id_age_s(entry_id, now_ms: float):
+    if not entry_id:
+        return None
+    ms = int((entry_id.decode() if isinstance(entry_id, bytes) else entry_id).split("-")[0])
+    return round(max(now_ms - ms, 0) / 1000.0, 3)
+
+def _stream_stats(r: redis.Redis, stream: str, group: str, now_ms: float) -> dict:
+    out = {"stream": stream, "length": r.xlen(stream), "consumers": 0, "pending": 0, "backlog": 0,
+           "oldest_pending_age_s": None, "oldest_backlog_age_s": None}
+    try:
+        groups = r.xinfo_groups(stream)
+    except redis.ResponseError:
+        return out  # stream not created yet
+    g = next((g for g in groups if g["name"] in (group, group.encode())), None)
+    if g is None:
+        return out
+    out["pending"] = g["pending"]
+    out["consumers"] = g["consumers"]
+    if g["pending"]:
+        out["oldest_pending_age_s"] = _id_age_s(r.xpending(stream, group)["min"], now_ms)
+    last = g["last-delivered-id"]
+    last = last.decode() if isinstance(last, bytes) else last
+    nxt = r.xrange(stream, min="(" + last, count=1)
+    if nxt:
+        out["oldest_backlog_age_s"] = _id_age_s(nxt[0][0], now_ms)
+        lag = g.get("lag")
+        out["backlog"] = lag if lag is not None else len(r.xrange(stream, min="(" + last, count=10000))
+    return out
+
+def queue_stats() -> dict:
+    """Depth and age of the intent stream and of every execution shard."""
+    r = get_redis()
+    now_ms = r.time()
+    now_ms = now_ms[0] * 1000.0 + now_ms[1] / 1000.0
+    shards = []
+    for n in range(EXEC_SHARDS):
+        s = _stream_stats(r, shard_stream(n), SHARD_GROUP, now_ms)
+        owner = r.get(lease_key(n))
+        s["shard"], s["owner"] = n, owner.decode() if owner else None
+        shards.append(s)
+    return {"intents": _stream_stats(r, EXEC_STREAM, EXEC_GROUP, now_ms),
+            "shards": shards,
+            "dead_letter": r.xlen(EXEC_DEAD_STREAM)}
+
+# Account state cache maintained by the worker (see worker/account_state.py).
+ACCOUNT_STATE_MAX_AGE_S = float(os.getenv("ACCOUNT_STATE_MAX_AGE_S", "120"))
+
+def account_states() -> dict:
+    """Map "<PLATFORM>:<external_id>" -> {equity, balance, free_margin, positions, updated_at, source}."""
+    return {k.decode(): json.loads(v) for k, v in get_redis().hgetall(ACCOUNT_STATE_KEY).items()}
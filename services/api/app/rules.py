@@ -1,22 +1,17 @@
 from datetime import datetime
-from zoneinfo import ZoneInfo
 from sqlalchemy.orm import Session
-from .models import Account, PropFirm
-
-ROME = ZoneInfo("Europe/Rome")
-
-def is_weekend_rome(now: datetime) -> bool:
-    wd = now.astimezone(ROME).weekday()  # 0=Mon ... 6=Sun
-    return wd >= 5
+from dupli_core.models import Account, PropFirm
+from dupli_core.trading_windows import get_calendar
 
 def can_trade_now(db: Session, account: Account, now: datetime) -> tuple[bool, str]:
-    # v0.1:
-    # - weekend block unless prop allows weekend_trading
-    # - news_red_block is a manual toggle on the PropFirm
+    # same compiled trading-window calendar as the worker (weekend, holidays,
+    # session hours, red-news blackouts); news_red_block stays a manual switch
     prop: PropFirm | None = account.prop_firm
     if prop:
-        if is_weekend_rome(now) and not prop.weekend_trading:
-            return False, f"Weekend trading blocked by prop '{prop.name}'"
         if prop.news_red_block:
             return False, f"NEWS_RED block is active for prop '{prop.name}'"
+        t = now.timestamp()
+        why = get_calendar().windows(prop.name, prop.weekend_trading, prop.news_blackout, t).blocked(t)
+        if why:
+            return False, f"{why} blocked by prop '{prop.name}'"
     return True, "OK"
@@ -5,6 +5,7 @@ class PropFirmIn(BaseModel):
     name: str
     weekend_trading: bool = False
     news_red_block: bool = False
+    news_blackout: bool = False
 
 class RiskProfileIn(BaseModel):
     name: str
@@ -24,6 +25,12 @@ class MasterIn(BaseModel):
     name: str
     source: str
     is_active: bool = True
+    auto_execute: bool = False
+
+class MasterPatch(BaseModel):
+    name: Optional[str] = None
+    is_active: Optional[bool] = None
+    auto_execute: Optional[bool] = None
 
 class CopySetIn(BaseModel):
     name: str
@@ -34,6 +41,34 @@ class CopySetSlaveIn(BaseModel):
     copy_set_id: str
     account_id: str
 
+class RuleSpec(BaseModel):
+    # every field is optional; an account under several sets gets the strictest value of each
+    symbol_whitelist: Optional[list[str]] = None
+    max_open_trades: Optional[int] = None
+    daily_loss_limit: Optional[float] = None  # account currency, vs. the day-start equity
+    max_lot_per_symbol: Optional[dict[str, float]] = None  # {"XAUUSD": 2.0, "*": 5.0}, open + new lots
+    max_spread: Optional[dict[str, float]] = None  # price units, {"XAUUSD": 0.5, "*": ...}
+
+class RuleSetIn(BaseModel):
+    name: str
+    prop_firm_id: Optional[str] = None  # exactly one of prop_firm_id / account_id
+    account_id: Optional[str] = None
+    rules: RuleSpec = RuleSpec()
+    is_active: bool = True
+
+class RuleSetPatch(BaseModel):
+    name: Optional[str] = None
+    rules: Optional[RuleSpec] = None
+    is_active: Optional[bool] = None
+
+class TelegramChannelIn(BaseModel):
+    chat_id: int
+    title: Optional[str] = None
+    session_name: str = "default"
+    grammar: Optional[str] = None
+    master_id: Optional[str] = None
+    is_active: bool = True
+
 class TradeIntentOut(BaseModel):
     id: str
     master_id: str
@@ -47,3 +82,6 @@ class TradeIntentOut(BaseModel):
     tps: Optional[str]
     status: str
     created_at: Any
+    timings: Optional[str] = None
+    action: str = "OPEN"
+    parent_id: Optional[str] = None
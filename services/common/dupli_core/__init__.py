@@ -0,0 +1,12 @@
+# Shared core of the CORE services: ORM models (models), lazily created engines with
+# per-service pool settings (db), versioned schema migrations (migrate), the
+# trading-window calendar (trading_windows) and the shared Redis names (keys).
+# Submodules load on first attribute access, so `import dupli_core` stays cheap.
+import importlib
+
+__all__ = ["db", "keys", "migrate", "models", "trading_windows"]
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
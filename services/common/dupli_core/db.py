@@ -0,0 +1,118 @@
+import os, threading
+from typing import Optional
+
+# Lazily created engine with per-service pool settings. Services call configure()
+# with their defaults at import (no connection, no engine yet); the engine is built
+# on the first get_engine() / SessionLocal() call. Every setting can be overridden
+# per container with the DB_* environment variables below.
+#
+#   pool_size / max_overflow   connections kept / allowed on top under bursts
+#   pool_pre_ping              SELECT 1 on checkout: for services idle for long periods
+#   pool_recycle_s             reconnect older connections instead (no round trip per checkout)
+#   prepare_threshold          psycopg server-side prepared statements after N executions
+#   query_cache_size           SQLAlchemy compiled-statement cache entries
+SETTINGS_ENV = {
+    "pool_size": ("DB_POOL_SIZE", int),
+    "max_overflow": ("DB_MAX_OVERFLOW", int),
+    "pool_timeout_s": ("DB_POOL_TIMEOUT_S", float),
+    "pool_pre_ping": ("DB_POOL_PRE_PING", lambda v: v.lower() in ("1", "true", "yes")),
+    "pool_recycle_s": ("DB_POOL_RECYCLE_S", int),
+    "prepare_threshold": ("DB_PREPARE_THRESHOLD", int),
+    "query_cache_size": ("DB_QUERY_CACHE_SIZE", int),
+}
+DEFAULTS = {"pool_size": 5, "max_overflow": 10, "pool_timeout_s": 30.0, "pool_pre_ping": True,
+            "pool_recycle_s": 1800, "prepare_threshold": 5, "query_cache_size": 500}
+# strict: refuse to start on missing tables/columns, warn: log only, off: skip
+DB_SCHEMA_CHECK = os.getenv("DB_SCHEMA_CHECK", "strict")
+
+_service = "dupli"
+_settings = dict(DEFAULTS)
+_engine = None
+_sessionmaker = None
+_lock = threading.Lock()
+
+def dsn() -> str:
+    user = os.getenv("POSTGRES_USER")
+    pwd = os.getenv("POSTGRES_PASSWORD")
+    host = os.getenv("POSTGRES_HOST", "postgres")
+    port = os.getenv("POSTGRES_PORT", "5432")
+    db = os.getenv("POSTGRES_DB")
+    return f"postgresql+psycopg://{user}:{pwd}@{host}:{port}/{db}"
+
+def configure(service: str, **defaults) -> dict:
+    """Set this process's service name and pool defaults (DB_* env vars still win)."""
+    global _service, _settings
+    unknown = set(defaults) - set(DEFAULTS)
+    if unknown:
+        raise TypeError(f"unknown DB settings: {sorted(unknown)}")
+    settings = {**DEFAULTS, **defaults}
+    for key, (env, conv) in SETTINGS_ENV.items():
+        if os.getenv(env):
+            settings[key] = conv(os.getenv(env))
+    with _lock:
+        if _engine is not None:
+            print(f"WARN: DB engine already created for {_service}; new settings ignored", flush=True)
+            return _settings
+        _service, _settings = service, settings
+    return settings
+
+def get_engine():
+    global _engine, _sessionmaker
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                from sqlalchemy import create_engine
+                from sqlalchemy.orm import sessionmaker
+                s = _settings
+                _engine = create_engine(
+                    dsn(), pool_size=s["pool_size"], max_overflow=s["max_overflow"],
+                    pool_timeout=s["pool_timeout_s"], pool_pre_ping=s["pool_pre_ping"],
+                    pool_recycle=s["pool_recycle_s"], query_cache_size=s["query_cache_size"],
+                    connect_args={"prepare_threshold": s["prepare_threshold"], "application_name": _service})
+                _sessionmaker = sessionmaker(autocommit=False, autoflush=False, bind=_engine)
+    return _engine
+
+class _LazySessionLocal:
+    """Drop-in for a sessionmaker: the engine is created on the first session."""
+
+    def __call__(self, **kw):
+        if _sessionmaker is None:
+            get_engine()
+        return _sessionmaker(**kw)
+
+SessionLocal = _LazySessionLocal()
+
+def check_schema(bind=None, mode: Optional[str] = None) -> list[str]:
+    """Compare the shared models and migrations with the live database.
+
+    Returns the missing "table" / "table.column" names and pending migrations (e.g.
+    indexes not built yet). With DB_SCHEMA_CHECK=strict a drift raises at startup
+    instead of surfacing later as failing queries or sequential scans.
+    """
+    from sqlalchemy import text
+    from .migrate import pending
+    from .models import Base
+    mode = mode or DB_SCHEMA_CHECK
+    if mode == "off":
+        return []
+    bind = bind or get_engine()
+    with bind.connect() as conn:
+        rows = conn.execute(text("SELECT table_name, column_name FROM information_schema.columns "
+                                 "WHERE table_schema = current_schema()")).all()
+    live: dict[str, set] = {}
+    for table, column in rows:
+        live.setdefault(table, set()).add(column)
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        cols = live.get(table.name)
+        if cols is None:
+            missing.append(table.name)
+            continue
+        missing += [f"{table.name}.{c.name}" for c in table.columns if c.name not in cols]
+    missing += [f"migration {m}" for m in pending(bind)]
+    if missing:
+        msg = f"database schema is behind the models ({_service}): missing {', '.join(missing)}"
+        if mode == "strict":
+            raise RuntimeError(msg + " (run `python -m dupli_core.migrate`, or set DB_SCHEMA_CHECK=warn)")
+        print(f"WARN: {msg}", flush=True)
+    return missing
@@ -0,0 +1,38 @@
+import os
+
+# Redis streams, keys and channels shared by api, worker and telegram ingest.
+# Every service imports the names from here; the env overrides (separate stacks on
+# one Redis, the bench) apply to all of them at once.
+
+# Execution requests: API and ingest XADD {intent_id, created_at, timings}, the
+# worker's consumer group reads them (worker/consumer.py).
+EXEC_STREAM = os.getenv("EXEC_STREAM", "dupli:exec")
+EXEC_STREAM_MAXLEN = int(os.getenv("EXEC_STREAM_MAXLEN", "100000"))
+EXEC_GROUP = os.getenv("EXEC_GROUP", "exec-workers")
+EXEC_DEAD_STREAM = os.getenv("EXEC_DEAD_STREAM", EXEC_STREAM + ":dead")
+
+# Per-account execution shards (worker/shards.py): stream <prefix><n>, its lease
+# at <prefix><n>:owner, the live workers zset and per-intent completion hashes.
+EXEC_SHARDS = int(os.getenv("EXEC_SHARDS", "16"))  # 0 = fan out inline in the intent consumer
+SHARD_STREAM_PREFIX = os.getenv("EXEC_SHARD_STREAM_PREFIX", "dupli:exec:shard:")
+SHARD_GROUP = "shard-workers"
+WORKERS_KEY = "dupli:exec:workers"
+PROGRESS_PREFIX = "dupli:exec:intent:"
+
+def shard_stream(n: int) -> str:
+    return f"{SHARD_STREAM_PREFIX}{n}"
+
+def lease_key(n: int) -> str:
+    return shard_stream(n) + ":owner"
+
+# Live account states (worker/account_state.py): hash "<PLATFORM>:<external_id>" -> JSON,
+# plus the channel each update is published on.
+ACCOUNT_STATE_KEY = "dupli:accounts:state"
+ACCOUNT_STATE_CHANNEL = "dupli:accounts"
+
+# Bumped by the API on every routing-relevant write; workers reload their snapshot.
+ROUTING_VERSION_KEY = "dupli:routing:version"
+# Master changes, for the telegram ingest master cache.
+MASTERS_CHANNEL = "dupli:masters"
+# Live execution events for dashboards (worker/events.py -> GET /api/events).
+EVENTS_CHANNEL = os.getenv("EVENTS_CHANNEL", "dupli:events")
@@ -0,0 +1,117 @@
+"""Prometheus metrics shared by api, worker and telegram ingest.
+
+Each intent carries stage timestamps (epoch seconds) in its `timings` dict, from
+the Telegram message to the broker ack:
+
+    received, parsed, persisted, enqueued        telegram ingest
+    dequeued, sized, rules, routed, dispatched   worker (intent consumer)
+    first_order (sent), first_ack, last_ack      worker (fan-out / shards)
+
+dupli_stage_seconds{stage} is the time from the previous stamped stage to that
+one, observed by the process that stamps it. Every order also feeds
+dupli_order_seconds{platform,gateway,account} (send -> ack) and
+dupli_signal_to_ack_seconds{platform,gateway} (Telegram message -> its ack).
+
+Observations are handed to a background thread (one queue put on the order path,
+the histogram updates happen off it). With PROMETHEUS_MULTIPROC_DIR set (worker /
+ingest with several processes) every process writes its own files and the
+supervisor serves the merged view. Every service exposes /metrics on its own
+METRICS_PORT, reachable only on the compose network (the API's HTTP port and
+nginx do not serve it).
+"""
+import glob, os, queue, threading
+from typing import Iterable, Optional
+
+from prometheus_client import CollectorRegistry, Counter, Histogram
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+# per-account order histograms: one series set per slave, so opt-in (fine for small farms)
+METRICS_ACCOUNT_LABELS = os.getenv("METRICS_ACCOUNT_LABELS", "0").lower() in ("1", "true", "yes")
+
+STAGES = ("received", "parsed", "persisted", "enqueued", "dequeued", "sized", "rules", "routed", "dispatched",
+          "first_order", "first_ack", "last_ack")
+INGEST_STAGES = ("parsed", "persisted", "enqueued")
+WORKER_STAGES = ("dequeued", "sized", "rules", "routed", "dispatched", "first_order", "first_ack", "last_ack")
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_SECONDS = Histogram("dupli_stage_seconds", "Time from the previous intent stage to this one",
+                          ["stage"], buckets=LATENCY_BUCKETS)
+ORDER_SECONDS = Histogram("dupli_order_seconds", "Order send -> broker/gateway response, per slave",
+                          ["platform", "gateway", "account"], buckets=LATENCY_BUCKETS)
+SIGNAL_TO_ACK_SECONDS = Histogram("dupli_signal_to_ack_seconds", "Signal received -> order acked, per order",
+                                  ["platform", "gateway"], buckets=LATENCY_BUCKETS)
+ORDERS = Counter("dupli_orders", "Orders sent", ["platform", "result"])
+INTENTS = Counter("dupli_intents", "Intents by final status", ["status"])
+HTTP_SECONDS = Histogram("dupli_http_request_seconds", "API request latency", ["method", "route", "status"],
+                         buckets=LATENCY_BUCKETS)
+
+_q: "queue.SimpleQueue" = queue.SimpleQueue()
+_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+
+def _run() -> None:
+    while True:
+        fn, args = _q.get()
+        try:
+            fn(*args)
+        except Exception as e:
+            print(f"WARN: metrics: {e}", flush=True)
+
+def defer(fn, *args) -> None:
+    """Run fn(*args) on the metrics thread (label building and observes stay off the caller's path)."""
+    global _thread
+    if _thread is None:
+        with _lock:
+            if _thread is None:
+                _thread = threading.Thread(target=_run, name="metrics", daemon=True)
+                _thread.start()
+    _q.put((fn, args))
+
+def _observe_stages(timings: dict, stages: Iterable[str]) -> None:
+    wanted = set(stages)
+    prev = None
+    for s in STAGES:
+        t = timings.get(s)
+        if t is None:
+            continue
+        if s in wanted and prev is not None and t >= prev:
+            STAGE_SECONDS.labels(s).observe(t - prev)
+        prev = t
+
+def observe_stages(timings: dict, stages: Iterable[str]) -> None:
+    """Stage durations of `stages` (the ones this process stamps) from an intent's timings."""
+    defer(_observe_stages, dict(timings), tuple(stages))
+
+def record_orders(orders: Iterable[tuple], received: Optional[float] = None) -> None:
+    """orders: (platform, gateway, account, ok, sent_at epoch s, latency s) per order. Synchronous: see defer()."""
+    for platform, gateway, account, ok, sent_at, latency_s in orders:
+        ORDER_SECONDS.labels(platform, gateway, account if METRICS_ACCOUNT_LABELS else "").observe(latency_s)
+        ORDERS.labels(platform, "ok" if ok else "error").inc()
+        if received is not None:
+            SIGNAL_TO_ACK_SECONDS.labels(platform, gateway).observe(max(sent_at + latency_s - received, 0.0))
+
+def observe_intent(status: str) -> None:
+    defer(lambda: INTENTS.labels(status).inc())
+
+def registry():
+    """The registry to expose: merged per-process files in multiprocess mode, else the default one."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        reg = CollectorRegistry()
+        multiprocess.MultiProcessCollector(reg)
+        return reg
+    from prometheus_client import REGISTRY
+    return REGISTRY
+
+def serve(port: int = METRICS_PORT) -> None:
+    """Expose /metrics on `port` (API, worker / ingest supervisor). Call before starting child processes:
+    in multiprocess mode it clears the files of the previous run."""
+    from prometheus_client import start_http_server
+    d = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if d:
+        os.makedirs(d, exist_ok=True)
+        for f in glob.glob(os.path.join(d, "*.db")):
+            os.unlink(f)
+    if port:
+        start_http_server(port, registry=registry())
+        print(f"Metrics on :{port}/metrics", flush=True)
@@ -0,0 +1,180 @@
+"""Versioned schema migrations.
+
+Migrations are SQL files in dupli_core/migrations named NNNN_description.sql and
+are applied in order, each recorded in schema_migrations (version, name, checksum).
+A file starting with "-- migrate: no-transaction" runs statement by statement in
+autocommit (CREATE INDEX CONCURRENTLY); every other file runs in one transaction.
+A Postgres advisory lock serialises concurrent runners. The compose `migrate`
+service runs this before api/worker/telegram start:
+
+    python -m dupli_core.migrate            # apply everything pending
+    python -m dupli_core.migrate --status   # list applied / pending
+    python -m dupli_core.migrate --to 1     # stop after version 1
+"""
+import argparse, hashlib, os, re, sys
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+NO_TRANSACTION = "-- migrate: no-transaction"
+LOCK_KEY = 0x6475706C69  # "dupli"
+_FILE_RE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+_CONCURRENT_INDEX_RE = re.compile(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)", re.I)
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    sql: str
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.sql.encode()).hexdigest()[:16]
+
+    @property
+    def transactional(self) -> bool:
+        return not self.sql.lstrip().startswith(NO_TRANSACTION)
+
+    def __str__(self) -> str:
+        return f"{self.version:04d}_{self.name}"
+
+def discover(path: str = MIGRATIONS_DIR) -> list[Migration]:
+    out = []
+    for fn in sorted(os.listdir(path)):
+        m = _FILE_RE.match(fn)
+        if m:
+            with open(os.path.join(path, fn), encoding="utf-8") as f:
+                out.append(Migration(int(m.group(1)), m.group(2), f.read()))
+    versions = [m.version for m in out]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f"duplicate migration versions in {path}")
+    return out
+
+def split_statements(sql: str) -> list[str]:
+    """Split on top-level semicolons (not inside quotes, $$ bodies or comments)."""
+    stmts, buf, i, n = [], [], 0, len(sql)
+    quote = None  # "'", '"' or "$$"
+    while i < n:
+        c = sql[i]
+        if quote is None and sql.startswith("--", i):
+            j = sql.find("\n", i)
+            i = n if j < 0 else j + 1
+            continue
+        if quote is None and sql.startswith("$$", i) or quote == "$$" and sql.startswith("$$", i):
+            quote = None if quote else "$$"
+            buf.append("$$")
+            i += 2
+            continue
+        if quote is None and c in "'\"":
+            quote = c
+        elif quote == c:
+            quote = None
+        if c == ";" and quote is None:
+            stmt = "".join(buf).strip()
+            if stmt:
+                stmts.append(stmt)
+            buf = []
+        else:
+            buf.append(c)
+        i += 1
+    tail = "".join(buf).strip()
+    if tail:
+        stmts.append(tail)
+    return stmts
+
+_TABLE_SQL = """CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(200) NOT NULL,
+    checksum VARCHAR(64) NOT NULL,
+    applied_at TIMESTAMP WITH TIME ZONE DEFAULT now())"""
+
+def applied_versions(conn) -> dict[int, str]:
+    """version -> checksum of applied migrations ({} before the first run). `conn`: psycopg connection."""
+    if conn.execute("SELECT to_regclass('schema_migrations')").fetchone()[0] is None:
+        return {}
+    return dict(conn.execute("SELECT version, checksum FROM schema_migrations").fetchall())
+
+@contextmanager
+def autocommit_connection(bind=None, search_path: Optional[str] = None):
+    """A pooled psycopg connection in autocommit mode, restored before it goes back to the pool."""
+    from .db import get_engine
+    raw = (bind or get_engine()).raw_connection()
+    conn = raw.driver_connection
+    conn.autocommit = True
+    try:
+        if search_path:
+            conn.execute(f"SET search_path TO {search_path}")
+        yield conn
+    finally:
+        try:
+            if search_path:
+                conn.execute("RESET search_path")
+            conn.autocommit = False
+        finally:
+            raw.close()
+
+def _apply(conn, m: Migration) -> None:
+    if m.transactional:
+        with conn.transaction():
+            conn.execute(m.sql)
+            conn.execute("INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                         (m.version, m.name, m.checksum))
+        return
+    # a failed CONCURRENTLY build leaves an INVALID index that IF NOT EXISTS would keep
+    for name in _CONCURRENT_INDEX_RE.findall(m.sql):
+        invalid = conn.execute("SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                               "WHERE c.relname = %s AND c.relnamespace = current_schema()::regnamespace "
+                               "AND NOT i.indisvalid", (name,)).fetchone()
+        if invalid:
+            print(f"  dropping invalid index {name} left by an interrupted build", flush=True)
+            conn.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+    for stmt in split_statements(m.sql):
+        conn.execute(stmt)
+    conn.execute("INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                 (m.version, m.name, m.checksum))
+
+def migrate(bind=None, target: Optional[int] = None, search_path: Optional[str] = None) -> list[Migration]:
+    """Apply pending migrations up to `target` (default: all); returns the ones applied."""
+    with autocommit_connection(bind, search_path) as conn:
+        conn.execute("SELECT pg_advisory_lock(%s)", (LOCK_KEY,))
+        try:
+            conn.execute(_TABLE_SQL)
+            done = applied_versions(conn)
+            ran = []
+            for m in discover():
+                if target is not None and m.version > target:
+                    break
+                if m.version in done:
+                    if done[m.version] != m.checksum:
+                        print(f"WARN: migration {m} was edited after it was applied", flush=True)
+                    continue
+                print(f"Applying migration {m} ...", flush=True)
+                _apply(conn, m)
+                ran.append(m)
+            return ran
+        finally:
+            conn.execute("SELECT pg_advisory_unlock(%s)", (LOCK_KEY,))
+
+def pending(bind=None) -> list[Migration]:
+    with autocommit_connection(bind) as conn:
+        done = applied_versions(conn)
+    return [m for m in discover() if m.version not in done]
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--status", action="store_true", help="list applied / pending migrations and exit")
+    ap.add_argument("--to", type=int, default=None, metavar="VERSION", help="apply up to this version")
+    args = ap.parse_args()
+    from .db import configure
+    configure("migrate", pool_size=1, max_overflow=0)
+    if args.status:
+        todo = {m.version for m in pending()}
+        for m in discover():
+            print(f"{'pending' if m.version in todo else 'applied'}  {m}")
+        return
+    ran = migrate(target=args.to)
+    print(f"{len(ran)} migration(s) applied" if ran else "Schema is up to date", flush=True)
+
+if __name__ == "__main__":
+    sys.exit(main())
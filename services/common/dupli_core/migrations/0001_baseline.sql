@@ -0,0 +1,154 @@
+-- 0001 baseline: the v0.1 schema as created by create_all() plus the column upgrades
+-- the API used to apply at startup. Idempotent, so databases created before
+-- migrations existed are adopted as they are.
+CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+
+CREATE TABLE IF NOT EXISTS masters (
+    id UUID NOT NULL,
+    name VARCHAR(200) NOT NULL,
+    source VARCHAR(50) NOT NULL,
+    is_active BOOLEAN,
+    auto_execute BOOLEAN,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS prop_firms (
+    id UUID NOT NULL,
+    name VARCHAR(200) NOT NULL,
+    weekend_trading BOOLEAN,
+    news_red_block BOOLEAN,
+    news_blackout BOOLEAN,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    PRIMARY KEY (id),
+    UNIQUE (name)
+);
+
+CREATE TABLE IF NOT EXISTS risk_profiles (
+    id UUID NOT NULL,
+    name VARCHAR(200) NOT NULL,
+    method VARCHAR(50) NOT NULL,
+    risk_percent FLOAT,
+    fixed_lot FLOAT,
+    max_lot FLOAT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS telegram_channel_health (
+    chat_id BIGINT NOT NULL,
+    shard INTEGER,
+    messages_total INTEGER,
+    signals_total INTEGER,
+    last_message_at TIMESTAMP WITH TIME ZONE,
+    last_lag_ms FLOAT,
+    max_lag_ms FLOAT,
+    updated_at TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (chat_id)
+);
+
+CREATE TABLE IF NOT EXISTS accounts (
+    id UUID NOT NULL,
+    name VARCHAR(200) NOT NULL,
+    platform VARCHAR(20) NOT NULL,
+    prop_firm_id UUID,
+    risk_profile_id UUID,
+    external_id VARCHAR(200),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    PRIMARY KEY (id),
+    FOREIGN KEY(prop_firm_id) REFERENCES prop_firms (id),
+    FOREIGN KEY(risk_profile_id) REFERENCES risk_profiles (id)
+);
+
+CREATE TABLE IF NOT EXISTS copy_sets (
+    id UUID NOT NULL,
+    name VARCHAR(200) NOT NULL,
+    master_id UUID NOT NULL,
+    is_active BOOLEAN,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    PRIMARY KEY (id),
+    FOREIGN KEY(master_id) REFERENCES masters (id)
+);
+
+CREATE TABLE IF NOT EXISTS telegram_channels (
+    id UUID NOT NULL,
+    chat_id BIGINT NOT NULL,
+    title VARCHAR(200),
+    session_name VARCHAR(100) NOT NULL,
+    grammar VARCHAR(50),
+    master_id UUID,
+    is_active BOOLEAN,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    PRIMARY KEY (id),
+    UNIQUE (chat_id),
+    FOREIGN KEY(master_id) REFERENCES masters (id)
+);
+
+CREATE TABLE IF NOT EXISTS trade_intents (
+    id UUID NOT NULL,
+    master_id UUID NOT NULL,
+    symbol VARCHAR(50) NOT NULL,
+    side VARCHAR(10) NOT NULL,
+    order_type VARCHAR(20) NOT NULL,
+    entry FLOAT,
+    zone_low FLOAT,
+    zone_high FLOAT,
+    sl FLOAT,
+    tps TEXT,
+    raw_text TEXT,
+    status VARCHAR(20),
+    timings TEXT,
+    action VARCHAR(20),
+    parent_id UUID,
+    source_chat_id BIGINT,
+    source_message_id BIGINT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    PRIMARY KEY (id),
+    FOREIGN KEY(master_id) REFERENCES masters (id)
+);
+
+CREATE TABLE IF NOT EXISTS copy_set_slaves (
+    id UUID NOT NULL,
+    copy_set_id UUID NOT NULL,
+    account_id UUID NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(copy_set_id) REFERENCES copy_sets (id),
+    FOREIGN KEY(account_id) REFERENCES accounts (id)
+);
+
+CREATE TABLE IF NOT EXISTS execution_logs (
+    id UUID NOT NULL,
+    trade_intent_id UUID NOT NULL,
+    account_id UUID NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    message TEXT,
+    latency_ms FLOAT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    PRIMARY KEY (id),
+    FOREIGN KEY(trade_intent_id) REFERENCES trade_intents (id),
+    FOREIGN KEY(account_id) REFERENCES accounts (id)
+);
+
+CREATE TABLE IF NOT EXISTS rule_sets (
+    id UUID NOT NULL,
+    name VARCHAR(200) NOT NULL,
+    prop_firm_id UUID,
+    account_id UUID,
+    rules TEXT NOT NULL,
+    is_active BOOLEAN,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    PRIMARY KEY (id),
+    FOREIGN KEY(prop_firm_id) REFERENCES prop_firms (id),
+    FOREIGN KEY(account_id) REFERENCES accounts (id)
+);
+
+-- columns added after v0.1 (databases created by an older create_all)
+ALTER TABLE execution_logs ADD COLUMN IF NOT EXISTS latency_ms DOUBLE PRECISION;
+ALTER TABLE masters ADD COLUMN IF NOT EXISTS auto_execute BOOLEAN DEFAULT FALSE;
+ALTER TABLE trade_intents ADD COLUMN IF NOT EXISTS timings TEXT;
+ALTER TABLE telegram_channels ADD COLUMN IF NOT EXISTS grammar VARCHAR(50);
+ALTER TABLE trade_intents ADD COLUMN IF NOT EXISTS action VARCHAR(20) DEFAULT 'OPEN';
+ALTER TABLE trade_intents ADD COLUMN IF NOT EXISTS parent_id UUID;
+ALTER TABLE trade_intents ADD COLUMN IF NOT EXISTS source_chat_id BIGINT;
+ALTER TABLE trade_intents ADD COLUMN IF NOT EXISTS source_message_id BIGINT;
+ALTER TABLE prop_firms ADD COLUMN IF NOT EXISTS news_blackout BOOLEAN DEFAULT FALSE;
@@ -0,0 +1,38 @@
+-- migrate: no-transaction
+-- 0002 secondary indexes for the hot queries (built CONCURRENTLY: no write lock on
+-- live tables, hence outside a transaction; IF NOT EXISTS makes a rerun safe).
+
+-- worker routing snapshot: active copysets ordered by master, then their slaves
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_copy_sets_master_active
+    ON copy_sets (master_id, id) WHERE is_active;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_copy_set_slaves_copy_set
+    ON copy_set_slaves (copy_set_id, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_copy_set_slaves_account
+    ON copy_set_slaves (account_id);
+
+-- API / dashboard: latest intents, per master, and the still-open ones
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_trade_intents_created
+    ON trade_intents (created_at DESC, id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_trade_intents_master_created
+    ON trade_intents (master_id, created_at DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_trade_intents_open_status
+    ON trade_intents (status, created_at) WHERE status IN ('NEW', 'QUEUED', 'DISPATCHED');
+-- telegram follow-ups: original signal of a reply / edit
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_trade_intents_source_message
+    ON trade_intents (source_chat_id, source_message_id) WHERE source_message_id IS NOT NULL;
+
+-- telegram ingest: default master lookup
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_masters_source_active
+    ON masters (source) WHERE is_active;
+
+-- execution logs of an intent / history of an account
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_execution_logs_intent
+    ON execution_logs (trade_intent_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_execution_logs_account_created
+    ON execution_logs (account_id, created_at DESC);
+
+-- routing snapshot joins / rule set owners
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_accounts_prop_firm
+    ON accounts (prop_firm_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_rule_sets_owner_active
+    ON rule_sets (prop_firm_id, account_id) WHERE is_active;
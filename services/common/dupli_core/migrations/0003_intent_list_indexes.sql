@@ -0,0 +1,18 @@
+-- migrate: no-transaction
+-- 0003 indexes for the keyset-paginated API lists: every filter of
+-- GET /api/trade_intents ends with (created_at DESC, id DESC), so the next page
+-- is a range scan on the same index as the first one.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_trade_intents_master_created_id
+    ON trade_intents (master_id, created_at DESC, id DESC);
+DROP INDEX CONCURRENTLY IF EXISTS ix_trade_intents_master_created;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_trade_intents_symbol_created_id
+    ON trade_intents (symbol, created_at DESC, id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_trade_intents_status_created_id
+    ON trade_intents (status, created_at DESC, id DESC);
+
+-- GET /api/accounts (newest first) and /api/props (by name)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_accounts_created_id
+    ON accounts (created_at DESC, id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_prop_firms_name_id
+    ON prop_firms (name, id);
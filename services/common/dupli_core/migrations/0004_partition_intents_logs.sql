@@ -0,0 +1,86 @@
+-- 0004 monthly range partitions (on created_at, UTC months) for trade_intents and
+-- execution_logs, the two tables that grow with every signal. Old months are
+-- detached, archived and dropped by dupli_core.retention instead of DELETE + vacuum.
+--
+-- The existing rows are copied once into the partitioned tables (the services wait
+-- for the migrate service, so nothing writes meanwhile). A partitioned table's
+-- primary key must contain the partition key, hence PRIMARY KEY (id, created_at);
+-- execution_logs.trade_intent_id can no longer be a foreign key to trade_intents
+-- (it would need a unique id alone) and stays a plain indexed column.
+
+-- One table per month, named <parent>_pYYYYMM, plus <parent>_default for rows
+-- outside every partition (so an insert never fails if the retention job has not
+-- created next month's table yet). Rows already in the default for that month are
+-- moved into the new partition. Idempotent: returns NULL if it exists.
+CREATE OR REPLACE FUNCTION dupli_ensure_month_partition(parent text, month date) RETURNS text
+LANGUAGE plpgsql AS $$
+DECLARE
+    month_start date := date_trunc('month', month)::date;
+    lo timestamptz := month_start::timestamp AT TIME ZONE 'UTC';
+    hi timestamptz := (month_start + interval '1 month') AT TIME ZONE 'UTC';
+    part text := parent || '_p' || to_char(month_start, 'YYYYMM');
+BEGIN
+    IF to_regclass(part) IS NOT NULL THEN
+        RETURN NULL;
+    END IF;
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)', part, parent);
+    EXECUTE format('WITH moved AS (DELETE FROM %I WHERE created_at >= %L AND created_at < %L RETURNING *) '
+                   'INSERT INTO %I SELECT * FROM moved', parent || '_default', lo, hi, part);
+    EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', parent, part, lo, hi);
+    RETURN part;
+END $$;
+
+ALTER TABLE execution_logs RENAME TO execution_logs_legacy;
+ALTER INDEX execution_logs_pkey RENAME TO execution_logs_legacy_pkey;
+ALTER TABLE trade_intents RENAME TO trade_intents_legacy;
+ALTER INDEX trade_intents_pkey RENAME TO trade_intents_legacy_pkey;
+UPDATE trade_intents_legacy SET created_at = now() WHERE created_at IS NULL;
+UPDATE execution_logs_legacy SET created_at = now() WHERE created_at IS NULL;
+
+CREATE TABLE trade_intents (LIKE trade_intents_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (created_at);
+ALTER TABLE trade_intents ALTER COLUMN created_at SET NOT NULL;
+ALTER TABLE trade_intents ADD PRIMARY KEY (id, created_at);
+ALTER TABLE trade_intents ADD FOREIGN KEY (master_id) REFERENCES masters (id);
+CREATE TABLE trade_intents_default PARTITION OF trade_intents DEFAULT;
+
+CREATE TABLE execution_logs (LIKE execution_logs_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (created_at);
+ALTER TABLE execution_logs ALTER COLUMN created_at SET NOT NULL;
+ALTER TABLE execution_logs ADD PRIMARY KEY (id, created_at);
+ALTER TABLE execution_logs ADD FOREIGN KEY (account_id) REFERENCES accounts (id);
+CREATE TABLE execution_logs_default PARTITION OF execution_logs DEFAULT;
+
+-- every month that has rows, through three months ahead (then dupli_core.retention)
+DO $$
+DECLARE
+    t text;
+    m date;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['trade_intents', 'execution_logs'] LOOP
+        FOR m IN EXECUTE format(
+            'SELECT generate_series(date_trunc(''month'', coalesce(min(created_at), now()) AT TIME ZONE ''UTC''), '
+            '       date_trunc(''month'', now() AT TIME ZONE ''UTC'') + interval ''3 months'', interval ''1 month'')::date '
+            'FROM %I', t || '_legacy') LOOP
+            PERFORM dupli_ensure_month_partition(t, m);
+        END LOOP;
+    END LOOP;
+END $$;
+
+INSERT INTO trade_intents SELECT * FROM trade_intents_legacy;
+INSERT INTO execution_logs SELECT * FROM execution_logs_legacy;
+DROP TABLE execution_logs_legacy;
+DROP TABLE trade_intents_legacy;
+
+-- the 0002 / 0003 indexes, now on the parents (created on every partition, present and future)
+CREATE INDEX ix_trade_intents_created ON trade_intents (created_at DESC, id DESC);
+CREATE INDEX ix_trade_intents_master_created_id ON trade_intents (master_id, created_at DESC, id DESC);
+CREATE INDEX ix_trade_intents_symbol_created_id ON trade_intents (symbol, created_at DESC, id DESC);
+CREATE INDEX ix_trade_intents_status_created_id ON trade_intents (status, created_at DESC, id DESC);
+CREATE INDEX ix_trade_intents_open_status
+    ON trade_intents (status, created_at) WHERE status IN ('NEW', 'QUEUED', 'DISPATCHED');
+CREATE INDEX ix_trade_intents_source_message
+    ON trade_intents (source_chat_id, source_message_id) WHERE source_message_id IS NOT NULL;
+CREATE INDEX ix_execution_logs_intent ON execution_logs (trade_intent_id);
+CREATE INDEX ix_execution_logs_account_created ON execution_logs (account_id, created_at DESC);
+
+ANALYZE trade_intents;
+ANALYZE execution_logs;
@@ -0,0 +1,5 @@
+-- 0005 masters.auto_execute defaults to false. 0001 created the column without a
+-- default on fresh databases, while databases upgraded from v0.1 got DEFAULT FALSE
+-- from its ADD COLUMN; this makes both the same. (0001 itself stays as applied.)
+UPDATE masters SET auto_execute = FALSE WHERE auto_execute IS NULL;
+ALTER TABLE masters ALTER COLUMN auto_execute SET DEFAULT FALSE;
@@ -1,9 +1,14 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Float
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, ForeignKey, Text, Float
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy.sql import func
+from datetime import datetime, timezone
 import uuid
-from .db import Base
+
+# The one model definition shared by api, worker and telegram ingest. Schema changes
+# go through a new file in dupli_core/migrations; the services only verify the live
+# schema at startup (dupli_core.db.check_schema).
+Base = declarative_base()
 
 class PropFirm(Base):
     __tablename__ = "prop_firms"
@@ -11,6 +16,7 @@ class PropFirm(Base):
     name = Column(String(200), unique=True, nullable=False)
     weekend_trading = Column(Boolean, default=False)
     news_red_block = Column(Boolean, default=False)  # manual switch in v0.1
+    news_blackout = Column(Boolean, default=False)  # block around red news from the trading calendar
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class RiskProfile(Base):
@@ -44,6 +50,7 @@ class Master(Base):
     name = Column(String(200), nullable=False)
     source = Column(String(50), nullable=False)  # telegram | ctrader | manual
     is_active = Column(Boolean, default=True)
+    auto_execute = Column(Boolean, default=False)  # ingest enqueues intents without an operator click
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class CopySet(Base):
@@ -65,6 +72,22 @@ class CopySetSlave(Base):
     copy_set = relationship("CopySet")
     account = relationship("Account")
 
+class RuleSet(Base):
+    # declarative entry rules for one prop (all its accounts) or one account; the worker
+    # compiles every active set into per-slave predicates (worker/rulesets.py)
+    __tablename__ = "rule_sets"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    name = Column(String(200), nullable=False)
+    prop_firm_id = Column(UUID(as_uuid=True), ForeignKey("prop_firms.id"), nullable=True)
+    account_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id"), nullable=True)
+    rules = Column(Text, nullable=False, default="{}")  # JSON, see schemas.RuleSpec
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+# trade_intents and execution_logs are partitioned by month on created_at (migration
+# 0004, dupli_core.retention): the database key is (id, created_at). TradeIntent is
+# mapped with that key too, so db.get() and ORM updates name the row's partition;
+# a lookup by id alone probes every attached partition (see README_DEPLOY).
 class TradeIntent(Base):
     __tablename__ = "trade_intents"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -80,16 +103,50 @@ class TradeIntent(Base):
     tps = Column(Text, nullable=True)  # JSON string v0.1
 
     raw_text = Column(Text, nullable=True)
-    status = Column(String(20), default="NEW")  # NEW|QUEUED|DONE|FAILED|BLOCKED
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    status = Column(String(20), default="NEW")  # NEW|QUEUED|DISPATCHED|DONE|FAILED|BLOCKED
+    timings = Column(Text, nullable=True)  # JSON {stage: epoch seconds}: received, parsed, enqueued, dequeued, first_order, ...
+    action = Column(String(20), default="OPEN")  # OPEN|MODIFY|BREAKEVEN|CLOSE|CLOSE_PARTIAL
+    parent_id = Column(UUID(as_uuid=True), nullable=True)  # original OPEN intent of an edit/follow-up
+    source_chat_id = Column(BigInteger, nullable=True)
+    source_message_id = Column(BigInteger, nullable=True)
+    # set client-side: part of the ORM identity, known without reading the row back
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc),
+                        server_default=func.now())
 
     master = relationship("Master")
+    __mapper_args__ = {"primary_key": [id, created_at]}
 
 class ExecutionLog(Base):
     __tablename__ = "execution_logs"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    trade_intent_id = Column(UUID(as_uuid=True), ForeignKey("trade_intents.id"), nullable=False)
+    trade_intent_id = Column(UUID(as_uuid=True), nullable=False)  # no FK: trade_intents is partitioned
     account_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id"), nullable=False)
     status = Column(String(20), nullable=False)  # OK|ERROR|SKIPPED
     message = Column(Text, nullable=True)
+    latency_ms = Column(Float, nullable=True)  # send -> broker/gateway response
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+class TelegramChannel(Base):
+    __tablename__ = "telegram_channels"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    chat_id = Column(BigInteger, unique=True, nullable=False)  # e.g. -100123...
+    title = Column(String(200), nullable=True)
+    session_name = Column(String(100), nullable=False, default="default")  # key into TELEGRAM_SESSIONS
+    grammar = Column(String(50), nullable=True)  # signal parser grammar (telegram_ingest.parser.GRAMMARS), null = default
+    master_id = Column(UUID(as_uuid=True), ForeignKey("masters.id"), nullable=True)  # null = default telegram master
+    is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    master = relationship("Master")
+
+class TelegramChannelHealth(Base):
+    # written by the ingest processes every INGEST_HEALTH_INTERVAL_S
+    __tablename__ = "telegram_channel_health"
+    chat_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    shard = Column(Integer, nullable=True)
+    messages_total = Column(Integer, default=0)
+    signals_total = Column(Integer, default=0)
+    last_message_at = Column(DateTime(timezone=True), nullable=True)
+    last_lag_ms = Column(Float, nullable=True)  # Telegram message date -> receipt by ingest
+    max_lag_ms = Column(Float, nullable=True)  # over the last reporting interval
+    updated_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,137 @@
+"""Partition maintenance and retention for trade_intents / execution_logs.
+
+Both tables are partitioned by UTC month (migration 0004). Each run:
+  1. creates the partitions of the next PARTITION_MONTHS_AHEAD months;
+  2. for every month older than the table's retention, detaches the partition,
+     writes it to ARCHIVE_DIR/<table>_pYYYYMM.csv.gz (CSV with header), checks the
+     row count and drops it;
+  3. warns when rows landed in <table>_default (a month without its partition).
+The API and the services keep reading the parent tables, i.e. the hot months.
+The compose `retention` service runs it once a day:
+
+    python -m dupli_core.retention                # one pass
+    python -m dupli_core.retention --dry-run      # only list what would be archived
+    python -m dupli_core.retention --loop 86400   # forever, every N seconds
+
+Restoring a month: CREATE TABLE x (LIKE trade_intents); then
+    \\copy x FROM PROGRAM 'gunzip -c trade_intents_p202401.csv.gz' WITH (FORMAT csv, HEADER true)
+"""
+import argparse, csv, gzip, os, re, sys, time
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from .migrate import autocommit_connection
+
+# table -> months kept attached besides the current one
+RETENTION_MONTHS = {
+    "trade_intents": int(os.getenv("RETENTION_TRADE_INTENTS_MONTHS", "12")),
+    "execution_logs": int(os.getenv("RETENTION_EXECUTION_LOGS_MONTHS", "6")),
+}
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "/archive")
+DETACH_LOCK_TIMEOUT = os.getenv("RETENTION_LOCK_TIMEOUT", "5s")
+_PART_RE = re.compile(r"_p(\d{4})(\d{2})$")
+
+def add_months(d: date, n: int) -> date:
+    y, m = divmod(d.year * 12 + d.month - 1 + n, 12)
+    return date(y, m + 1, 1)
+
+def partitions(conn, table: str) -> list[tuple[date, str, bool]]:
+    """(month, partition name, attached) of the monthly tables of `table`, oldest first."""
+    rows = conn.execute(
+        "SELECT c.relname, i.inhparent IS NOT NULL FROM pg_class c "
+        "LEFT JOIN pg_inherits i ON i.inhrelid = c.oid "
+        "WHERE c.relnamespace = current_schema()::regnamespace AND c.relkind = 'r' "
+        "AND c.relname ~ %s", (f"^{table}_p[0-9]{{6}}$",)).fetchall()
+    out = []
+    for name, attached in rows:
+        m = _PART_RE.search(name)
+        out.append((date(int(m.group(1)), int(m.group(2)), 1), name, attached))
+    return sorted(out)
+
+def ensure_partitions(conn, table: str, today: date, ahead: int = PARTITION_MONTHS_AHEAD) -> list[str]:
+    created = []
+    for n in range(ahead + 1):
+        name = conn.execute("SELECT dupli_ensure_month_partition(%s, %s)",
+                            (table, add_months(today, n))).fetchone()[0]
+        if name:
+            created.append(name)
+    return created
+
+def archive_partition(conn, table: str, part: str, archive_dir: str) -> int:
+    """Detach (if needed), dump to <part>.csv.gz, verify and drop; returns the rows archived."""
+    with conn.transaction():
+        conn.execute(f"SET LOCAL lock_timeout = '{DETACH_LOCK_TIMEOUT}'")
+        attached = conn.execute("SELECT 1 FROM pg_inherits WHERE inhrelid = %s::regclass", (part,)).fetchone()
+        if attached:
+            conn.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{part}"')
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{part}.csv.gz")
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as f, \
+                conn.cursor().copy(f'COPY (SELECT * FROM "{part}") TO STDOUT WITH (FORMAT csv, HEADER true)') as cp:
+            for chunk in cp:
+                f.write(chunk)
+        raw.flush()
+        os.fsync(raw.fileno())
+    with gzip.open(tmp, "rt", newline="") as f:
+        written = sum(1 for _ in csv.reader(f)) - 1  # records, not lines: raw_text holds newlines
+    rows = conn.execute(f'SELECT count(*) FROM "{part}"').fetchone()[0]
+    if written != rows:
+        os.unlink(tmp)
+        raise RuntimeError(f"{part}: archived {written} of {rows} rows; partition kept (detached)")
+    os.replace(tmp, path)
+    conn.execute(f'DROP TABLE "{part}"')
+    return rows
+
+def run_once(conn, today: Optional[date] = None, dry_run: bool = False, archive_dir: str = ARCHIVE_DIR) -> None:
+    today = (today or datetime.now(timezone.utc).date()).replace(day=1)
+    for table, keep in RETENTION_MONTHS.items():
+        if conn.execute("SELECT to_regclass(%s)", (f"{table}_default",)).fetchone()[0] is None:
+            print(f"WARN: {table} is not partitioned (run `python -m dupli_core.migrate`)", flush=True)
+            continue
+        if not dry_run:
+            for name in ensure_partitions(conn, table, today):
+                print(f"Created partition {name}", flush=True)
+        cutoff = add_months(today, -keep)
+        for month, name, attached in partitions(conn, table):
+            if month >= cutoff:
+                continue
+            if dry_run:
+                print(f"Would archive {name} ({'attached' if attached else 'detached'}) to {archive_dir}")
+                continue
+            t0 = time.perf_counter()
+            try:
+                rows = archive_partition(conn, table, name, archive_dir)
+            except Exception as e:
+                print(f"ERROR: archiving {name}: {e}", flush=True)
+                continue
+            print(f"Archived {name}: {rows} rows in {time.perf_counter() - t0:.1f} s", flush=True)
+        stray = conn.execute(f'SELECT count(*) FROM "{table}_default"').fetchone()[0]
+        if stray:
+            print(f"WARN: {stray} rows in {table}_default (months without a partition); "
+                  f"they move into their partition when it is created", flush=True)
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument("--loop", type=float, default=0, metavar="SECONDS", help="run forever with this interval")
+    ap.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    args = ap.parse_args()
+    from .db import configure
+    configure("retention", pool_size=1, max_overflow=0)
+    while True:
+        try:
+            with autocommit_connection() as conn:
+                run_once(conn, dry_run=args.dry_run, archive_dir=args.archive_dir)
+        except Exception as e:
+            if not args.loop:
+                raise
+            print(f"ERROR: retention pass failed: {e}", flush=True)
+        if not args.loop:
+            return
+        time.sleep(args.loop)
+
+if __name__ == "__main__":
+    sys.exit(main())
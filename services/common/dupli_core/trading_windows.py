@@ -0,0 +1,164 @@
+import bisect, json, os, threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+# Trading-window calendar. Each prop's blocked time (weekend, outside session hours,
+# holidays, red-news blackouts) is compiled into merged, sorted UTC intervals over a
+# rolling horizon, so "can this prop trade now" is one bisect. The compiled index is
+# cached per prop settings and rebuilt when the horizon runs out or the calendar file
+# changes. Calendar file (TRADING_CALENDAR_FILE, JSON):
+#
+#   {"timezone": "Europe/Rome",
+#    "holidays": ["2026-12-25"],
+#    "news": [{"start": "2026-11-06T13:30:00Z", "title": "US NFP", "impact": "red"}],
+#    "news_buffer_min": 5,
+#    "sessions": {"<prop name>": [{"days": [0, 1, 2, 3, 4], "start": "01:05", "end": "23:50"}]}}
+#
+# Weekends and holidays block props without weekend_trading; red news (+/- buffer)
+# blocks props with news_blackout; props without sessions may trade all day.
+TRADING_CALENDAR_FILE = os.getenv("TRADING_CALENDAR_FILE", "/app/calendar/trading_calendar.json")
+CALENDAR_HORIZON_DAYS = int(os.getenv("CALENDAR_HORIZON_DAYS", "14"))
+CALENDAR_CHECK_S = float(os.getenv("CALENDAR_CHECK_S", "30"))  # how often the file mtime is checked
+DEFAULT_TZ = "Europe/Rome"
+
+@dataclass(frozen=True)
+class PropWindows:
+    """Blocked intervals of one prop: starts[i] <= t < ends[i] means blocked for reasons[i]."""
+    starts: tuple
+    ends: tuple
+    reasons: tuple
+    valid_from: float
+    valid_until: float
+
+    def blocked(self, t: float) -> Optional[str]:
+        i = bisect.bisect_right(self.starts, t) - 1
+        if i >= 0 and t < self.ends[i]:
+            return self.reasons[i]
+        return None
+
+def _merge(intervals: list[tuple[float, float, str]]) -> list[list]:
+    merged: list[list] = []
+    for s, e, why in sorted(intervals):
+        if merged and s < merged[-1][1]:
+            last = merged[-1]
+            last[1] = max(last[1], e)
+            if why not in last[2]:
+                last[2] += f"; {why}"
+        else:
+            merged.append([s, e, why])
+    return merged
+
+def _parse_ts(value: str) -> float:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+def _hhmm(value: str) -> timedelta:
+    h, m = value.split(":")
+    return timedelta(hours=int(h), minutes=int(m))
+
+class TradingCalendar:
+    def __init__(self, path: str = TRADING_CALENDAR_FILE):
+        self.path = path
+        self._mtime: Optional[float] = None
+        self._checked = 0.0
+        self._data: dict = {}
+        self._cache: dict[tuple, PropWindows] = {}
+        self._lock = threading.Lock()
+
+    def _reload_if_changed(self, now: float) -> None:
+        if now - self._checked < CALENDAR_CHECK_S and self._checked:
+            return
+        self._checked = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        data = {}
+        if mtime is not None:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"WARN: trading calendar {self.path} unreadable, keeping previous: {e}", flush=True)
+                return
+        self._data, self._mtime = data, mtime
+        self._cache.clear()
+        print(f"Trading calendar loaded: {len(data.get('holidays') or [])} holidays, "
+              f"{len(data.get('news') or [])} news events", flush=True)
+
+    def compile(self, prop_name: str, weekend_trading: bool, news_blackout: bool, now: float) -> PropWindows:
+        data = self._data
+        tz = ZoneInfo(data.get("timezone") or DEFAULT_TZ)
+        holidays = set(data.get("holidays") or [])
+        sessions = (data.get("sessions") or {}).get(prop_name) or []
+        first = datetime.fromtimestamp(now, tz).date() - timedelta(days=1)
+        intervals = []
+        for d in (first + timedelta(days=i) for i in range(CALENDAR_HORIZON_DAYS + 2)):
+            day_start = datetime(d.year, d.month, d.day, tzinfo=tz)
+            day_end = datetime.combine(d + timedelta(days=1), datetime.min.time(), tzinfo=tz)
+            if not weekend_trading and (d.weekday() >= 5 or d.isoformat() in holidays):
+                intervals.append((day_start.timestamp(), day_end.timestamp(),
+                                  "Weekend" if d.weekday() >= 5 else f"Holiday {d.isoformat()}"))
+                continue
+            if sessions:
+                open_ranges = sorted((day_start + _hhmm(s["start"]), day_start + _hhmm(s["end"]))
+                                     for s in sessions if d.weekday() in s.get("days", range(7)))
+                cursor = day_start
+                for s, e in open_ranges:
+                    if s > cursor:
+                        intervals.append((cursor.timestamp(), s.timestamp(), "Outside session hours"))
+                    cursor = max(cursor, e)
+                if cursor < day_end:
+                    intervals.append((cursor.timestamp(), day_end.timestamp(), "Outside session hours"))
+        if news_blackout:
+            buffer_s = float(data.get("news_buffer_min", 5)) * 60.0
+            for ev in data.get("news") or []:
+                if (ev.get("impact") or "red").lower() != "red":
+                    continue
+                start = _parse_ts(ev["start"])
+                end = _parse_ts(ev["end"]) if ev.get("end") else start
+                intervals.append((start - buffer_s, end + buffer_s, f"Red news: {ev.get('title') or 'event'}"))
+        merged = _merge(intervals)
+        horizon_end = datetime.combine(first + timedelta(days=CALENDAR_HORIZON_DAYS), datetime.min.time(), tzinfo=tz)
+        return PropWindows(starts=tuple(m[0] for m in merged), ends=tuple(m[1] for m in merged),
+                           reasons=tuple(m[2] for m in merged),
+                           valid_from=datetime(first.year, first.month, first.day, tzinfo=tz).timestamp(),
+                           valid_until=horizon_end.timestamp())
+
+    def windows(self, prop_name: str, weekend_trading: bool, news_blackout: bool, now: float) -> PropWindows:
+        key = (prop_name, bool(weekend_trading), bool(news_blackout))
+        with self._lock:
+            self._reload_if_changed(now)
+            w = self._cache.get(key)
+            if w is None or not w.valid_from <= now < w.valid_until:
+                w = self._cache[key] = self.compile(prop_name, bool(weekend_trading), bool(news_blackout), now)
+            return w
+
+    def blocked_props(self, routes, now: Optional[datetime] = None) -> dict:
+        """prop_firm_id -> block reason for every prop of `routes` that cannot trade now (one bisect per prop)."""
+        t = (now or datetime.now(timezone.utc)).timestamp()
+        out = {}
+        seen = set()
+        for r in routes:
+            pid = r.prop_firm_id
+            if pid is None or pid in seen:
+                continue
+            seen.add(pid)
+            if r.news_red_block:
+                out[pid] = f"NEWS_RED block active for prop '{r.prop_name}'"
+                continue
+            why = self.windows(r.prop_name, r.weekend_trading, r.news_blackout, t).blocked(t)
+            if why:
+                out[pid] = f"{why} blocked by prop '{r.prop_name}'"
+        return out
+
+_calendar: Optional[TradingCalendar] = None
+
+def get_calendar() -> TradingCalendar:
+    global _calendar
+    if _calendar is None:
+        _calendar = TradingCalendar()
+    return _calendar
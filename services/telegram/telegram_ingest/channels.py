@@ -0,0 +1,101 @@
+import json, os, zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from dupli_core.models import Master, TelegramChannel, TelegramChannelHealth
+from .masters import CachedMaster, load_telegram_masters
+
+# Channels to follow live in the telegram_channels table (chat -> session -> master).
+# Work is sharded across ingest processes by *session*, so one Telethon session is
+# only ever connected from one process; every chat of that session lands there too.
+DEFAULT_SESSION = "default"
+
+def load_session_strings() -> dict[str, str]:
+    """TELEGRAM_SESSION_STRING is the 'default' session; TELEGRAM_SESSIONS adds {"name": "<StringSession>"}."""
+    sessions = json.loads(os.getenv("TELEGRAM_SESSIONS") or "{}")
+    default = os.getenv("TELEGRAM_SESSION_STRING", "").strip()
+    if default:
+        sessions.setdefault(DEFAULT_SESSION, default)
+    return sessions
+
+def shard_of(session_name: str, shard_count: int) -> int:
+    return zlib.crc32(session_name.encode()) % max(shard_count, 1)
+
+@dataclass(frozen=True)
+class ChannelConfig:
+    chat_id: int
+    title: Optional[str]
+    session_name: str
+    grammar: Optional[str] = None
+
+def load_channels(db: Session) -> list[ChannelConfig]:
+    rows = db.execute(select(TelegramChannel).where(TelegramChannel.is_active == True)).scalars().all()
+    return [ChannelConfig(chat_id=c.chat_id, title=c.title, session_name=c.session_name or DEFAULT_SESSION,
+                          grammar=c.grammar) for c in rows]
+
+def for_shard(channels: list[ChannelConfig], shard_index: int, shard_count: int) -> list[ChannelConfig]:
+    return [c for c in channels if shard_of(c.session_name, shard_count) == shard_index]
+
+def load_channel_masters(db: Session) -> dict:
+    """MasterCache loader: chat_id -> master from telegram_channels, ANY_CHAT -> default telegram master.
+
+    A chat whose assigned master is inactive maps to None (not routed), never to the default.
+    """
+    by_chat = load_telegram_masters(db)
+    rows = db.execute(
+        select(TelegramChannel.chat_id, Master)
+        .join(Master, Master.id == TelegramChannel.master_id)
+        .where(TelegramChannel.is_active == True)
+    ).all()
+    for chat_id, m in rows:
+        by_chat[chat_id] = CachedMaster(id=m.id, name=m.name, auto_execute=bool(m.auto_execute)) if m.is_active else None
+    return by_chat
+
+class ChannelHealth:
+    """Per-chat counters and receive lag, flushed to telegram_channel_health periodically."""
+    def __init__(self, shard: int):
+        self.shard = shard
+        self._lock = Lock()
+        self._stats: dict[int, dict] = {}
+
+    def observe(self, chat_id: int, message_date: Optional[datetime], is_signal: bool) -> None:
+        now = datetime.now(timezone.utc)
+        lag_ms = (now - message_date).total_seconds() * 1000.0 if message_date else None
+        with self._lock:
+            st = self._stats.get(chat_id)
+            if st is None:
+                st = self._stats[chat_id] = {"messages": 0, "signals": 0, "last_message_at": None,
+                                             "last_lag_ms": None, "max_lag_ms": None}
+            st["messages"] += 1
+            st["signals"] += int(is_signal)
+            st["last_message_at"] = now
+            if lag_ms is not None:
+                st["last_lag_ms"] = lag_ms
+                st["max_lag_ms"] = max(st["max_lag_ms"] or 0.0, lag_ms)
+
+    def flush(self, db: Session, chat_ids: list[int]) -> None:
+        """Upsert one row per followed chat (chats without traffic still get a heartbeat)."""
+        with self._lock:
+            stats, self._stats = self._stats, {}
+        now = datetime.now(timezone.utc)
+        for chat_id in chat_ids:
+            st = stats.get(chat_id) or {"messages": 0, "signals": 0}
+            values = {"chat_id": chat_id, "shard": self.shard, "messages_total": st["messages"],
+                      "signals_total": st["signals"], "updated_at": now}
+            stmt = insert(TelegramChannelHealth).values(**values, **{
+                k: st.get(k) for k in ("last_message_at", "last_lag_ms", "max_lag_ms")})
+            update = {
+                "shard": stmt.excluded.shard,
+                "updated_at": stmt.excluded.updated_at,
+                "messages_total": TelegramChannelHealth.messages_total + stmt.excluded.messages_total,
+                "signals_total": TelegramChannelHealth.signals_total + stmt.excluded.signals_total,
+            }
+            if st["messages"]:
+                update.update(last_message_at=stmt.excluded.last_message_at, last_lag_ms=stmt.excluded.last_lag_ms,
+                              max_lag_ms=stmt.excluded.max_lag_ms)
+            db.execute(stmt.on_conflict_do_update(index_elements=[TelegramChannelHealth.chat_id], set_=update))
+        db.commit()
@@ -1,14 +1,4 @@
-import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from dupli_core.db import SessionLocal, check_schema, configure, get_engine
 
-def _dsn() -> str:
-    user = os.getenv("POSTGRES_USER")
-    pwd = os.getenv("POSTGRES_PASSWORD")
-    host = os.getenv("POSTGRES_HOST", "postgres")
-    port = os.getenv("POSTGRES_PORT", "5432")
-    db = os.getenv("POSTGRES_DB")
-    return f"postgresql+psycopg://{user}:{pwd}@{host}:{port}/{db}"
-
-engine = create_engine(_dsn(), pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Few writers (one pipeline per shard process) that can sit idle between signals.
+configure("telegram", pool_size=3, max_overflow=5, pool_pre_ping=True)
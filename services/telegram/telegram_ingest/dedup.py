@@ -0,0 +1,78 @@
+import os, time, uuid
+from collections import OrderedDict
+from dataclasses import astuple, dataclass
+from typing import Optional
+from .parser import ParsedSignal
+
+# Channels repost signals, Telegram redelivers updates after a reconnect, and
+# edits/replies must find the intent they refer to. The index keeps the most
+# recent signal messages (LRU by chat + message id) and a per-chat content
+# fingerprint, so both lookups are O(1) dict hits. Only the event loop touches
+# it, so there is no locking.
+DEDUP_MAX_ENTRIES = int(os.getenv("DEDUP_MAX_ENTRIES", "10000"))
+# a repost with identical content inside this window is treated as a duplicate
+DEDUP_WINDOW_S = float(os.getenv("DEDUP_WINDOW_S", "600"))
+
+def fingerprint(ps: ParsedSignal) -> int:
+    return hash(astuple(ps))
+
+@dataclass
+class IndexedSignal:
+    intent_id: uuid.UUID
+    signal: ParsedSignal
+    fingerprint: int
+    seen_at: float
+
+class RecentSignalIndex:
+    def __init__(self, max_entries: int = DEDUP_MAX_ENTRIES, window_s: float = DEDUP_WINDOW_S):
+        self.max_entries = max_entries
+        self.window_s = window_s
+        self._by_message: "OrderedDict[tuple[int, int], IndexedSignal]" = OrderedDict()
+        self._by_fingerprint: "OrderedDict[tuple[int, int], float]" = OrderedDict()
+        self.duplicates = 0
+
+    def get(self, chat_id: int, message_id: Optional[int]) -> Optional[IndexedSignal]:
+        if message_id is None:
+            return None
+        entry = self._by_message.get((chat_id, message_id))
+        if entry is not None:
+            self._by_message.move_to_end((chat_id, message_id))
+        return entry
+
+    def is_duplicate(self, chat_id: int, message_id: int, fp: int, now: Optional[float] = None) -> bool:
+        """Same message delivered twice, or the same signal reposted within the window."""
+        now = time.time() if now is None else now
+        seen = self._by_fingerprint.get((chat_id, fp))
+        if (chat_id, message_id) in self._by_message or (seen is not None and now - seen < self.window_s):
+            self.duplicates += 1
+            return True
+        return False
+
+    def add(self, chat_id: int, message_id: int, intent_id: uuid.UUID, ps: ParsedSignal,
+            now: Optional[float] = None, remember_content: bool = True) -> IndexedSignal:
+        """Index a signal message. Follow-ups pass remember_content=False: they point at
+        the original intent and must not make a later identical signal look like a repost."""
+        now = time.time() if now is None else now
+        entry = IndexedSignal(intent_id=intent_id, signal=ps, fingerprint=fingerprint(ps), seen_at=now)
+        self._by_message[(chat_id, message_id)] = entry
+        self._by_message.move_to_end((chat_id, message_id))
+        if remember_content:
+            self._remember_fingerprint(chat_id, entry.fingerprint, now)
+        while len(self._by_message) > self.max_entries:
+            self._by_message.popitem(last=False)
+        return entry
+
+    def update(self, chat_id: int, entry: IndexedSignal, ps: ParsedSignal, now: Optional[float] = None) -> None:
+        """An edit changed the signal: later edits/replies compare against the new content."""
+        now = time.time() if now is None else now
+        entry.signal, entry.fingerprint = ps, fingerprint(ps)
+        self._remember_fingerprint(chat_id, entry.fingerprint, now)
+
+    def _remember_fingerprint(self, chat_id: int, fp: int, now: float) -> None:
+        self._by_fingerprint[(chat_id, fp)] = now
+        self._by_fingerprint.move_to_end((chat_id, fp))
+        while len(self._by_fingerprint) > self.max_entries:
+            self._by_fingerprint.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._by_message)
@@ -0,0 +1,72 @@
+import os, time
+from dataclasses import dataclass
+from threading import Lock
+from typing import Callable, Optional
+import redis
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from dupli_core.keys import MASTERS_CHANNEL
+from dupli_core.models import Master
+
+# Active masters are cached in-process, keyed by source chat, so a signal does not
+# pay a Postgres round trip for the Master lookup. The API publishes on
+# MASTERS_CHANNEL when a master changes (immediate invalidation); the TTL bounds
+# how long a deactivated master can keep receiving intents if that message is lost.
+MASTER_CACHE_TTL_S = float(os.getenv("MASTER_CACHE_TTL_S", "5"))
+ANY_CHAT = None  # key for a master that takes signals from every followed chat
+
+@dataclass(frozen=True)
+class CachedMaster:
+    id: object
+    name: str
+    auto_execute: bool
+
+def load_telegram_masters(db: Session) -> dict:
+    # v0.1 semantics: the first (oldest) active telegram master takes every followed chat
+    m = db.execute(select(Master).where(Master.source == "telegram", Master.is_active == True)
+                   .order_by(Master.created_at, Master.id).limit(1)).scalars().first()
+    if not m:
+        return {}
+    return {ANY_CHAT: CachedMaster(id=m.id, name=m.name, auto_execute=bool(m.auto_execute))}
+
+class MasterCache:
+    def __init__(self, session_factory: Callable[[], Session], loader=load_telegram_masters,
+                 ttl_s: float = MASTER_CACHE_TTL_S):
+        self._session_factory = session_factory
+        self._loader = loader
+        self._ttl = ttl_s
+        self._by_chat: dict = {}
+        self._expires = 0.0
+        self._lock = Lock()
+        self._pubsub_thread = None
+
+    def get(self, chat_id) -> Optional[CachedMaster]:
+        """Master for `chat_id`; reloads from Postgres only when the cache expired. Call off the event loop."""
+        with self._lock:
+            if time.monotonic() >= self._expires:
+                db = self._session_factory()
+                try:
+                    self._by_chat = self._loader(db)
+                finally:
+                    db.close()
+                self._expires = time.monotonic() + self._ttl
+            by_chat = self._by_chat
+        if chat_id in by_chat:
+            return by_chat[chat_id]  # None: the chat's own master is inactive
+        return by_chat.get(ANY_CHAT)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._expires = 0.0
+
+    def _on_message(self, msg) -> None:
+        self.invalidate()  # the payload only names the master; any change reloads the snapshot
+
+    def listen(self, redis_url: str) -> None:
+        """Invalidate on change notifications published by the API."""
+        def _on_error(e, pubsub, thread):
+            print(f"WARN: master change listener: {e}", flush=True)
+            time.sleep(1)
+        p = redis.from_url(redis_url).pubsub(ignore_subscribe_messages=True)
+        p.subscribe(**{MASTERS_CHANNEL: self._on_message})
+        self._pubsub_thread = p.run_in_thread(sleep_time=0.5, daemon=True, exception_handler=_on_error)
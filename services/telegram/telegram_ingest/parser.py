@@ -1,6 +1,6 @@
 import re, json
 from dataclasses import dataclass
-from typing import Optional
+from typing import Callable, Optional
 
 @dataclass
 class ParsedSignal:
@@ -15,39 +15,93 @@ class ParsedSignal:
 
 # v0.1 parser expects a fairly standard format like:
 # "XAUUSD SELL ZONE 5187.5-5190 SL 5205 TP1 5170 TP2 5150"
-ZONE_RE = re.compile(r"(?P<sym>[A-Z0-9/_-]+)\s+(?P<side>BUY|SELL)\s+(?P<otype>ZONE|LIMIT|STOP|MARKET|NOW)\s*(?P<zone>\d+(?:\.\d+)?(?:\s*[-–]\s*\d+(?:\.\d+)?)?)?", re.I)
-SL_RE = re.compile(r"\bSL\b\s*(?P<sl>\d+(?:\.\d+)?)", re.I)
-TP_RE = re.compile(r"\bTP(?P<n>\d+)\b\s*(?P<tp>\d+(?:\.\d+)?)", re.I)
-
-def parse(text: str) -> Optional[ParsedSignal]:
-    t = " ".join(text.strip().split())
-    m = ZONE_RE.search(t)
-    if not m:
+#
+# Most channel chatter is not a signal, so a cheap keyword scan rejects it before
+# any real work. Signals are then read in one finditer() pass over a single
+# alternation that yields the head (symbol/side/type/zone), SL and TP tokens.
+_NUM = r"\d+(?:\.\d+)?"
+PREFILTER_RE = re.compile(r"BUY|SELL", re.I)
+SIGNAL_TOKEN_RE = re.compile(
+    rf"(?P<sym>[A-Z0-9/_-]+)\s+(?P<side>BUY|SELL)\s+(?P<otype>ZONE|LIMIT|STOP|MARKET|NOW)\s*"
+    rf"(?:(?P<lo>{_NUM})(?:\s*[-–]\s*(?P<hi>{_NUM}))?)?"
+    rf"|\bSL\b\s*(?P<sl>{_NUM})"
+    rf"|\bTP(?P<n>\d+)\b\s*(?P<tp>{_NUM})",
+    re.I,
+)
+
+def parse_default(text: str) -> Optional[ParsedSignal]:
+    if PREFILTER_RE.search(text) is None:
         return None
-    sym = m.group("sym").upper()
-    side = m.group("side").upper()
-    otype_raw = m.group("otype").upper()
-    order_type = "MARKET" if otype_raw in ("NOW","MARKET") else otype_raw
-    entry = None
-    zone_low = None
-    zone_high = None
-    zone = m.group("zone")
-    if zone:
-        if "-" in zone or "–" in zone:
-            parts = re.split(r"[-–]", zone)
-            zone_low = float(parts[0].strip())
-            zone_high = float(parts[1].strip())
+    head = None
+    sl = None
+    tps = []
+    for m in SIGNAL_TOKEN_RE.finditer(text):
+        if m.lastgroup is None:
+            continue
+        g = m.group
+        if g("side") is not None:
+            if head is None:
+                head = m
+        elif g("sl") is not None:
+            if sl is None:
+                sl = float(g("sl"))
         else:
-            entry = float(zone.strip())
+            tps.append((int(g("n")), float(g("tp"))))
+    if head is None:
+        return None
 
-    sl = None
-    msl = SL_RE.search(t)
-    if msl:
-        sl = float(msl.group("sl"))
+    otype_raw = head.group("otype").upper()
+    order_type = "MARKET" if otype_raw in ("NOW", "MARKET") else otype_raw
+    entry = zone_low = zone_high = None
+    lo, hi = head.group("lo"), head.group("hi")
+    if hi is not None:
+        zone_low, zone_high = float(lo), float(hi)
+    elif lo is not None:
+        entry = float(lo)
+    tps_json = None
+    if tps:
+        tps.sort(key=lambda x: x[0])
+        tps_json = json.dumps([{"n": n, "price": p} for n, p in tps])
+    return ParsedSignal(head.group("sym").upper(), head.group("side").upper(), order_type,
+                        entry, zone_low, zone_high, sl, tps_json)
 
-    tps = []
-    for mtp in TP_RE.finditer(t):
-        tps.append({"n": int(mtp.group("n")), "price": float(mtp.group("tp"))})
-    tps_json = json.dumps(sorted(tps, key=lambda x: x["n"])) if tps else None
+# Per-channel grammars: telegram_channels.grammar names one of these.
+GRAMMARS: dict[str, Callable[[str], Optional[ParsedSignal]]] = {"default": parse_default}
+
+def register_grammar(name: str, fn: Callable[[str], Optional[ParsedSignal]]) -> None:
+    GRAMMARS[name] = fn
 
-    return ParsedSignal(sym, side, order_type, entry, zone_low, zone_high, sl, tps_json)
+def get_grammar(name: Optional[str]) -> Callable[[str], Optional[ParsedSignal]]:
+    return GRAMMARS.get(name or "default", parse_default)
+
+def parse(text: str, grammar: Optional[str] = None) -> Optional[ParsedSignal]:
+    return get_grammar(grammar)(text)
+
+# Follow-ups are replies to an earlier signal ("SL to BE", "move SL to 2310",
+# "close TP1", "close half"). They only make sense against a known original, so
+# the ingest parses them only for replies to indexed signal messages.
+@dataclass
+class FollowUp:
+    action: str  # MODIFY|BREAKEVEN|CLOSE|CLOSE_PARTIAL
+    sl: Optional[float] = None
+    tp_n: Optional[int] = None
+
+FOLLOWUP_PREFILTER_RE = re.compile(r"SL|STOP|CLOSE|BE\b", re.I)
+BREAKEVEN_RE = re.compile(r"\b(?:SL|STOP\s*LOSS)\s*(?:TO|@|AT|=)?\s*(?:BE|B/E|BREAK\s*EVEN|ENTRY)\b", re.I)
+MOVE_SL_RE = re.compile(rf"\b(?:SL|STOP\s*LOSS)\s*(?:TO|@|AT|=)\s*(?P<sl>{_NUM})", re.I)
+CLOSE_RE = re.compile(r"\bCLOSE\b(?:\s+(?:(?P<all>ALL|FULL)|(?P<part>HALF|PARTIAL|PARTIALS|50%)|TP(?P<n>\d+)))?", re.I)
+
+def parse_followup(text: str) -> Optional[FollowUp]:
+    if FOLLOWUP_PREFILTER_RE.search(text) is None:
+        return None
+    if BREAKEVEN_RE.search(text):
+        return FollowUp("BREAKEVEN")
+    m = MOVE_SL_RE.search(text)
+    if m:
+        return FollowUp("MODIFY", sl=float(m.group("sl")))
+    m = CLOSE_RE.search(text)
+    if m:
+        if m.group("n"):
+            return FollowUp("CLOSE_PARTIAL", tp_n=int(m.group("n")))
+        return FollowUp("CLOSE_PARTIAL" if m.group("part") else "CLOSE")
+    return None
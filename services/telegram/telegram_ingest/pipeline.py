@@ -0,0 +1,102 @@
+import asyncio, os, time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+# Telethon handlers only parse and enqueue; DB work (Master lookup, insert, commit,
+# auto-enqueue) runs on a small thread pool fed by a bounded asyncio queue, so a
+# slow Postgres commit never stalls receipt of the next Telegram update. When the
+# queue is full, handlers wait (backpressure) instead of dropping messages.
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "1000"))
+# 1 keeps intents persisted in arrival order (follow-ups reference earlier signals)
+INGEST_DB_WORKERS = int(os.getenv("INGEST_DB_WORKERS", "1"))
+INGEST_STATS_INTERVAL_S = float(os.getenv("INGEST_STATS_INTERVAL_S", "60"))
+
+@dataclass
+class IngestItem:
+    text: str
+    signal: Any
+    timings: dict
+    meta: dict = field(default_factory=dict)
+
+@dataclass
+class IngestStats:
+    submitted: int = 0
+    persisted: int = 0
+    failed: int = 0
+    backpressure_waits: int = 0  # submits that found the queue full
+    max_depth: int = 0
+    max_queue_wait_ms: float = 0.0
+    total_queue_wait_ms: float = 0.0
+    max_persist_ms: float = 0.0
+    total_persist_ms: float = 0.0
+
+class IngestPipeline:
+    def __init__(self, persist: Callable[[IngestItem], None], maxsize: int = INGEST_QUEUE_SIZE,
+                 workers: int = INGEST_DB_WORKERS):
+        self._persist = persist
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest-db")
+        self._tasks: list[asyncio.Task] = []
+        self.stats = IngestStats()
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self._workers)]
+
+    async def submit(self, item: IngestItem) -> None:
+        self.stats.submitted += 1
+        if self._queue.full():
+            self.stats.backpressure_waits += 1
+        await self._queue.put((time.monotonic(), item))
+        self.stats.max_depth = max(self.stats.max_depth, self._queue.qsize())
+
+    async def drain(self) -> None:
+        await self._queue.join()
+
+    async def close(self) -> None:
+        await self.drain()
+        for t in self._tasks:
+            t.cancel()
+        self._executor.shutdown(wait=True)
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def snapshot(self) -> dict:
+        s = self.stats
+        done = s.persisted + s.failed
+        return {
+            "depth": self.depth(), "submitted": s.submitted, "persisted": s.persisted, "failed": s.failed,
+            "backpressure_waits": s.backpressure_waits, "max_depth": s.max_depth,
+            "avg_queue_wait_ms": round(s.total_queue_wait_ms / done, 2) if done else None,
+            "max_queue_wait_ms": round(s.max_queue_wait_ms, 2),
+            "avg_persist_ms": round(s.total_persist_ms / done, 2) if done else None,
+            "max_persist_ms": round(s.max_persist_ms, 2),
+        }
+
+    async def report_forever(self, interval: float = INGEST_STATS_INTERVAL_S) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            print(f"Ingest pipeline: {self.snapshot()}", flush=True)
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            enqueued, item = await self._queue.get()
+            start = time.monotonic()
+            wait_ms = (start - enqueued) * 1000.0
+            try:
+                await loop.run_in_executor(self._executor, self._persist, item)
+                self.stats.persisted += 1
+            except Exception as e:
+                self.stats.failed += 1
+                print(f"ERROR: failed to persist signal: {e}", flush=True)
+            finally:
+                persist_ms = (time.monotonic() - start) * 1000.0
+                s = self.stats
+                s.total_queue_wait_ms += wait_ms
+                s.max_queue_wait_ms = max(s.max_queue_wait_ms, wait_ms)
+                s.total_persist_ms += persist_ms
+                s.max_persist_ms = max(s.max_persist_ms, persist_ms)
+                self._queue.task_done()
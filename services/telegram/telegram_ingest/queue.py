@@ -0,0 +1,19 @@
+import os, json
+from datetime import datetime
+import redis
+# same stream as the API's POST /api/trade_intents/{id}/queue (worker consumer group)
+from dupli_core.keys import EXEC_STREAM, EXEC_STREAM_MAXLEN
+
+_redis = None
+
+def get_redis() -> redis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = redis.from_url(os.getenv("REDIS_URL"))
+    return _redis
+
+def enqueue_execution(trade_intent_id: str, timings: dict, created_at: datetime) -> str:
+    entry_id = get_redis().xadd(EXEC_STREAM, {"intent_id": trade_intent_id, "created_at": created_at.isoformat(),
+                                              "timings": json.dumps(timings)},
+                                maxlen=EXEC_STREAM_MAXLEN, approximate=True)
+    return entry_id.decode() if isinstance(entry_id, bytes) else entry_id
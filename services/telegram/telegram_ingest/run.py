@@ -1,10 +1,28 @@
-import os, sys, uuid, asyncio
+import os, sys, uuid, json, time, asyncio, signal
+import multiprocessing as mp
 from telethon import TelegramClient, events
 from telethon.sessions import StringSession
+from datetime import datetime, timedelta, timezone
 from sqlalchemy import select
-from .db import SessionLocal
-from .models import Master, TradeIntent
-from .parser import parse
+from .db import SessionLocal, check_schema
+from dupli_core.models import Master, TradeIntent
+from .parser import FollowUp, ParsedSignal, parse, parse_followup
+from .dedup import DEDUP_MAX_ENTRIES, DEDUP_WINDOW_S, IndexedSignal, RecentSignalIndex, fingerprint
+from .queue import enqueue_execution
+from .pipeline import IngestPipeline, IngestItem
+from .masters import MasterCache
+from dupli_core import metrics
+from .channels import (ChannelConfig, ChannelHealth, DEFAULT_SESSION, for_shard, load_channel_masters,
+                       load_channels, load_session_strings, shard_of)
+
+# One process can host many Telethon sessions/chats in a single event loop. With
+# INGEST_PROCESSES > 1 the supervisor spawns that many shard processes (sessions are
+# assigned by hash); INGEST_SHARD_INDEX/INGEST_SHARD_COUNT shard across containers.
+INGEST_PROCESSES = int(os.getenv("INGEST_PROCESSES", "1"))
+INGEST_CONFIG_RELOAD_S = float(os.getenv("INGEST_CONFIG_RELOAD_S", "60"))
+INGEST_HEALTH_INTERVAL_S = float(os.getenv("INGEST_HEALTH_INTERVAL_S", "15"))
+
+master_cache = MasterCache(SessionLocal, loader=load_channel_masters)
 
 
 def _require_env(name: str) -> str:
@@ -16,11 +34,112 @@ def _require_env(name: str) -> str:
     return value
 
 
-async def main():
+def persist_signal(item: IngestItem) -> None:
+    """Runs on the ingest DB thread pool, never on the event loop."""
+    ps, text, timings = item.signal, item.text, item.timings
+    m = master_cache.get(item.meta.get("chat_id"))
+    if not m:
+        return
+    meta = item.meta
+    db = SessionLocal()
+    try:
+        ti = TradeIntent(
+            id=meta.get("intent_id") or uuid.uuid4(),
+            master_id=m.id,
+            symbol=ps.symbol,
+            side=ps.side,
+            order_type=ps.order_type,
+            entry=ps.entry,
+            zone_low=ps.zone_low,
+            zone_high=ps.zone_high,
+            sl=ps.sl,
+            tps=ps.tps_json,
+            raw_text=text,
+            status="QUEUED" if m.auto_execute else "NEW",
+            timings=json.dumps(timings),
+            action=meta.get("action", "OPEN"),
+            parent_id=meta.get("parent_id"),
+            source_chat_id=meta.get("chat_id"),
+            source_message_id=meta.get("message_id"),
+        )
+        db.add(ti); db.commit()
+        timings["persisted"] = time.time()
+        print(f"Saved TradeIntent {ti.id} {ti.action} {ti.symbol} {ti.side} {ti.order_type}"
+              + (f" (ref {ti.parent_id})" if ti.parent_id else ""))
+        if m.auto_execute:
+            # auto-execute master: hand the intent straight to the worker (no operator click)
+            timings["enqueued"] = time.time()
+            try:
+                job_id = enqueue_execution(str(ti.id), timings, ti.created_at)
+                print(f"Queued TradeIntent {ti.id} job={job_id}")
+            except Exception as e:
+                ti.status = "NEW"  # leave it for an operator to queue from the API
+                db.commit()
+                print(f"WARN: auto-enqueue failed for TradeIntent {ti.id}: {e}")
+        metrics.observe_stages(timings, metrics.INGEST_STAGES)
+    finally:
+        db.close()
+
+
+def _load_channels() -> list[ChannelConfig]:
+    db = SessionLocal()
+    try:
+        return load_channels(db)
+    finally:
+        db.close()
+
+
+def _load_recent_signals(chat_ids: list[int]) -> list[TradeIntent]:
+    # OPEN intents still inside the dedup window, so a restart neither re-fans-out a
+    # redelivered message nor loses the originals that edits/replies refer to
+    since = datetime.now(timezone.utc) - timedelta(seconds=DEDUP_WINDOW_S)
+    q = (select(TradeIntent)
+         .where(TradeIntent.created_at >= since, TradeIntent.source_message_id.is_not(None),
+                TradeIntent.action == "OPEN")
+         .order_by(TradeIntent.created_at).limit(DEDUP_MAX_ENTRIES))
+    if 0 not in chat_ids:
+        q = q.where(TradeIntent.source_chat_id.in_(chat_ids))
+    db = SessionLocal()
+    try:
+        return list(db.execute(q).scalars().all())
+    finally:
+        db.close()
+
+
+def _followup_signal(orig: ParsedSignal, fu: FollowUp) -> ParsedSignal:
+    tps_json = None
+    if fu.tp_n is not None:
+        price = next((tp["price"] for tp in json.loads(orig.tps_json or "[]") if tp["n"] == fu.tp_n), None)
+        tps_json = json.dumps([{"n": fu.tp_n, "price": price}])
+    return ParsedSignal(orig.symbol, orig.side, orig.order_type, orig.entry, orig.zone_low, orig.zone_high,
+                        fu.sl, tps_json)
+
+
+def _flush_health(health: ChannelHealth, chat_ids: list[int]) -> None:
+    db = SessionLocal()
+    try:
+        health.flush(db, chat_ids)
+    finally:
+        db.close()
+
+
+def _shard_channels(all_channels: list[ChannelConfig], shard_index: int, shard_count: int) -> list[ChannelConfig]:
+    if all_channels:
+        return for_shard(all_channels, shard_index, shard_count)
+    # no telegram_channels rows yet: v0.1 single-chat mode on the default session
+    if shard_of(DEFAULT_SESSION, shard_count) != shard_index:
+        return []
+    chat_id = int(os.getenv("TELEGRAM_SOURCE_CHAT_ID", "0"))  # 0 = every chat of the session
+    return [ChannelConfig(chat_id=chat_id, title=os.getenv("TELEGRAM_SOURCE_CHAT_TITLE"), session_name=DEFAULT_SESSION)]
+
+
+async def run_shard(shard_index: int = 0, shard_count: int = 1):
     api_id_raw = _require_env("TELEGRAM_API_ID")
     api_hash = _require_env("TELEGRAM_API_HASH")
-    session_string = _require_env("TELEGRAM_SESSION_STRING")
-    chat_id = int(os.getenv("TELEGRAM_SOURCE_CHAT_ID", "0"))
+    session_strings = load_session_strings()
+    if not session_strings:
+        print("FATAL: no Telegram session configured (TELEGRAM_SESSION_STRING or TELEGRAM_SESSIONS). Exiting.", flush=True)
+        sys.exit(1)
 
     try:
         api_id = int(api_id_raw)
@@ -28,57 +147,199 @@ async def main():
         print(f"FATAL: TELEGRAM_API_ID must be an integer, got: {api_id_raw!r}", flush=True)
         sys.exit(1)
 
-    client = TelegramClient(StringSession(session_string), api_id, api_hash)
-    await client.connect()
-    if not await client.is_user_authorized():
-        print("FATAL: session string is invalid or expired. Generate a new one.", flush=True)
-        sys.exit(1)
-    print("Telegram client connected (user session).", flush=True)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, check_schema)
+    channels = _shard_channels(await loop.run_in_executor(None, _load_channels), shard_index, shard_count)
+    followed = {c.chat_id for c in channels}
+    grammars = {c.chat_id: c.grammar for c in channels if c.grammar}
+    print(f"Shard {shard_index}/{shard_count}: following {len(followed)} chat(s) on "
+          f"{len({c.session_name for c in channels})} session(s)", flush=True)
 
-    # pick or create a Master source=telegram
+    # default master (chats without an explicit master_id)
     db = SessionLocal()
     try:
         m = db.execute(select(Master).where(Master.source == "telegram")).scalars().first()
         if not m:
-            # relies on masters table already created by API container
+            # relies on the masters table created by the migrate service
             print("No telegram master found. Create one via API: POST /api/masters {name, source:'telegram'}")
         else:
-            print(f"Using master: {m.name} ({m.id})")
+            print(f"Using master: {m.name} ({m.id}) auto_execute={bool(m.auto_execute)}")
     finally:
         db.close()
 
-    @client.on(events.NewMessage(chats=chat_id if chat_id != 0 else None))
+    redis_url = os.getenv("REDIS_URL", "")
+    if redis_url:
+        master_cache.listen(redis_url)
+
+    pipeline = IngestPipeline(persist_signal)
+    pipeline.start()
+    health = ChannelHealth(shard_index)
+    recent = RecentSignalIndex()
+    try:
+        for ti in await loop.run_in_executor(None, _load_recent_signals, sorted(followed)):
+            ps = ParsedSignal(ti.symbol, ti.side, ti.order_type, ti.entry, ti.zone_low, ti.zone_high, ti.sl, ti.tps)
+            recent.add(ti.source_chat_id, ti.source_message_id, ti.id, ps, ti.created_at.timestamp())
+        print(f"Recent-signal index warmed with {len(recent)} signal(s)", flush=True)
+    except Exception as e:
+        print(f"WARN: could not warm recent-signal index: {e}", flush=True)
+
+    async def submit(text: str, ps: ParsedSignal, received: float, chat_id: int, message_id: int,
+                     intent_id: uuid.UUID, action: str = "OPEN", parent: IndexedSignal | None = None):
+        timings = {"received": received, "parsed": time.time()}
+        meta = {"chat_id": chat_id, "message_id": message_id, "intent_id": intent_id, "action": action,
+                "parent_id": parent.intent_id if parent else None}
+        await pipeline.submit(IngestItem(text=text, signal=ps, timings=timings, meta=meta))
+
     async def handler(event):
+        chat_id = event.chat_id
+        if 0 not in followed and chat_id not in followed:
+            return
+        received = time.time()
+        msg = event.message
         text = event.raw_text or ""
-        ps = parse(text)
-        if not ps:
+        ps = parse(text, grammars.get(chat_id))
+        health.observe(chat_id, msg.date if msg else None, ps is not None)
+        if msg is None:
             return
-        db = SessionLocal()
-        try:
-            m = db.execute(select(Master).where(Master.source == "telegram", Master.is_active == True)).scalars().first()
-            if not m:
+        if ps is None:
+            # reply follow-up ("SL to BE", "close TP1") to a signal we still know about
+            orig = recent.get(chat_id, msg.reply_to_msg_id)
+            if orig is None or recent.get(chat_id, msg.id) is not None:
+                return
+            fu = parse_followup(text)
+            if fu is None:
                 return
-            ti = TradeIntent(
-                id=uuid.uuid4(),
-                master_id=m.id,
-                symbol=ps.symbol,
-                side=ps.side,
-                order_type=ps.order_type,
-                entry=ps.entry,
-                zone_low=ps.zone_low,
-                zone_high=ps.zone_high,
-                sl=ps.sl,
-                tps=ps.tps_json,
-                raw_text=text,
-                status="NEW",
-            )
-            db.add(ti); db.commit()
-            print(f"Saved TradeIntent {ti.id} {ti.symbol} {ti.side} {ti.order_type}")
-        finally:
-            db.close()
+            recent.add(chat_id, msg.id, orig.intent_id, orig.signal, received, remember_content=False)
+            await submit(text, _followup_signal(orig.signal, fu), received, chat_id, msg.id, uuid.uuid4(), fu.action, orig)
+            return
+        if recent.is_duplicate(chat_id, msg.id, fingerprint(ps), received):
+            print(f"Duplicate signal suppressed (chat {chat_id}, message {msg.id})", flush=True)
+            return
+        intent_id = uuid.uuid4()
+        recent.add(chat_id, msg.id, intent_id, ps, received)
+        await submit(text, ps, received, chat_id, msg.id, intent_id)
+
+    async def edit_handler(event):
+        chat_id = event.chat_id
+        msg = event.message
+        if msg is None or (0 not in followed and chat_id not in followed):
+            return
+        received = time.time()
+        text = event.raw_text or ""
+        ps = parse(text, grammars.get(chat_id))
+        if ps is None:
+            return
+        fp = fingerprint(ps)
+        orig = recent.get(chat_id, msg.id)
+        if orig is None:
+            # an edit can turn chatter into a signal
+            if not recent.is_duplicate(chat_id, msg.id, fp, received):
+                intent_id = uuid.uuid4()
+                recent.add(chat_id, msg.id, intent_id, ps, received)
+                await submit(text, ps, received, chat_id, msg.id, intent_id)
+            return
+        if fp == orig.fingerprint:
+            return  # cosmetic edit
+        recent.update(chat_id, orig, ps, received)
+        await submit(text, ps, received, chat_id, msg.id, uuid.uuid4(), "MODIFY", orig)
+
+    clients = {}
+    for name in sorted({c.session_name for c in channels}):
+        if name not in session_strings:
+            print(f"WARN: session '{name}' is not configured; its chats are skipped", flush=True)
+            continue
+        client = TelegramClient(StringSession(session_strings[name]), api_id, api_hash)
+        await client.connect()
+        if not await client.is_user_authorized():
+            print(f"FATAL: session '{name}' string is invalid or expired. Generate a new one.", flush=True)
+            sys.exit(1)
+        client.add_event_handler(handler, events.NewMessage())
+        client.add_event_handler(edit_handler, events.MessageEdited())
+        clients[name] = client
+        print(f"Telegram client connected (user session '{name}').", flush=True)
+
+    restart = asyncio.Event()
+
+    async def reload_config():
+        # added/removed chats on connected sessions apply in place; a new session restarts the shard
+        while True:
+            await asyncio.sleep(INGEST_CONFIG_RELOAD_S)
+            try:
+                fresh = _shard_channels(await loop.run_in_executor(None, _load_channels), shard_index, shard_count)
+            except Exception as e:
+                print(f"WARN: channel config reload failed: {e}", flush=True)
+                continue
+            wanted = {c.chat_id for c in fresh if c.session_name in clients}
+            grammars.clear(); grammars.update({c.chat_id: c.grammar for c in fresh if c.grammar})
+            if wanted != followed:
+                followed.clear(); followed.update(wanted)
+                master_cache.invalidate()
+                print(f"Shard {shard_index}: now following {len(followed)} chat(s)", flush=True)
+            missing = {n for n in {c.session_name for c in fresh} if n in session_strings and n not in clients}
+            if missing:
+                print(f"Shard {shard_index}: new session(s) {sorted(missing)}; restarting to connect them", flush=True)
+                restart.set()
+
+    async def report_health():
+        while True:
+            await asyncio.sleep(INGEST_HEALTH_INTERVAL_S)
+            try:
+                await loop.run_in_executor(None, _flush_health, health, sorted(c for c in followed if c != 0))
+            except Exception as e:
+                print(f"WARN: channel health flush failed: {e}", flush=True)
+
+    background = [asyncio.create_task(pipeline.report_forever()),
+                  asyncio.create_task(reload_config()),
+                  asyncio.create_task(report_health())]
 
     print("Telegram ingest running...")
-    await client.run_until_disconnected()
+    # any disconnected session (or a config change that needs one) ends the shard; the
+    # supervisor / container restart policy brings it back
+    runners = [asyncio.ensure_future(c.run_until_disconnected()) for c in clients.values()]
+    try:
+        await asyncio.wait(runners + [asyncio.ensure_future(restart.wait())], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for t in background:
+            t.cancel()
+        await pipeline.close()  # persist everything already received
+        for c in clients.values():
+            await c.disconnect()
+
+
+def _shard_entry(shard_index: int, shard_count: int):
+    asyncio.run(run_shard(shard_index, shard_count))
+
+
+def main():
+    metrics.serve()
+    if INGEST_PROCESSES <= 1:
+        asyncio.run(run_shard(int(os.getenv("INGEST_SHARD_INDEX", "0")), int(os.getenv("INGEST_SHARD_COUNT", "1"))))
+        return
+
+    # supervisor: one process per shard, restarted if it dies
+    ctx = mp.get_context("spawn")
+    procs: dict[int, mp.Process] = {}
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for p in procs.values():
+            p.terminate()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    while not stopping:
+        for i in range(INGEST_PROCESSES):
+            p = procs.get(i)
+            if p is None or not p.is_alive():
+                if p is not None:
+                    print(f"Ingest shard {i} exited with {p.exitcode}; restarting", flush=True)
+                p = procs[i] = ctx.Process(target=_shard_entry, args=(i, INGEST_PROCESSES), name=f"ingest-shard-{i}")
+                p.start()
+        time.sleep(5)
+    for p in procs.values():
+        p.join(10)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -0,0 +1,168 @@
+import json, os, threading, time
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+import numpy as np
+import redis
+from dupli_core.keys import ACCOUNT_STATE_CHANNEL, ACCOUNT_STATE_KEY
+from .executors import add_gateway_event_listener, fetch_gateway_accounts, gateway_urls
+from .redisconn import get_redis
+from .rulesets import RuleInputs
+
+# Live equity / free margin / open positions per slave account, for sizing without
+# a broker round trip per order. Gateways push {"t": "account", ...} events on the
+# order stream; whichever worker receives one stores it in the ACCOUNT_STATE_KEY
+# hash and publishes it on ACCOUNT_STATE_CHANNEL so every worker process updates its
+# in-memory dict. A refresh thread reloads the hash and polls GET /v1/accounts on
+# each gateway as a fallback. Reads during fan-out are plain dict lookups; states
+# older than ACCOUNT_STATE_MAX_AGE_S count as unknown (sizing falls back to fixed_lot).
+ACCOUNT_STATE_MAX_AGE_S = float(os.getenv("ACCOUNT_STATE_MAX_AGE_S", "120"))
+ACCOUNT_STATE_REFRESH_S = float(os.getenv("ACCOUNT_STATE_REFRESH_S", "30"))
+
+@dataclass
+class AccountState:
+    equity: Optional[float] = None
+    balance: Optional[float] = None
+    free_margin: Optional[float] = None
+    positions: list = field(default_factory=list)  # [{"symbol": "XAUUSD", "volume": 0.5, ...}]
+    day_start_equity: Optional[float] = None  # broker-day open, for daily-loss rules
+    spreads: dict = field(default_factory=dict)  # symbol -> current spread (price units)
+    updated_at: float = 0.0  # epoch seconds of the broker-side snapshot
+    source: str = ""
+
+    def age_s(self, now: Optional[float] = None) -> float:
+        return (time.time() if now is None else now) - self.updated_at
+
+def state_key(platform: str, external_id: str) -> str:
+    return f"{(platform or '').upper()}:{external_id}"
+
+def _from_gateway(acc: dict, source: str) -> AccountState:
+    return AccountState(equity=acc.get("equity"), balance=acc.get("balance"), free_margin=acc.get("free_margin"),
+                        positions=acc.get("positions") or [], day_start_equity=acc.get("day_start_equity"),
+                        spreads={k.upper(): v for k, v in (acc.get("spreads") or {}).items()}, updated_at=float(acc.get("ts") or time.time()),
+                        source=source)
+
+class AccountStateCache:
+    def __init__(self, r: Optional[redis.Redis] = None):
+        self._r = r
+        self._states: dict[str, AccountState] = {}
+        self._lock = threading.Lock()
+        self._started = False
+
+    @property
+    def r(self) -> redis.Redis:
+        return self._r or get_redis()
+
+    def get(self, platform: str, external_id: str) -> Optional[AccountState]:
+        return self._states.get(state_key(platform, external_id))
+
+    def equity_vector(self, routes, now: Optional[float] = None) -> np.ndarray:
+        """Equity per route (NaN when unknown or stale), aligned with `routes`."""
+        now = time.time() if now is None else now
+        states = self._states
+        out = np.full(len(routes), np.nan)
+        for i, r in enumerate(routes):
+            st = states.get(state_key(r.platform, r.external_id))
+            if st is not None and st.equity is not None and now - st.updated_at <= ACCOUNT_STATE_MAX_AGE_S:
+                out[i] = st.equity
+        return out
+
+    def rule_inputs(self, routes, symbol: str, now: Optional[float] = None) -> RuleInputs:
+        """Open trades, daily loss, open lots on `symbol` and its spread per route (NaN = unknown)."""
+        now = time.time() if now is None else now
+        symbol = (symbol or "").upper()
+        states = self._states
+        n = len(routes)
+        out = RuleInputs(*(np.full(n, np.nan) for _ in range(4)))
+        for i, r in enumerate(routes):
+            st = states.get(state_key(r.platform, r.external_id))
+            if st is None or now - st.updated_at > ACCOUNT_STATE_MAX_AGE_S:
+                continue
+            out.open_trades[i] = len(st.positions)
+            if st.day_start_equity is not None and st.equity is not None:
+                out.daily_loss[i] = st.day_start_equity - st.equity
+            out.symbol_lots[i] = sum(float(p.get("volume") or 0.0) for p in st.positions
+                                     if isinstance(p, dict) and (p.get("symbol") or "").upper() == symbol)
+            if symbol in st.spreads:
+                out.spread[i] = st.spreads[symbol]
+        return out
+
+    def _apply(self, key: str, st: AccountState) -> bool:
+        with self._lock:
+            cur = self._states.get(key)
+            if cur is not None and cur.updated_at >= st.updated_at:
+                return False  # out-of-order or duplicate update
+            self._states[key] = st
+            return True
+
+    def update(self, platform: str, external_id: str, st: AccountState) -> None:
+        """Store a fresh state locally, in Redis and for the other worker processes."""
+        key = state_key(platform, external_id)
+        if not self._apply(key, st):
+            return
+        data = json.dumps(asdict(st))
+        try:
+            with self.r.pipeline(transaction=False) as p:
+                p.hset(ACCOUNT_STATE_KEY, key, data)
+                p.publish(ACCOUNT_STATE_CHANNEL, json.dumps({"key": key, "state": asdict(st)}))
+                p.execute()
+        except redis.RedisError as e:
+            print(f"WARN: could not share account state {key}: {e}", flush=True)
+
+    def on_gateway_event(self, event: dict) -> None:
+        if event.get("t") == "account" and event.get("account_external_id"):
+            self.update("MT5", str(event["account_external_id"]), _from_gateway(event, "push"))
+
+    def load_all(self) -> int:
+        n = 0
+        for key, raw in self.r.hgetall(ACCOUNT_STATE_KEY).items():
+            n += self._apply(key.decode(), AccountState(**json.loads(raw)))
+        return n
+
+    def refresh(self) -> None:
+        self.load_all()
+        for url in gateway_urls():
+            try:
+                for acc in fetch_gateway_accounts(url):
+                    if acc.get("account_external_id"):
+                        self.update("MT5", str(acc["account_external_id"]), _from_gateway(acc, "poll"))
+            except Exception as e:
+                print(f"WARN: account state poll of {url} failed: {e}", flush=True)
+
+    def _on_message(self, msg) -> None:
+        try:
+            data = json.loads(msg["data"])
+            self._apply(data["key"], AccountState(**data["state"]))
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"WARN: bad account state message: {e}", flush=True)
+
+    def _refresh_forever(self) -> None:
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"WARN: account state refresh failed: {e}", flush=True)
+            time.sleep(ACCOUNT_STATE_REFRESH_S)
+
+    def start(self) -> None:
+        if self._started:
+            return
+        self._started = True
+        add_gateway_event_listener(self.on_gateway_event)
+
+        def _on_error(e, pubsub, thread):
+            print(f"WARN: account state listener: {e}", flush=True)
+            time.sleep(1)
+        p = self.r.pubsub(ignore_subscribe_messages=True)
+        p.subscribe(**{ACCOUNT_STATE_CHANNEL: self._on_message})
+        p.run_in_thread(sleep_time=0.5, daemon=True, exception_handler=_on_error)
+        threading.Thread(target=self._refresh_forever, name="account-state-refresh", daemon=True).start()
+
+_cache: Optional[AccountStateCache] = None
+_cache_lock = threading.Lock()
+
+def get_account_states() -> AccountStateCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AccountStateCache()
+        return _cache
@@ -0,0 +1,109 @@
+import json, os, socket, time
+from typing import Callable
+import redis
+from dupli_core.keys import EXEC_DEAD_STREAM, EXEC_GROUP, EXEC_STREAM
+
+# Execution pipeline on a Redis Stream with a consumer group. API and ingest XADD
+# {intent_id, created_at, timings} (created_at picks the intent's partition); every
+# worker process is a long-lived consumer of the group, so replicas scale horizontally
+# and nothing is forked or imported per intent.
+# Delivery is at-least-once: an entry is XACKed only after the intent is handled.
+# Entries a crashed consumer left pending are XCLAIMed by another consumer once idle
+# for EXEC_CLAIM_IDLE_MS; after EXEC_MAX_DELIVERIES they go to the dead-letter stream.
+# Re-execution is safe: finished intents are skipped and orders carry idempotency keys.
+EXEC_READ_COUNT = int(os.getenv("EXEC_READ_COUNT", "10"))
+EXEC_BLOCK_MS = int(os.getenv("EXEC_BLOCK_MS", "1000"))
+# must exceed the slowest intent (gateway timeouts) so a live consumer is never robbed
+EXEC_CLAIM_IDLE_MS = int(os.getenv("EXEC_CLAIM_IDLE_MS", "60000"))
+EXEC_CLAIM_INTERVAL_S = float(os.getenv("EXEC_CLAIM_INTERVAL_S", "5"))
+EXEC_MAX_DELIVERIES = int(os.getenv("EXEC_MAX_DELIVERIES", "5"))
+
+def consumer_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+def _field(fields: dict, name: str):
+    v = fields.get(name.encode(), fields.get(name))
+    return v.decode() if isinstance(v, bytes) else v
+
+def _decode(fields: dict) -> tuple[str, dict, str | None]:
+    f = {(k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v) for k, v in fields.items()}
+    return f["intent_id"], json.loads(f.get("timings") or "{}"), f.get("created_at")
+
+class ExecConsumer:
+    def __init__(self, r: redis.Redis, handle: Callable[[str, dict, str | None], object],
+                 on_dead: Callable[[str, str, str | None], None], name: str | None = None):
+        self.r = r
+        self.handle = handle
+        self.on_dead = on_dead
+        self.name = name or consumer_name()
+        self.processed = 0
+        self.failed = 0
+
+    def ensure_group(self) -> None:
+        try:
+            self.r.xgroup_create(EXEC_STREAM, EXEC_GROUP, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def run(self, should_stop: Callable[[], bool]) -> None:
+        self.ensure_group()
+        print(f"Consumer {self.name} reading stream '{EXEC_STREAM}' (group '{EXEC_GROUP}')", flush=True)
+        next_claim = 0.0
+        while not should_stop():
+            try:
+                if time.monotonic() >= next_claim:
+                    self.reclaim()
+                    next_claim = time.monotonic() + EXEC_CLAIM_INTERVAL_S
+                batch = self.r.xreadgroup(EXEC_GROUP, self.name, {EXEC_STREAM: ">"},
+                                          count=EXEC_READ_COUNT, block=EXEC_BLOCK_MS)
+                for _, entries in batch or []:
+                    for entry_id, fields in entries:
+                        self._process(entry_id, fields)
+            except redis.RedisError as e:
+                # unacked entries stay pending and are reclaimed later
+                print(f"WARN: stream read/ack failed: {e}", flush=True)
+                time.sleep(1)
+
+    def reclaim(self) -> None:
+        """Take over entries left pending by consumers that died mid-intent."""
+        stale = self.r.xpending_range(EXEC_STREAM, EXEC_GROUP, "-", "+", EXEC_READ_COUNT, idle=EXEC_CLAIM_IDLE_MS)
+        for p in stale:
+            entry_id = p["message_id"]
+            claimed = self.r.xclaim(EXEC_STREAM, EXEC_GROUP, self.name, EXEC_CLAIM_IDLE_MS, [entry_id])
+            for cid, fields in claimed:
+                if fields is None:
+                    continue  # trimmed from the stream
+                if p["times_delivered"] >= EXEC_MAX_DELIVERIES:
+                    self._dead_letter(cid, fields, p["times_delivered"])
+                else:
+                    print(f"Reclaimed {cid!r} from {p['consumer']!r} (delivery {p['times_delivered'] + 1})", flush=True)
+                    self._process(cid, fields)
+
+    def _process(self, entry_id, fields: dict) -> None:
+        try:
+            intent_id, timings, created_at = _decode(fields)
+        except (KeyError, ValueError) as e:
+            print(f"ERROR: malformed stream entry {entry_id!r}: {e}", flush=True)
+            self._dead_letter(entry_id, fields, 1)
+            return
+        try:
+            self.handle(intent_id, timings, created_at)
+            self.processed += 1
+        except Exception as e:
+            # left pending: redelivered by reclaim() after EXEC_CLAIM_IDLE_MS
+            self.failed += 1
+            print(f"ERROR: intent {intent_id} failed, will be retried: {e}", flush=True)
+            return
+        self.r.xack(EXEC_STREAM, EXEC_GROUP, entry_id)
+
+    def _dead_letter(self, entry_id, fields: dict, deliveries: int) -> None:
+        self.r.xadd(EXEC_DEAD_STREAM, {**fields, "entry_id": entry_id, "deliveries": deliveries, "consumer": self.name})
+        self.r.xack(EXEC_STREAM, EXEC_GROUP, entry_id)
+        intent_id, created_at = _field(fields, "intent_id"), _field(fields, "created_at")
+        print(f"ERROR: stream entry {entry_id!r} (intent {intent_id}) dead-lettered after {deliveries} deliveries", flush=True)
+        if intent_id:
+            try:
+                self.on_dead(intent_id, f"gave up after {deliveries} deliveries", created_at)
+            except Exception as e:
+                print(f"WARN: could not mark intent {intent_id} failed: {e}", flush=True)
@@ -1,14 +1,6 @@
-import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from dupli_core.db import SessionLocal, check_schema, configure, get_engine
 
-def _dsn() -> str:
-    user = os.getenv("POSTGRES_USER")
-    pwd = os.getenv("POSTGRES_PASSWORD")
-    host = os.getenv("POSTGRES_HOST", "postgres")
-    port = os.getenv("POSTGRES_PORT", "5432")
-    db = os.getenv("POSTGRES_DB")
-    return f"postgresql+psycopg://{user}:{pwd}@{host}:{port}/{db}"
-
-engine = create_engine(_dsn(), pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Hot path: intent consumer, shard runners and the log writer share the pool. No
+# pre-ping (a round trip per checkout, i.e. per intent); stale connections are
+# recycled instead and a dropped one fails once and is redelivered by the stream.
+configure("worker", pool_size=8, max_overflow=16, pool_pre_ping=False, pool_recycle_s=300, prepare_threshold=2)
@@ -0,0 +1,29 @@
+import json, time
+import redis
+from dupli_core.keys import EVENTS_CHANNEL
+from .redisconn import get_redis
+
+# Live execution events for dashboards: intent status transitions and execution
+# log rows, published as JSON arrays on one Redis pub/sub channel. The API holds a
+# single subscription per process and streams them to every connected client
+# (GET /api/events). Fire-and-forget: nothing is stored, a failed publish is logged
+# and the order path carries on.
+
+def publish_events(events: list[dict]) -> None:
+    if not events:
+        return
+    try:
+        get_redis().publish(EVENTS_CHANNEL, json.dumps(events, default=str))
+    except redis.RedisError as e:
+        print(f"WARN: event publish failed ({len(events)} events): {e}", flush=True)
+
+def intent_event(intent, **extra) -> dict:
+    # build it before db.commit(): the intent's attributes expire on commit
+    return {"type": "intent", "ts": time.time(), "id": str(intent.id), "master_id": str(intent.master_id),
+            "symbol": intent.symbol, "action": intent.action or "OPEN", "status": intent.status, **extra}
+
+def exec_events(rows: list[dict]) -> list[dict]:
+    # one per ExecutionLog row (see logwriter.py)
+    now = time.time()
+    return [{"type": "exec", "ts": now, "intent_id": str(r["trade_intent_id"]), "account_id": str(r["account_id"]),
+             "status": r["status"], "message": r.get("message"), "latency_ms": r.get("latency_ms")} for r in rows]
@@ -1,23 +1,161 @@
-import os, requests
+import os, json, requests
+from urllib.parse import urlsplit
 from dataclasses import dataclass
+from threading import Lock
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .stream import GatewayStream
+
+# One long-lived keep-alive session per gateway URL. The gateway (waitress) speaks
+# HTTP/1.1 without pipelining, so reuse comes from the connection pool: up to
+# MT5_POOL_SIZE sockets stay open and are shared by the fan-out threads.
+MT5_CONNECT_TIMEOUT_S = float(os.getenv("MT5_CONNECT_TIMEOUT_S", "2"))
+MT5_READ_TIMEOUT_S = float(os.getenv("MT5_READ_TIMEOUT_S", "10"))
+MT5_POOL_SIZE = int(os.getenv("MT5_POOL_SIZE", os.getenv("FANOUT_MT5_CONCURRENCY", "16")))
+MT5_RETRIES = int(os.getenv("MT5_RETRIES", "2"))
+MT5_RETRY_BACKOFF_S = float(os.getenv("MT5_RETRY_BACKOFF_S", "0.1"))
+# Slaves behind the same gateway are sent in one POST /v1/orders:batch call.
+MT5_BATCH_ENABLED = os.getenv("MT5_BATCH_ENABLED", "true").lower() == "true"
+MT5_BATCH_MAX = int(os.getenv("MT5_BATCH_MAX", "100"))
+# When set, orders go over the persistent stream channel on this port of the gateway host
+# instead of HTTP (acks, fills and position updates come back on the same connection).
+MT5_STREAM_PORT = int(os.getenv("MT5_STREAM_PORT", "0"))
+# Optional per-login gateway override for multi-farm setups: {"<login>": "http://farm-2:8090"}
+MT5_GATEWAY_MAP = {k: v.rstrip("/") for k, v in json.loads(os.getenv("MT5_GATEWAY_MAP") or "{}").items()}
 
 @dataclass
 class ExecResult:
     ok: bool
     message: str
 
+_sessions: dict[str, requests.Session] = {}
+_sessions_lock = Lock()
+
+def _gateway_session(url: str) -> requests.Session:
+    with _sessions_lock:
+        s = _sessions.get(url)
+        if s is None:
+            # Orders carry an Idempotency-Key, so resending a POST after a dropped
+            # connection or a 502/503/504 cannot double-fill on the gateway side.
+            retry = Retry(total=MT5_RETRIES, connect=MT5_RETRIES, read=MT5_RETRIES, status=MT5_RETRIES,
+                          backoff_factor=MT5_RETRY_BACKOFF_S, status_forcelist=(502, 503, 504),
+                          allowed_methods=frozenset({"GET", "POST"}), raise_on_status=False)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MT5_POOL_SIZE, pool_block=True, max_retries=retry)
+            s = requests.Session()
+            s.mount(url + "/", adapter)
+            _sessions[url] = s
+        return s
+
+_streams: dict[str, GatewayStream] = {}
+_event_listeners: list = []
+
+def add_gateway_event_listener(fn) -> None:
+    """Register fn(event: dict) for fills / position updates pushed by gateway streams."""
+    _event_listeners.append(fn)
+
+def _dispatch_event(event: dict) -> None:
+    for fn in _event_listeners:
+        fn(event)
+
+def _gateway_stream(url: str) -> GatewayStream:
+    with _sessions_lock:
+        st = _streams.get(url)
+        if st is None:
+            st = _streams[url] = GatewayStream(urlsplit(url).hostname, MT5_STREAM_PORT, on_event=_dispatch_event)
+        return st
+
+def _ack_result(ack) -> ExecResult:
+    if ack is None:
+        return ExecResult(ok=False, message="timeout waiting for gateway ack")
+    return ExecResult(ok=bool(ack.get("ok")), message=json.dumps(ack))
+
+def gateway_pool_stats() -> dict:
+    """Per gateway: requests sent vs. sockets opened. reuse_ratio near 1.0 means keep-alive works."""
+    stats = {}
+    with _sessions_lock:
+        items = list(_sessions.items())
+    for url, s in items:
+        pools = s.get_adapter(url + "/").poolmanager.pools
+        reqs = conns = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                reqs += pool.num_requests
+                conns += pool.num_connections
+        stats[url] = {"requests": reqs, "new_connections": conns,
+                      "reuse_ratio": round(1 - conns / reqs, 4) if reqs else None}
+    return stats
+
 def exec_ctrader(account_external_id: str, intent: dict) -> ExecResult:
     # v0.1 stub - implement cTrader Open API calls here
     return ExecResult(ok=False, message="cTrader executor not implemented in v0.1")
 
+def mt5_gateway_url(account_external_id: str) -> str:
+    return MT5_GATEWAY_MAP.get(account_external_id) or os.getenv("MT5_GATEWAY_URL", "").rstrip("/")
+
+def gateway_urls() -> set[str]:
+    return {mt5_gateway_url(""), *MT5_GATEWAY_MAP.values()} - {""}
+
+def fetch_gateway_accounts(url: str) -> list[dict]:
+    """Latest equity/margin/positions the gateway knows for each of its logins."""
+    r = _gateway_session(url).get(url + "/v1/accounts", timeout=(MT5_CONNECT_TIMEOUT_S, MT5_READ_TIMEOUT_S))
+    r.raise_for_status()
+    return r.json().get("accounts") or []
+
+def warm_gateways() -> None:
+    """Create the session (or open the order stream) of every configured gateway up front."""
+    for url in gateway_urls():
+        if MT5_STREAM_PORT:
+            _gateway_stream(url)
+        else:
+            _gateway_session(url)
+
+def _idempotency_key(account_external_id: str, intent: dict) -> str:
+    return f"{intent.get('id')}:{account_external_id}"
+
 def exec_mt5(account_external_id: str, intent: dict) -> ExecResult:
-    url = os.getenv("MT5_GATEWAY_URL", "").rstrip("/")
+    url = mt5_gateway_url(account_external_id)
     if not url:
         return ExecResult(ok=False, message="MT5_GATEWAY_URL not set")
+    if MT5_STREAM_PORT:
+        key = _idempotency_key(account_external_id, intent)
+        return _ack_result(_gateway_stream(url).send_many([(account_external_id, intent, key)], MT5_READ_TIMEOUT_S)[0])
     try:
-        r = requests.post(url + "/v1/orders", json={"account_external_id": account_external_id, "intent": intent}, timeout=10)
+        r = _gateway_session(url).post(
+            url + "/v1/orders",
+            json={"account_external_id": account_external_id, "intent": intent},
+            headers={"Idempotency-Key": _idempotency_key(account_external_id, intent)},
+            timeout=(MT5_CONNECT_TIMEOUT_S, MT5_READ_TIMEOUT_S),
+        )
         if r.status_code == 200:
             return ExecResult(ok=True, message=r.text)
         return ExecResult(ok=False, message=f"HTTP {r.status_code}: {r.text}")
     except Exception as e:
         return ExecResult(ok=False, message=str(e))
+
+def exec_mt5_batch(url: str, orders: list[tuple[str, dict]]) -> list[ExecResult]:
+    """Send (account_external_id, intent) pairs to one gateway; results keep the input order."""
+    if not url:
+        return [ExecResult(ok=False, message="MT5_GATEWAY_URL not set") for _ in orders]
+    if MT5_STREAM_PORT:
+        acks = _gateway_stream(url).send_many([(acc, intent, _idempotency_key(acc, intent)) for acc, intent in orders],
+                                              MT5_READ_TIMEOUT_S)
+        return [_ack_result(a) for a in acks]
+    body = {"orders": [{"account_external_id": acc, "intent": intent, "idempotency_key": _idempotency_key(acc, intent)}
+                       for acc, intent in orders]}
+    try:
+        r = _gateway_session(url).post(url + "/v1/orders:batch", json=body,
+                                       timeout=(MT5_CONNECT_TIMEOUT_S, MT5_READ_TIMEOUT_S))
+        if r.status_code != 200:
+            return [ExecResult(ok=False, message=f"HTTP {r.status_code}: {r.text}") for _ in orders]
+        results = r.json().get("results") or []
+    except Exception as e:
+        return [ExecResult(ok=False, message=str(e)) for _ in orders]
+    out = []
+    for i in range(len(orders)):
+        if i < len(results):
+            res = results[i]
+            out.append(ExecResult(ok=bool(res.get("ok")), message=json.dumps(res)))
+        else:
+            out.append(ExecResult(ok=False, message="missing result in batch reply"))
+    return out
@@ -0,0 +1,101 @@
+import os, time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from threading import BoundedSemaphore, Lock
+from typing import Callable, Optional
+
+from .executors import ExecResult
+
+# Orders for all eligible slaves are sent at once from a bounded thread pool.
+# Each platform gets its own concurrency cap so a slow MT5 gateway cannot take
+# every pool slot away from cTrader (and vice versa).
+FANOUT_MAX_WORKERS = int(os.getenv("FANOUT_MAX_WORKERS", "32"))
+PLATFORM_LIMITS = {
+    "MT5": int(os.getenv("FANOUT_MT5_CONCURRENCY", "16")),
+    "CTRADER": int(os.getenv("FANOUT_CTRADER_CONCURRENCY", "8")),
+}
+DEFAULT_PLATFORM_LIMIT = int(os.getenv("FANOUT_DEFAULT_CONCURRENCY", "4"))
+
+@dataclass
+class OrderTask:
+    account_id: object
+    platform: str
+    external_id: str
+    payload: dict
+
+@dataclass
+class OrderOutcome:
+    task: OrderTask
+    result: ExecResult
+    started_ms: float  # offset from the start of the fan-out
+    latency_ms: float  # send -> response for this account
+
+_pool: Optional[ThreadPoolExecutor] = None
+_semaphores: dict[str, BoundedSemaphore] = {}
+_lock = Lock()
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=FANOUT_MAX_WORKERS, thread_name_prefix="fanout")
+        return _pool
+
+def _semaphore(platform: str) -> BoundedSemaphore:
+    with _lock:
+        sem = _semaphores.get(platform)
+        if sem is None:
+            sem = _semaphores[platform] = BoundedSemaphore(PLATFORM_LIMITS.get(platform, DEFAULT_PLATFORM_LIMIT))
+        return sem
+
+def _run_unit(key, group: list[OrderTask], send, send_group, t0: float) -> list[OrderOutcome]:
+    # A unit is one task, or a group of tasks sent in a single call (one platform slot).
+    with _semaphore(group[0].platform):
+        start = time.perf_counter()
+        try:
+            if key is None:
+                results = [send(group[0])]
+            else:
+                results = send_group(key, group)
+        except Exception as e:
+            results = [ExecResult(ok=False, message=str(e))] * len(group)
+        end = time.perf_counter()
+    started_ms, latency_ms = (start - t0) * 1000.0, (end - start) * 1000.0
+    return [OrderOutcome(task=t, result=r, started_ms=started_ms, latency_ms=latency_ms) for t, r in zip(group, results)]
+
+def run_fanout(tasks: list[OrderTask], send: Callable[[OrderTask], ExecResult],
+               group_key: Optional[Callable[[OrderTask], object]] = None,
+               send_group: Optional[Callable[[object, list[OrderTask]], list[ExecResult]]] = None,
+               max_group: int = 0) -> list[OrderOutcome]:
+    """Send all tasks concurrently; outcomes are returned in the same order as `tasks`.
+
+    Tasks for which `group_key(task)` is not None are batched per key (at most
+    `max_group` per call when > 0) and sent with `send_group(key, tasks)`.
+    """
+    if not tasks:
+        return []
+    units: list[tuple[object, list[OrderTask]]] = []
+    open_groups: dict = {}
+    for t in tasks:
+        key = group_key(t) if group_key and send_group else None
+        if key is None:
+            units.append((None, [t]))
+            continue
+        group = open_groups.get(key)
+        if group is None or (max_group and len(group) >= max_group):
+            group = open_groups[key] = []
+            units.append((key, group))
+        group.append(t)
+
+    t0 = time.perf_counter()
+    pool = _get_pool()
+    futures = [pool.submit(_run_unit, key, group, send, send_group, t0) for key, group in units]
+    by_task = {id(o.task): o for f in futures for o in f.result()}
+    return [by_task[id(t)] for t in tasks]
+
+def shutdown():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
@@ -1,29 +1,138 @@
-import json
+import json, math, time
 from datetime import datetime, timezone
-from sqlalchemy import select
-from .db import SessionLocal
-from .models import TradeIntent, CopySet, CopySetSlave, Account, PropFirm, RiskProfile, ExecutionLog
-from .rules import is_weekend_rome
-from .executors import exec_ctrader, exec_mt5
+from .db import SessionLocal, check_schema
+from dupli_core.models import TradeIntent
+from dupli_core.trading_windows import get_calendar
+from dupli_core import metrics
+from .executors import (ExecResult, exec_ctrader, exec_mt5, exec_mt5_batch, gateway_pool_stats,
+                        mt5_gateway_url, warm_gateways, MT5_BATCH_ENABLED, MT5_BATCH_MAX)
+from .fanout import OrderOutcome, OrderTask, run_fanout
+from .routing import get_routes
+from .logwriter import get_log_writer
+from .redisconn import get_redis
+from .shards import EXEC_SHARDS, RetryEntry, complete, dispatch
+from .sizing import fallback_reasons, reference_price, risk_table, size_lots
+from .rulesets import evaluate, rule_table
+from .account_state import get_account_states
+from .events import intent_event, publish_events
 import uuid
+import redis
+from sqlalchemy import select, text
 
-def execute_trade_intent(trade_intent_id: str):
+# a redelivered stream entry for an intent in one of these states is not re-executed
+FINAL_STATUSES = ("DONE", "FAILED", "DISPATCHED")
+# a shard sub-job whose completion can't be recorded is left pending after this many tries
+COMPLETE_ATTEMPTS = 3
+
+def warm_up() -> None:
+    """Open the DB pool, Redis and gateway connections before the first intent arrives."""
     db = SessionLocal()
     try:
-        intent = db.get(TradeIntent, trade_intent_id)
+        db.execute(text("SELECT 1"))
+    finally:
+        db.close()
+    check_schema()  # fail fast on a database the API has not upgraded yet
+    get_log_writer()
+    warm_gateways()
+    get_account_states().start()
+
+def _get_intent(db, trade_intent_id, created_at: str | None = None, for_update: bool = False):
+    # (id, created_at) is the key of the partitioned table: with created_at (carried by the
+    # stream entry) only that month's partition is read; without it every partition is probed
+    key = uuid.UUID(str(trade_intent_id))
+    if created_at:
+        return db.get(TradeIntent, (key, datetime.fromisoformat(created_at)), with_for_update=for_update or None)
+    q = select(TradeIntent).where(TradeIntent.id == key)
+    return db.execute(q.with_for_update() if for_update else q).scalars().first()
+
+def fail_trade_intent(trade_intent_id: str, reason: str, created_at: str | None = None) -> None:
+    db = SessionLocal()
+    try:
+        intent = _get_intent(db, trade_intent_id, created_at)
+        if intent and intent.status not in FINAL_STATUSES:
+            intent.status = "FAILED"
+            event = intent_event(intent, reason=reason)
+            db.commit()
+            publish_events([event])
+            metrics.observe_intent("FAILED")
+            print(f"Intent {trade_intent_id} FAILED: {reason}", flush=True)
+    finally:
+        db.close()
+
+def send_order(task: OrderTask) -> ExecResult:
+    if task.platform == "MT5":
+        return exec_mt5(task.external_id, task.payload)
+    return exec_ctrader(task.external_id, task.payload)
+
+def gateway_key(task: OrderTask):
+    # MT5 slaves behind the same gateway share one batch call; others go one by one
+    if MT5_BATCH_ENABLED and task.platform == "MT5":
+        return mt5_gateway_url(task.external_id)
+    return None
+
+def send_gateway_batch(url: str, tasks: list[OrderTask]) -> list[ExecResult]:
+    return exec_mt5_batch(url, [(t.external_id, t.payload) for t in tasks])
+
+def shard_key(task: OrderTask) -> str:
+    # one shard per gateway (its orders stay one batch call), otherwise per account
+    key = gateway_key(task)
+    return f"gw:{key}" if key else f"acct:{task.account_id}"
+
+def _ack_timings(base: float, outcomes: list[OrderOutcome]) -> dict:
+    if not outcomes:
+        return {}
+    first = min(outcomes, key=lambda o: o.started_ms)
+    t = {"first_order": base + first.started_ms / 1000.0}
+    t["first_ack"] = t["first_order"] + first.latency_ms / 1000.0
+    t["last_ack"] = base + max(o.started_ms + o.latency_ms for o in outcomes) / 1000.0
+    return t
+
+def _record_orders(base: float, outcomes: list[OrderOutcome], received) -> None:
+    # runs on the metrics thread (metrics.defer)
+    metrics.record_orders(((o.task.platform, mt5_gateway_url(o.task.external_id) if o.task.platform == "MT5" else "ctrader",
+                            str(o.task.account_id), o.result.ok, base + o.started_ms / 1000.0, o.latency_ms / 1000.0)
+                           for o in outcomes), received)
+
+def _log_message(message: str | None, note: str | None) -> str | None:
+    return f"{message} ({note})" if message and note else message or note
+
+def _print_done(intent_id, orders: int, slowest_ms: float, timings: dict) -> None:
+    msg = f"Intent {intent_id}: {orders} orders sent, slowest account {slowest_ms} ms"
+    if "received" in timings and "first_order" in timings:
+        msg += f", signal-to-first-order {(timings['first_order'] - timings['received']) * 1000:.1f} ms"
+    print(msg, flush=True)
+
+def execute_trade_intent(trade_intent_id: str, timings: dict | None = None, created_at: str | None = None):
+    # `timings` carries stage timestamps (epoch seconds) from ingest/API; the worker
+    # adds its own and stores them on the intent for signal-to-fill measurement.
+    timings = dict(timings or {})
+    timings["dequeued"] = time.time()
+    db = SessionLocal()
+    try:
+        intent = _get_intent(db, trade_intent_id, created_at)
         if not intent:
             return {"error": "intent_not_found"}
+        if intent.status in FINAL_STATUSES:
+            # at-least-once delivery: a retry after a crash between commit and XACK
+            return {"skipped": f"already {intent.status}"}
 
-        # find active copysets for this master
-        copysets = db.execute(select(CopySet).where(CopySet.master_id == intent.master_id, CopySet.is_active == True)).scalars().all()
-        if not copysets:
+        # resolved slaves of every active copyset for this master (cached routing snapshot)
+        routes = get_routes(db, intent.master_id)
+        if routes is None:
             intent.status = "FAILED"
+            intent.timings = json.dumps(timings)
+            event = intent_event(intent, reason="no_copysets_for_master")
             db.commit()
+            publish_events([event])
+            metrics.observe_intent("FAILED")
             return {"error": "no_copysets_for_master"}
 
         now = datetime.now(timezone.utc)
+        action = intent.action or "OPEN"
         payload = {
             "id": str(intent.id),
+            "action": action,  # edits/follow-ups act on the positions opened by parent_id
+            "parent_id": str(intent.parent_id) if intent.parent_id else None,
             "symbol": intent.symbol,
             "side": intent.side,
             "order_type": intent.order_type,
@@ -34,55 +143,177 @@ def execute_trade_intent(trade_intent_id: str):
             "tps": json.loads(intent.tps) if intent.tps else None,
         }
 
-        for cs in copysets:
-            slaves = db.execute(select(CopySetSlave).where(CopySetSlave.copy_set_id == cs.id)).scalars().all()
-            for s in slaves:
-                acc = db.get(Account, s.account_id)
-                if not acc:
+        # Resolve every slave first (rules + sizing), then send all orders at once.
+        # `entries` keeps the copyset/slave order so logs are written deterministically.
+        # Lots for all slaves come from one vectorized pass (sizing.py), rule sets from
+        # one pass of compiled predicates (rulesets.py) that names the blocking rule.
+        lots = None
+        blocked = {}
+        ruled = {}
+        notes = {}  # route index -> sizing fallback, appended to the slave's log message
+        if action == "OPEN":
+            # entry blocks only: a modify/close must still reach open positions.
+            # One interval-index lookup per prop, not per slave.
+            blocked = get_calendar().blocked_props(routes, now)
+            ref = reference_price(intent.entry, intent.zone_low, intent.zone_high)
+            states = get_account_states()
+            equity = states.equity_vector(routes)  # cached, no broker call
+            risk = risk_table(routes)
+            lots = size_lots(risk, intent.symbol, ref, intent.sl, equity)
+            notes = fallback_reasons(risk, ref, intent.sl, equity)
+            timings["sized"] = time.time()
+            table = rule_table(routes)
+            if table.active:
+                ruled = evaluate(table, intent.symbol, lots, states.rule_inputs(routes, intent.symbol))
+                timings["rules"] = time.time()
+            lots = lots.tolist()
+        entries = []
+        tasks = []
+        task_notes = {}  # id(task) -> sizing note
+        for i, r in enumerate(routes):
+            why = blocked.get(r.prop_firm_id) if blocked else None
+            if why:
+                entries.append((r.account_id, "SKIPPED", why))
+                continue
+
+            lot = None
+            if lots is not None and not math.isnan(lots[i]):
+                lot = lots[i]
+                if lot <= 0:
+                    entries.append((r.account_id, "SKIPPED",
+                                    _log_message(f"Lot below broker minimum for {intent.symbol}", notes.get(i))))
                     continue
+            if i in ruled:
+                entries.append((r.account_id, "SKIPPED", ruled[i]))
+                continue
 
-                # v0.1 rules
-                if acc.prop_firm_id:
-                    prop = db.get(PropFirm, acc.prop_firm_id)
-                    if prop:
-                        if is_weekend_rome(now) and not prop.weekend_trading:
-                            db.add(ExecutionLog(trade_intent_id=intent.id, account_id=acc.id, status="SKIPPED",
-                                                message=f"Weekend blocked by prop '{prop.name}'"))
-                            db.commit()
-                            continue
-                        if prop.news_red_block:
-                            db.add(ExecutionLog(trade_intent_id=intent.id, account_id=acc.id, status="SKIPPED",
-                                                message=f"NEWS_RED block active for prop '{prop.name}'"))
-                            db.commit()
-                            continue
-
-                # risk engine v0.1: fixed_lot or max_lot cap (simplified)
-                lot = None
-                if acc.risk_profile_id:
-                    rp = db.get(RiskProfile, acc.risk_profile_id)
-                    if rp:
-                        if rp.method == "fixed_lot":
-                            lot = rp.fixed_lot
-                        else:
-                            # placeholder: treat risk_per_trade as fixed_lot until SL-distance sizing is added
-                            lot = rp.fixed_lot
-                        if lot and rp.max_lot:
-                            lot = min(lot, rp.max_lot)
-
-                payload2 = dict(payload)
-                payload2["lot"] = lot
-
-                if acc.platform.upper() == "MT5":
-                    res = exec_mt5(acc.external_id or "", payload2)
-                else:
-                    res = exec_ctrader(acc.external_id or "", payload2)
-
-                db.add(ExecutionLog(trade_intent_id=intent.id, account_id=acc.id,
-                                    status="OK" if res.ok else "ERROR", message=res.message))
-                db.commit()
+            payload2 = dict(payload)
+            payload2["lot"] = lot
+            task = OrderTask(account_id=r.account_id, platform=r.platform, external_id=r.external_id, payload=payload2)
+            if i in notes:
+                task_notes[id(task)] = notes[i]
+            entries.append(task)
+            tasks.append(task)
 
+        timings["routed"] = time.time()
+        skipped = [dict(trade_intent_id=intent.id, account_id=e[0], created_at=now, status=e[1], message=e[2],
+                        latency_ms=None) for e in entries if not isinstance(e, OrderTask)]
+        if EXEC_SHARDS and tasks:
+            # per-gateway/per-account sub-jobs on the shard streams (see shards.py)
+            subjobs: dict[str, dict] = {}
+            for t in tasks:
+                sub = subjobs.setdefault(shard_key(t), {"orders": [], "received": timings.get("received"),
+                                                        "created_at": intent.created_at.isoformat()})
+                sub["orders"].append({"account_id": str(t.account_id), "platform": t.platform,
+                                      "external_id": t.external_id, "payload": t.payload,
+                                      **({"note": task_notes[id(t)]} if id(t) in task_notes else {})})
+            if dispatch(get_redis(), str(intent.id), list(subjobs.items())):
+                get_log_writer().submit(skipped)
+            else:
+                print(f"Intent {intent.id} was already dispatched; not sending twice", flush=True)
+            timings["dispatched"] = time.time()
+            event = intent_event(intent, status="DISPATCHED", shards=len(subjobs), skipped=len(skipped))
+            if _mark_dispatched(db, intent.id, intent.created_at, timings):
+                publish_events([event])
+            metrics.observe_stages(timings, metrics.WORKER_STAGES)
+            return {"ok": True, "dispatched": len(subjobs), "skipped": len(skipped)}
+
+        outcomes = run_fanout(tasks, send_order, group_key=gateway_key,
+                              send_group=send_gateway_batch, max_group=MT5_BATCH_MAX)
+        timings.update(_ack_timings(timings["routed"], outcomes))
+        metrics.defer(_record_orders, timings["routed"], outcomes, timings.get("received"))
+        outcomes = iter(outcomes)  # same order as `tasks`
+
+        latencies = {}
+        rows = []
+        for e in entries:
+            if isinstance(e, OrderTask):
+                o = next(outcomes)
+                latencies[str(e.account_id)] = round(o.latency_ms, 2)
+                rows.append(dict(trade_intent_id=intent.id, account_id=e.account_id, created_at=now,
+                                 status="OK" if o.result.ok else "ERROR",
+                                 message=_log_message(o.result.message, task_notes.get(id(e))),
+                                 latency_ms=o.latency_ms))
+            else:
+                account_id, status, message = e
+                rows.append(dict(trade_intent_id=intent.id, account_id=account_id, created_at=now,
+                                 status=status, message=message, latency_ms=None))
+        get_log_writer().submit(rows)
+
+        intent.status = "DONE"
+        intent.timings = json.dumps(timings)
+        event = intent_event(intent, orders=len(tasks), skipped=len(rows) - len(tasks))
+        db.commit()
+        publish_events([event])
+        metrics.observe_stages(timings, metrics.WORKER_STAGES)
+        metrics.observe_intent("DONE")
+        _print_done(intent.id, len(tasks), max(latencies.values(), default=0.0), timings)
+        return {"ok": True, "latency_ms": latencies, "mt5_pool": gateway_pool_stats()}
+    finally:
+        db.close()
+
+def _mark_dispatched(db, intent_id, created_at, timings: dict) -> bool:
+    """DISPATCHED unless the last sub-job already closed the intent (it can finish before this
+    commit); the worker's timings are merged either way. False when it was already DONE/FAILED."""
+    status = db.execute(text(
+        "UPDATE trade_intents SET status = CASE WHEN status IN ('DONE', 'FAILED') THEN status ELSE 'DISPATCHED' END, "
+        "timings = (CAST(coalesce(timings, '{}') AS jsonb) || CAST(:timings AS jsonb))::text "
+        "WHERE id = :id AND created_at = :created_at RETURNING status"),
+        {"id": intent_id, "created_at": created_at, "timings": json.dumps(timings)}).scalar()
+    db.commit()
+    return status == "DISPATCHED"
+
+def execute_shard_job(trade_intent_id: str, sub: dict):
+    """One gateway/account slice of an intent, run by the shard that owns its key."""
+    tasks = [OrderTask(account_id=uuid.UUID(o["account_id"]), platform=o["platform"],
+                       external_id=o["external_id"], payload=o["payload"]) for o in sub["orders"]]
+    notes = {id(t): o["note"] for t, o in zip(tasks, sub["orders"]) if o.get("note")}
+    start = time.time()
+    now = datetime.now(timezone.utc)
+    outcomes = run_fanout(tasks, send_order, group_key=gateway_key,
+                          send_group=send_gateway_batch, max_group=MT5_BATCH_MAX)
+    metrics.defer(_record_orders, start, outcomes, sub.get("received"))
+    get_log_writer().submit([dict(trade_intent_id=uuid.UUID(trade_intent_id), account_id=o.task.account_id,
+                                  created_at=now, status="OK" if o.result.ok else "ERROR",
+                                  message=_log_message(o.result.message, notes.get(id(o.task))),
+                                  latency_ms=o.latency_ms) for o in outcomes])
+    t = _ack_timings(start, outcomes)
+    t["slowest_ms"] = round(max((o.latency_ms for o in outcomes), default=0.0), 2)
+    t["orders"] = len(outcomes)
+    for attempt in range(1, COMPLETE_ATTEMPTS + 1):
+        try:
+            subs = complete(get_redis(), trade_intent_id, sub["key"], t)
+            break
+        except redis.RedisError as e:
+            if attempt == COMPLETE_ATTEMPTS:
+                # not acked: the shard's next owner re-runs it (the gateway dedups the resent orders)
+                raise RetryEntry(f"could not record completion: {e}")
+            time.sleep(0.2 * attempt)
+    if subs is not None:
+        _finish_intent(trade_intent_id, subs, sub.get("created_at"))
+
+def _finish_intent(trade_intent_id: str, subs: list[dict], created_at: str | None = None) -> None:
+    # the last sub-job to finish closes the intent with the merged stage timings; the row
+    # lock orders this after the consumer's DISPATCHED update (its timings are kept)
+    db = SessionLocal()
+    try:
+        intent = _get_intent(db, trade_intent_id, created_at, for_update=True)
+        if not intent or intent.status == "DONE":
+            return
+        timings = json.loads(intent.timings) if intent.timings else {}
+        sent = [s for s in subs if "first_order" in s]
+        if sent:
+            timings["first_order"] = min(s["first_order"] for s in sent)
+            timings["first_ack"] = min(s["first_ack"] for s in sent)
+            timings["last_ack"] = max(s["last_ack"] for s in sent)
         intent.status = "DONE"
+        intent.timings = json.dumps(timings)
+        event = intent_event(intent, orders=sum(s.get("orders", 0) for s in subs))
         db.commit()
-        return {"ok": True}
+        publish_events([event])
+        metrics.observe_stages(timings, ("first_order", "first_ack", "last_ack"))
+        metrics.observe_intent("DONE")
+        _print_done(intent.id, sum(s.get("orders", 0) for s in subs),
+                    max((s.get("slowest_ms", 0.0) for s in subs), default=0.0), timings)
     finally:
         db.close()
@@ -0,0 +1,90 @@
+import atexit, os, queue, time
+from threading import Thread, Lock
+from typing import Optional
+from sqlalchemy import insert
+from .db import get_engine
+from dupli_core.models import ExecutionLog
+from .events import exec_events, publish_events
+
+# ExecutionLog rows are handed to a background thread and written with one
+# multi-row INSERT per flush, so the order path never waits on Postgres.
+# Rows from several intents are coalesced for up to EXECLOG_FLUSH_INTERVAL_MS.
+# Written rows are then published as live "exec" events (events.py).
+EXECLOG_FLUSH_INTERVAL_MS = float(os.getenv("EXECLOG_FLUSH_INTERVAL_MS", "200"))
+EXECLOG_MAX_BATCH = int(os.getenv("EXECLOG_MAX_BATCH", "1000"))
+EXECLOG_WRITE_RETRIES = int(os.getenv("EXECLOG_WRITE_RETRIES", "3"))
+
+_STOP = object()
+
+class ExecutionLogWriter:
+    def __init__(self, bind=None, flush_interval_ms: float = EXECLOG_FLUSH_INTERVAL_MS,
+                 max_batch: int = EXECLOG_MAX_BATCH):
+        self._bind = bind or get_engine()
+        self._interval = flush_interval_ms / 1000.0
+        self._max_batch = max_batch
+        self._q: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = Thread(target=self._run, name="execlog-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, rows: list[dict]) -> None:
+        """Queue rows for insertion; never blocks."""
+        if rows:
+            self._q.put(rows)
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        """Flush everything queued so far and stop the writer thread."""
+        if self._thread.is_alive():
+            self._q.put(_STOP)
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._q.get()
+            if item is _STOP:
+                break
+            batch = list(item)
+            deadline = time.monotonic() + self._interval
+            while len(batch) < self._max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.extend(item)
+            self._write(batch)
+
+    def _write(self, batch: list[dict]) -> None:
+        for attempt in range(1, EXECLOG_WRITE_RETRIES + 1):
+            try:
+                with self._bind.begin() as conn:
+                    conn.execute(insert(ExecutionLog), batch)
+                publish_events(exec_events(batch))
+                return
+            except Exception as e:
+                print(f"WARN: execution log flush failed ({len(batch)} rows, attempt {attempt}): {e}", flush=True)
+                time.sleep(0.2 * attempt)
+        print(f"ERROR: dropped {len(batch)} execution log rows after {EXECLOG_WRITE_RETRIES} attempts", flush=True)
+
+_writer: Optional[ExecutionLogWriter] = None
+_lock = Lock()
+
+def get_log_writer() -> ExecutionLogWriter:
+    global _writer
+    with _lock:
+        if _writer is None:
+            _writer = ExecutionLogWriter()
+            atexit.register(close_log_writer)
+        return _writer
+
+def close_log_writer() -> None:
+    global _writer
+    with _lock:
+        w, _writer = _writer, None
+    if w is not None:
+        w.close()
@@ -0,0 +1,12 @@
+import os
+from typing import Optional
+import redis
+
+_client: Optional[redis.Redis] = None
+
+def get_redis() -> redis.Redis:
+    """Process-wide Redis client (connection pool is shared by all callers)."""
+    global _client
+    if _client is None:
+        _client = redis.from_url(os.getenv("REDIS_URL", "redis://redis:6379/0"), socket_connect_timeout=2)
+    return _client
@@ -0,0 +1,111 @@
+import os, time
+from dataclasses import dataclass
+from threading import Lock
+from typing import Optional
+import redis
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from dupli_core.keys import ROUTING_VERSION_KEY
+from dupli_core.models import CopySet, CopySetSlave, Account, PropFirm, RiskProfile, RuleSet
+from .redisconn import get_redis
+from .rulesets import RuleSpec
+
+# Routing snapshot: master_id -> every resolved slave (account + prop + risk settings),
+# loaded with one joined query and kept in worker memory. The API bumps
+# ROUTING_VERSION_KEY whenever accounts, copysets, props, risk profiles or rule sets change;
+# the worker compares it once per intent and reloads only when it moved.
+ROUTING_MAX_AGE_S = float(os.getenv("ROUTING_MAX_AGE_S", "30"))  # fallback when Redis is unreachable
+
+@dataclass(frozen=True)
+class SlaveRoute:
+    copy_set_id: object
+    account_id: object
+    account_name: str
+    platform: str
+    external_id: str
+    prop_firm_id: object
+    prop_name: Optional[str]
+    weekend_trading: bool
+    news_red_block: bool
+    news_blackout: bool
+    risk_profile_id: object
+    risk_method: Optional[str]
+    risk_percent: Optional[float]
+    fixed_lot: Optional[float]
+    max_lot: Optional[float]
+    rules: tuple = ()  # RuleSpec of the prop's and the account's active rule sets
+
+@dataclass
+class RoutingSnapshot:
+    version: Optional[bytes]
+    loaded_at: float
+    routes: dict  # master_id -> tuple[SlaveRoute, ...]
+
+_snapshot: Optional[RoutingSnapshot] = None
+_lock = Lock()
+
+def load_snapshot(db: Session, version: Optional[bytes] = None) -> RoutingSnapshot:
+    stmt = (
+        select(CopySet.master_id, CopySet.id, Account, PropFirm, RiskProfile)
+        .outerjoin(CopySetSlave, CopySetSlave.copy_set_id == CopySet.id)
+        .outerjoin(Account, Account.id == CopySetSlave.account_id)
+        .outerjoin(PropFirm, PropFirm.id == Account.prop_firm_id)
+        .outerjoin(RiskProfile, RiskProfile.id == Account.risk_profile_id)
+        .where(CopySet.is_active == True)
+        .order_by(CopySet.master_id, CopySet.id, CopySetSlave.id)
+    )
+    by_owner: dict = {}
+    for rs in db.execute(select(RuleSet).where(RuleSet.is_active == True).order_by(RuleSet.name)).scalars():
+        spec = RuleSpec.from_json(rs.name, rs.rules)
+        by_owner.setdefault(rs.prop_firm_id or rs.account_id, []).append(spec)
+    routes: dict = {}
+    for master_id, copy_set_id, acc, prop, rp in db.execute(stmt):
+        lst = routes.setdefault(master_id, [])
+        if acc is None:
+            continue  # active copyset without (valid) slaves
+        lst.append(SlaveRoute(
+            copy_set_id=copy_set_id,
+            account_id=acc.id,
+            account_name=acc.name,
+            platform=(acc.platform or "").upper(),
+            external_id=acc.external_id or "",
+            prop_firm_id=prop.id if prop else None,
+            prop_name=prop.name if prop else None,
+            weekend_trading=bool(prop.weekend_trading) if prop else False,
+            news_red_block=bool(prop.news_red_block) if prop else False,
+            news_blackout=bool(prop.news_blackout) if prop else False,
+            risk_profile_id=rp.id if rp else None,
+            risk_method=rp.method if rp else None,
+            risk_percent=rp.risk_percent if rp else None,
+            fixed_lot=rp.fixed_lot if rp else None,
+            max_lot=rp.max_lot if rp else None,
+            rules=tuple(by_owner.get(prop.id, ()) if prop else ()) + tuple(by_owner.get(acc.id, ())),
+        ))
+    return RoutingSnapshot(version=version, loaded_at=time.monotonic(),
+                           routes={k: tuple(v) for k, v in routes.items()})
+
+def _current_version() -> Optional[bytes]:
+    try:
+        return get_redis().get(ROUTING_VERSION_KEY) or b"0"
+    except redis.RedisError:
+        return None
+
+def get_routes(db: Session, master_id) -> Optional[tuple]:
+    """Resolved slaves for `master_id`, or None when the master has no active copyset."""
+    global _snapshot
+    version = _current_version()
+    with _lock:
+        snap = _snapshot
+        stale = (
+            snap is None
+            or (version is not None and version != snap.version)
+            or (version is None and time.monotonic() - snap.loaded_at > ROUTING_MAX_AGE_S)
+        )
+        if stale:
+            snap = _snapshot = load_snapshot(db, version)
+    return snap.routes.get(master_id)
+
+def invalidate() -> None:
+    global _snapshot
+    with _lock:
+        _snapshot = None
@@ -0,0 +1,165 @@
+import json
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Optional
+import numpy as np
+
+# Declarative per-prop / per-account entry rules (RuleSet rows, JSON rules):
+#
+#   symbol_whitelist    ["XAUUSD", ...]         symbol must be listed
+#   max_open_trades     5                       open positions < limit
+#   daily_loss_limit    500.0                   day_start_equity - equity < limit
+#   max_lot_per_symbol  {"XAUUSD": 2.0, "*": 5} open lots on the symbol + new lot <= cap
+#   max_spread          {"XAUUSD": 0.5}         current spread <= cap (price units)
+#
+# Every route carries the specs of its prop and its account. A RuleTable compiles a
+# master's routes once per routing snapshot into one limit array per rule (strictest
+# value across specs, plus the name of the set it came from); symbol-dependent rules
+# are compiled lazily per symbol. Per intent each rule is one vectorized comparison
+# over all slaves against the account-state arrays. Unknown or stale account state
+# never blocks (NaN compares False): sizing already falls back the same way.
+RULE_ORDER = ("symbol_whitelist", "max_open_trades", "daily_loss_limit", "max_lot_per_symbol", "max_spread")
+
+@dataclass(frozen=True)
+class RuleSpec:
+    name: str  # rule set name, reported in block reasons
+    symbol_whitelist: Optional[frozenset] = None
+    max_open_trades: Optional[int] = None
+    daily_loss_limit: Optional[float] = None
+    max_lot_per_symbol: tuple = ()  # ((symbol | "*", lot), ...)
+    max_spread: tuple = ()
+
+    @classmethod
+    def from_json(cls, name: str, raw: Optional[str]) -> "RuleSpec":
+        d = json.loads(raw or "{}")
+        wl = d.get("symbol_whitelist")
+        return cls(name=name,
+                   symbol_whitelist=frozenset(s.upper() for s in wl) if wl is not None else None,
+                   max_open_trades=d.get("max_open_trades"),
+                   daily_loss_limit=d.get("daily_loss_limit"),
+                   max_lot_per_symbol=tuple(sorted((k.upper(), float(v)) for k, v in (d.get("max_lot_per_symbol") or {}).items())),
+                   max_spread=tuple(sorted((k.upper(), float(v)) for k, v in (d.get("max_spread") or {}).items())))
+
+def _per_symbol(pairs: tuple, symbol: str) -> Optional[float]:
+    default = None
+    for s, v in pairs:
+        if s == symbol:
+            return v
+        if s == "*":
+            default = v
+    return default
+
+def _strictest(routes, value) -> tuple[np.ndarray, np.ndarray]:
+    """(limit, set name) per route: the lowest value any of its specs sets (inf = no limit)."""
+    n = len(routes)
+    limit = np.full(n, np.inf)
+    src = np.empty(n, dtype=object)
+    for i, r in enumerate(routes):
+        for spec in r.rules:
+            v = value(spec)
+            if v is not None and v < limit[i]:
+                limit[i], src[i] = v, spec.name
+    return limit, src
+
+@dataclass
+class SymbolRules:
+    allowed: np.ndarray
+    allowed_src: np.ndarray
+    lot_cap: np.ndarray
+    lot_src: np.ndarray
+    spread_cap: np.ndarray
+    spread_src: np.ndarray
+
+@dataclass
+class RuleTable:
+    routes: tuple
+    active: bool  # False: no route has rules, evaluate() is a no-op
+    max_open: np.ndarray
+    max_open_src: np.ndarray
+    loss_limit: np.ndarray
+    loss_src: np.ndarray
+    _symbols: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_routes(cls, routes) -> "RuleTable":
+        max_open, max_open_src = _strictest(routes, lambda s: s.max_open_trades)
+        loss_limit, loss_src = _strictest(routes, lambda s: s.daily_loss_limit)
+        return cls(routes=routes, active=any(r.rules for r in routes), max_open=max_open,
+                   max_open_src=max_open_src, loss_limit=loss_limit, loss_src=loss_src)
+
+    def for_symbol(self, symbol: str) -> SymbolRules:
+        sr = self._symbols.get(symbol)
+        if sr is None:
+            n = len(self.routes)
+            allowed = np.ones(n, dtype=bool)
+            allowed_src = np.empty(n, dtype=object)
+            for i, r in enumerate(self.routes):
+                for spec in r.rules:
+                    if spec.symbol_whitelist is not None and symbol not in spec.symbol_whitelist:
+                        allowed[i], allowed_src[i] = False, spec.name
+                        break
+            lot_cap, lot_src = _strictest(self.routes, lambda s: _per_symbol(s.max_lot_per_symbol, symbol))
+            spread_cap, spread_src = _strictest(self.routes, lambda s: _per_symbol(s.max_spread, symbol))
+            sr = self._symbols[symbol] = SymbolRules(allowed, allowed_src, lot_cap, lot_src, spread_cap, spread_src)
+        return sr
+
+_tables: dict[int, tuple[tuple, RuleTable]] = {}
+_tables_lock = Lock()
+
+def rule_table(routes: tuple) -> RuleTable:
+    # same identity-keyed cache as sizing.risk_table
+    with _tables_lock:
+        hit = _tables.get(id(routes))
+        if hit is not None and hit[0] is routes:
+            return hit[1]
+        if len(_tables) > 4096:
+            _tables.clear()
+        table = RuleTable.from_routes(routes)
+        _tables[id(routes)] = (routes, table)
+        return table
+
+@dataclass
+class RuleInputs:
+    """Account-state columns aligned with the routes (NaN = unknown / stale)."""
+    open_trades: np.ndarray
+    daily_loss: np.ndarray
+    symbol_lots: np.ndarray
+    spread: np.ndarray
+
+def evaluate(table: RuleTable, symbol: str, lots, inputs: Optional[RuleInputs]) -> dict[int, str]:
+    """Route index -> reason for every slave a rule blocks (first failing rule in RULE_ORDER)."""
+    if not table.active:
+        return {}
+    symbol = (symbol or "").upper()
+    sr = table.for_symbol(symbol)
+    n = len(table.routes)
+    lot = np.asarray(lots if lots is not None else np.full(n, np.nan), dtype=np.float64)
+    if inputs is None:
+        inputs = RuleInputs(*(np.full(n, np.nan) for _ in range(4)))
+    held = np.nan_to_num(inputs.symbol_lots)
+    with np.errstate(invalid="ignore"):  # NaN (unknown state) compares False
+        # (rule, failed mask, set names, detail format, columns for the format)
+        checks = (
+            ("symbol_whitelist", ~sr.allowed, sr.allowed_src, symbol + " not in whitelist", ()),
+            ("max_open_trades", inputs.open_trades >= table.max_open, table.max_open_src,
+             "{:g} open >= {:g}", (inputs.open_trades, table.max_open)),
+            ("daily_loss_limit", inputs.daily_loss >= table.loss_limit, table.loss_src,
+             "daily loss {:.2f} >= {:g}", (inputs.daily_loss, table.loss_limit)),
+            ("max_lot_per_symbol", held + lot > sr.lot_cap + 1e-9, sr.lot_src,
+             "{:g} open + {:g} > {:g} lots on " + symbol, (held, lot, sr.lot_cap)),
+            ("max_spread", inputs.spread > sr.spread_cap, sr.spread_src,
+             "spread {:g} > {:g} on " + symbol, (inputs.spread, sr.spread_cap)),
+        )
+    out: dict[int, str] = {}
+    done = np.zeros(n, dtype=bool)
+    for rule, failed, src, fmt, cols in checks:
+        hit = failed & ~done
+        if not hit.any():
+            continue
+        done |= failed
+        idx = np.flatnonzero(hit)
+        names = src[idx].tolist()
+        vals = [c[idx].tolist() for c in cols]
+        for k, i in enumerate(idx.tolist()):
+            out[i] = f"Rule {rule} of rule set '{names[k]}': " + fmt.format(*(v[k] for v in vals))
+    return out
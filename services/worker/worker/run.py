@@ -1,20 +1,81 @@
 import os
 import sys
-import redis
-from rq import Worker, Queue
+import signal
+import time
+import multiprocessing as mp
+from .consumer import ExecConsumer, EXEC_STREAM
+from .shards import ShardManager, EXEC_SHARDS
+from .logwriter import close_log_writer
+from .redisconn import get_redis
+from dupli_core import metrics
+
+# Long-lived consumer processes of the execution stream. Each is warmed up once
+# (DB pool, gateway sessions, log writer) and then handles intents in-process, so
+# in-memory state such as the routing snapshot survives between intents. Scale
+# with EXEC_WORKER_PROCESSES per container and/or more worker replicas.
+EXEC_WORKER_PROCESSES = int(os.getenv("EXEC_WORKER_PROCESSES", "1"))
+
+
+def consume():
+    from .jobs import execute_shard_job, execute_trade_intent, fail_trade_intent, warm_up
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    warm_up()
+    consumer = ExecConsumer(get_redis(), execute_trade_intent, fail_trade_intent)
+    shards = None
+    if EXEC_SHARDS:
+        shards = ShardManager(get_redis(), consumer.name, execute_shard_job)
+        shards.start()
+    try:
+        consumer.run(lambda: stopping)
+    finally:
+        if shards is not None:
+            shards.stop()  # finish the sub-job in hand, release leases
+        close_log_writer()  # flush buffered ExecutionLog rows before exiting
+        print(f"Consumer {consumer.name} stopped: {consumer.processed} processed, {consumer.failed} failed", flush=True)
 
 
 def main():
-    redis_url = os.getenv("REDIS_URL", "")
-    if not redis_url:
+    if not os.getenv("REDIS_URL", ""):
         print("FATAL: REDIS_URL is required but not set.", flush=True)
         sys.exit(1)
 
-    conn = redis.from_url(redis_url)
-    q = Queue("exec", connection=conn)
-    w = Worker([q], connection=conn)
-    print("Worker started, listening on queue 'exec'...", flush=True)
-    w.work(with_scheduler=True)
+    print(f"Worker started, consuming stream '{EXEC_STREAM}' with {EXEC_WORKER_PROCESSES} process(es)...", flush=True)
+    metrics.serve()
+    if EXEC_WORKER_PROCESSES <= 1:
+        consume()
+        return
+
+    # supervisor: pre-started consumer processes, restarted if one dies
+    ctx = mp.get_context("spawn")
+    procs: dict[int, mp.Process] = {}
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for p in procs.values():
+            p.terminate()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    while not stopping:
+        for i in range(EXEC_WORKER_PROCESSES):
+            p = procs.get(i)
+            if p is None or not p.is_alive():
+                if p is not None:
+                    print(f"Consumer process {i} exited with {p.exitcode}; restarting", flush=True)
+                p = procs[i] = ctx.Process(target=consume, name=f"exec-consumer-{i}")
+                p.start()
+        time.sleep(5)
+    for p in procs.values():
+        p.join(30)
 
 
 if __name__ == "__main__":
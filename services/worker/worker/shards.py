@@ -0,0 +1,241 @@
+import json, math, os, threading, time, zlib
+from typing import Callable, Optional
+import redis
+from dupli_core.keys import (EXEC_SHARDS, PROGRESS_PREFIX, SHARD_GROUP, WORKERS_KEY,
+                              lease_key, shard_stream)
+
+# Per-account execution shards. The intent consumer resolves routes and rules, then
+# splits the fan-out into sub-jobs keyed by MT5 gateway (one batch call) or by
+# account, each appended to shard_stream(n) where n = crc32(key) % EXEC_SHARDS.
+# Every shard is owned by exactly one runner thread at a time (a Redis lease), which
+# handles its entries strictly in stream order: orders for one account never overtake
+# each other, while a hung gateway or broker only holds up its own shard.
+EXEC_SHARD_LEASE_MS = int(os.getenv("EXEC_SHARD_LEASE_MS", "15000"))
+# Before each entry the runner extends its lease to cover one sub-job (gateway
+# timeouts and retries), so no other process can take the shard and re-claim the
+# entry while it is being sent; a runner that lost its lease stops before the next one.
+# (So a crashed worker's shards are taken over after at most this long.)
+EXEC_SHARD_ENTRY_MAX_MS = int(os.getenv("EXEC_SHARD_ENTRY_MAX_MS", "60000"))
+EXEC_SHARD_BLOCK_MS = int(os.getenv("EXEC_SHARD_BLOCK_MS", "1000"))
+EXEC_SHARD_STREAM_MAXLEN = int(os.getenv("EXEC_SHARD_STREAM_MAXLEN", "100000"))
+# per-intent completion state (PROGRESS_PREFIX + id: remaining sub-jobs + their timings)
+PROGRESS_TTL_S = 86400
+
+def renew_lease(r: redis.Redis, key: str, owner: str, ms: int) -> bool:
+    """Extend the lease to at least `ms` if `owner` still holds it (never shortens it)."""
+    with r.pipeline() as p:
+        try:
+            p.watch(key)
+            if p.get(key) != owner.encode():
+                return False
+            if p.pttl(key) < ms:
+                p.multi()
+                p.pexpire(key, ms)
+                p.execute()
+            return True
+        except redis.WatchError:
+            return False
+
+class RetryEntry(Exception):
+    """Raised by a shard handler to leave its entry pending: the runner stops and the
+    next owner of the shard runs the entry again (the gateway dedups resent orders)."""
+
+def shard_of(key: str, shards: int = EXEC_SHARDS) -> int:
+    return zlib.crc32(key.encode()) % shards
+
+def dispatch(r: redis.Redis, intent_id: str, subjobs: list[tuple[str, dict]]) -> bool:
+    """Append (shard key, sub-job) entries for an intent, all or nothing.
+
+    Returns False if the intent was already dispatched (a redelivered intent entry).
+    """
+    progress = PROGRESS_PREFIX + intent_id
+    with r.pipeline() as p:
+        try:
+            p.watch(progress)
+            if p.exists(progress):
+                return False
+            p.multi()
+            p.hset(progress, "remaining", len(subjobs))
+            p.expire(progress, PROGRESS_TTL_S)
+            for key, sub in subjobs:
+                p.xadd(shard_stream(shard_of(key)), {"intent_id": intent_id, "key": key, "sub": json.dumps(sub)},
+                       maxlen=EXEC_SHARD_STREAM_MAXLEN, approximate=True)
+            p.execute()
+        except redis.WatchError:
+            return False
+    return True
+
+def complete(r: redis.Redis, intent_id: str, key: str, timings: dict) -> Optional[list[dict]]:
+    """Record one finished sub-job; returns every sub-job's timings once the last one is done.
+
+    Safe to retry: the sub-job is counted at most once (a re-run or a retry whose reply was
+    lost sees its field and only reports whether the intent is complete).
+    """
+    progress = PROGRESS_PREFIX + intent_id
+    field = "sub:" + key
+    with r.pipeline() as p:
+        while True:
+            try:
+                p.watch(progress)
+                if p.hexists(progress, field):
+                    remaining, fields = int(p.hget(progress, "remaining") or 0), p.hgetall(progress)
+                else:
+                    p.multi()
+                    p.hset(progress, field, json.dumps(timings))
+                    p.hincrby(progress, "remaining", -1)
+                    p.hgetall(progress)
+                    _, remaining, fields = p.execute()
+                break
+            except redis.WatchError:
+                continue
+    if remaining > 0:
+        return None
+    try:
+        r.delete(progress)
+    except redis.RedisError as e:
+        print(f"WARN: could not delete {progress} (expires in {PROGRESS_TTL_S} s): {e}", flush=True)
+    return [json.loads(v) for k, v in fields.items() if k.startswith(b"sub:")]
+
+class ShardRunner(threading.Thread):
+    def __init__(self, r: redis.Redis, n: int, consumer: str, handle: Callable[[str, dict], None]):
+        super().__init__(name=f"exec-shard-{n}", daemon=True)
+        self.r, self.n, self.consumer, self.handle = r, n, consumer, handle
+        self.stream = shard_stream(n)
+        self.stopping = threading.Event()
+
+    def _hold(self) -> bool:
+        """Extend the lease over the next entry; False (and stop) when it is not ours any more."""
+        if self.stopping.is_set() or not renew_lease(self.r, lease_key(self.n), self.consumer, EXEC_SHARD_ENTRY_MAX_MS):
+            self.stopping.set()
+            return False
+        return True
+
+    def run(self) -> None:
+        try:
+            self.r.xgroup_create(self.stream, SHARD_GROUP, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        # entries the previous owner left unacked come first (lowest ids), keeping order
+        pending = self.r.xpending_range(self.stream, SHARD_GROUP, "-", "+", 1000)
+        if pending:
+            if not self._hold():
+                return
+            ids = [p["message_id"] for p in pending]
+            for entry_id, fields in self.r.xclaim(self.stream, SHARD_GROUP, self.consumer, 0, ids):
+                if not self._hold():
+                    return
+                if fields:
+                    self._process(entry_id, fields)
+        while not self.stopping.is_set():
+            try:
+                batch = self.r.xreadgroup(SHARD_GROUP, self.consumer, {self.stream: ">"},
+                                          count=1, block=EXEC_SHARD_BLOCK_MS)
+                for _, entries in batch or []:
+                    for entry_id, fields in entries:
+                        # a read but unprocessed entry stays pending for the next owner
+                        if not self._hold():
+                            return
+                        self._process(entry_id, fields)
+            except redis.RedisError as e:
+                print(f"WARN: shard {self.n} read failed: {e}", flush=True)
+                time.sleep(1)
+
+    def _process(self, entry_id, fields: dict) -> None:
+        eid = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+        intent_id = fields[b"intent_id"].decode()
+        try:
+            self.handle(intent_id, {"entry_id": eid, "key": fields[b"key"].decode(), **json.loads(fields[b"sub"])})
+        except RetryEntry as e:
+            print(f"ERROR: shard {self.n} sub-job {eid} (intent {intent_id}) left pending, stopping: {e}", flush=True)
+            self.stopping.set()
+            return
+        except Exception as e:
+            # an order may already be out: the gateway dedups by idempotency key, so the
+            # sub-job is logged and acked rather than retried forever ahead of later ones
+            print(f"ERROR: shard {self.n} sub-job {eid} (intent {intent_id}) failed: {e}", flush=True)
+        self.r.xack(self.stream, SHARD_GROUP, entry_id)
+
+class ShardManager(threading.Thread):
+    """Acquires/renews shard leases for this process and runs one ShardRunner per owned shard.
+
+    A runner that has to stop (lease lost, or shard handed over for fairness) is never
+    joined on the renewal path: it moves to `retired`, finishes the entry in hand and
+    exits; its shard is neither re-acquired nor released by this process until then.
+    """
+
+    def __init__(self, r: redis.Redis, consumer: str, handle: Callable[[str, dict], None]):
+        super().__init__(name="exec-shards", daemon=True)
+        self.r, self.consumer, self.handle = r, consumer, handle
+        self.runners: dict[int, ShardRunner] = {}
+        self.retired: dict[int, tuple[ShardRunner, bool]] = {}  # n -> (runner, release lease when it exits)
+        self.stopping = threading.Event()
+
+    def _retire(self, n: int, release: bool) -> None:
+        runner = self.runners.pop(n)
+        runner.stopping.set()
+        self.retired[n] = (runner, release)
+
+    def _delete_lease(self, n: int) -> None:
+        key = lease_key(n)
+        with self.r.pipeline() as p:
+            try:
+                p.watch(key)
+                if p.get(key) == self.consumer.encode():
+                    p.multi()
+                    p.delete(key)
+                    p.execute()
+            except redis.WatchError:
+                pass
+
+    def _tick(self) -> None:
+        now = time.time()
+        self.r.zadd(WORKERS_KEY, {self.consumer: now})
+        self.r.zremrangebyscore(WORKERS_KEY, 0, now - 3 * EXEC_SHARD_LEASE_MS / 1000.0)
+        fair = math.ceil(EXEC_SHARDS / max(self.r.zcard(WORKERS_KEY), 1))
+        for n, (runner, release) in list(self.retired.items()):
+            if not runner.is_alive():
+                del self.retired[n]
+                if release:
+                    self._delete_lease(n)  # the entry in hand is finished and acked
+                    print(f"Released shard {n}", flush=True)
+        for n in list(self.runners):
+            if not renew_lease(self.r, lease_key(n), self.consumer, EXEC_SHARD_LEASE_MS) or not self.runners[n].is_alive():
+                print(f"Lost lease on shard {n}", flush=True)
+                self._retire(n, release=False)
+        if len(self.runners) > fair:
+            n = max(self.runners)
+            self._retire(n, release=True)  # hand it to a process that joined later
+            print(f"Releasing shard {n} (fair share {fair})", flush=True)
+        for n in range(EXEC_SHARDS):
+            if len(self.runners) >= fair:
+                break
+            if n in self.runners or n in self.retired:
+                continue
+            if self.r.set(lease_key(n), self.consumer, nx=True, px=EXEC_SHARD_LEASE_MS):
+                runner = self.runners[n] = ShardRunner(self.r, n, self.consumer, self.handle)
+                runner.start()
+                print(f"Acquired shard {n}", flush=True)
+
+    def run(self) -> None:
+        while not self.stopping.is_set():
+            try:
+                self._tick()
+            except redis.RedisError as e:
+                print(f"WARN: shard lease renewal failed: {e}", flush=True)
+            self.stopping.wait(EXEC_SHARD_LEASE_MS / 3000.0)
+
+    def stop(self) -> None:
+        self.stopping.set()
+        self.join()
+        for n in list(self.runners):
+            self._retire(n, release=True)
+        for n, (runner, release) in list(self.retired.items()):
+            runner.join()
+            if release:
+                try:
+                    self._delete_lease(n)
+                except redis.RedisError:
+                    pass
+        self.retired.clear()
+        self.r.zrem(WORKERS_KEY, self.consumer)
@@ -0,0 +1,133 @@
+import json, os
+from dataclasses import dataclass
+from threading import Lock
+from typing import Optional
+import numpy as np
+
+# Lot sizing for every slave of an intent in one vectorized pass. Per-master arrays
+# (method, risk %, fixed lot, max lot) are built once per routing snapshot; per
+# signal only the equity vector and the SL distance change.
+#
+#   fixed_lot       lot = fixed_lot
+#   risk_per_trade  lot = equity * risk% / (|entry - sl| * value_per_point)
+#   percent_equity  lot = equity * risk% / (entry * value_per_point)   (notional exposure)
+#
+# value_per_point = contract_size * quote_to_account (account currency per 1.0 price
+# move per lot). Lots are floored to the symbol's lot step (never over-risk), capped
+# at max_lot, and zeroed below min_lot (the slave is SKIPPED: this applies to
+# fixed_lot profiles too, whose lot used to go out unchecked). Missing equity, entry
+# or SL falls back to fixed_lot for that slave and fallback_reasons() says why, for
+# the execution log. Equity comes from the account-state cache (account_state.py).
+FIXED_LOT, RISK_PER_TRADE, PERCENT_EQUITY = 0, 1, 2
+METHODS = {"fixed_lot": FIXED_LOT, "risk_per_trade": RISK_PER_TRADE, "percent_equity": PERCENT_EQUITY}
+
+@dataclass(frozen=True)
+class ContractSpec:
+    contract_size: float = 100000.0
+    lot_step: float = 0.01
+    min_lot: float = 0.01
+    quote_to_account: float = 1.0  # assumes the account currency when 1.0
+
+    @property
+    def value_per_point(self) -> float:
+        return self.contract_size * self.quote_to_account
+
+DEFAULT_SPECS = {
+    "XAUUSD": ContractSpec(contract_size=100.0),
+    "GOLD": ContractSpec(contract_size=100.0),
+    "XAGUSD": ContractSpec(contract_size=5000.0),
+    "US30": ContractSpec(contract_size=1.0, lot_step=0.1, min_lot=0.1),
+    "NAS100": ContractSpec(contract_size=1.0, lot_step=0.1, min_lot=0.1),
+    "BTCUSD": ContractSpec(contract_size=1.0),
+}
+# Overrides / additional symbols: {"XAUUSD": {"contract_size": 100, "lot_step": 0.01, "min_lot": 0.01}}
+SYMBOL_SPECS = {**DEFAULT_SPECS, **{k.upper(): ContractSpec(**v) for k, v in
+                                    json.loads(os.getenv("SYMBOL_SPECS") or "{}").items()}}
+
+def contract_spec(symbol: str) -> ContractSpec:
+    return SYMBOL_SPECS.get((symbol or "").upper(), ContractSpec())
+
+@dataclass
+class RiskTable:
+    """Column view of a master's routes (same order as the routes tuple)."""
+    method: np.ndarray
+    risk_percent: np.ndarray
+    fixed_lot: np.ndarray
+    max_lot: np.ndarray
+    has_profile: np.ndarray
+
+    @classmethod
+    def from_routes(cls, routes) -> "RiskTable":
+        n = len(routes)
+        method = np.fromiter((METHODS.get(r.risk_method, FIXED_LOT) for r in routes), dtype=np.int8, count=n)
+        f = lambda vals: np.fromiter((np.nan if v is None else v for v in vals), dtype=np.float64, count=n)
+        return cls(method=method,
+                   risk_percent=f(r.risk_percent for r in routes),
+                   fixed_lot=f(r.fixed_lot for r in routes),
+                   max_lot=f(r.max_lot for r in routes),
+                   has_profile=np.fromiter((r.risk_profile_id is not None for r in routes), dtype=bool, count=n))
+
+_tables: dict[int, tuple[tuple, RiskTable]] = {}
+_tables_lock = Lock()
+
+def risk_table(routes: tuple) -> RiskTable:
+    # keyed by identity: the snapshot keeps `routes` alive, so the id cannot be reused
+    with _tables_lock:
+        hit = _tables.get(id(routes))
+        if hit is not None and hit[0] is routes:
+            return hit[1]
+        if len(_tables) > 4096:
+            _tables.clear()  # old snapshots
+        table = RiskTable.from_routes(routes)
+        _tables[id(routes)] = (routes, table)
+        return table
+
+def reference_price(entry: Optional[float], zone_low: Optional[float], zone_high: Optional[float]) -> Optional[float]:
+    if entry is not None:
+        return entry
+    if zone_low is not None and zone_high is not None:
+        return (zone_low + zone_high) / 2.0
+    return None
+
+def size_lots(table: RiskTable, symbol: str, entry: Optional[float], sl: Optional[float],
+              equity: Optional[np.ndarray] = None) -> np.ndarray:
+    """Lot per slave (NaN = no risk profile: the order goes out without a lot)."""
+    spec = contract_spec(symbol)
+    n = len(table.method)
+    eq = np.full(n, np.nan) if equity is None else equity
+    risk_amount = eq * table.risk_percent / 100.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if entry is not None and sl is not None and entry != sl:
+            by_sl = risk_amount / (abs(entry - sl) * spec.value_per_point)
+        else:
+            by_sl = np.full(n, np.nan)
+        by_notional = risk_amount / (entry * spec.value_per_point) if entry else np.full(n, np.nan)
+    lot = np.where(table.method == RISK_PER_TRADE, by_sl,
+                   np.where(table.method == PERCENT_EQUITY, by_notional, table.fixed_lot))
+    lot = np.where(np.isfinite(lot), lot, table.fixed_lot)  # no equity / entry / SL: fixed lot
+    lot = np.floor(lot / spec.lot_step + 1e-9) * spec.lot_step
+    lot = np.where(np.isnan(table.max_lot), lot, np.minimum(lot, table.max_lot))
+    lot = np.where(lot < spec.min_lot - 1e-12, 0.0, np.round(lot, 8))
+    return np.where(table.has_profile, lot, np.nan)
+
+def fallback_reasons(table: RiskTable, entry: Optional[float], sl: Optional[float],
+                     equity: Optional[np.ndarray] = None) -> dict[int, str]:
+    """Route index -> why its risk-based method was sized as fixed_lot by size_lots()."""
+    n = len(table.method)
+    eq = np.full(n, np.nan) if equity is None else equity
+    risk_based = table.has_profile & (table.method != FIXED_LOT)
+    if not risk_based.any():
+        return {}
+    checks = (
+        (np.full(n, not entry), "no entry price in the signal"),
+        ((table.method == RISK_PER_TRADE) & (sl is None or entry == sl), "no SL distance"),
+        (np.isnan(eq), "no live equity for the account"),
+        (np.isnan(table.risk_percent), "no risk %"),
+    )
+    names = {v: k for k, v in METHODS.items()}
+    out: dict[int, str] = {}
+    for mask, why in checks:
+        for i in np.flatnonzero(risk_based & mask).tolist():
+            if i not in out:
+                out[i] = f"{names[int(table.method[i])]} sized as fixed_lot: {why}"
+    return out
@@ -0,0 +1,140 @@
+import json, os, socket, struct, threading, time, uuid
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from itertools import count
+from typing import Callable, Optional
+
+# Client side of the gateway order stream (see mt5_gateway/stream.py):
+# 4-byte big-endian length + compact JSON per frame, one TCP connection per
+# gateway. Unacked orders are resent after a reconnect (the gateway dedups by
+# idempotency key) and the hello carries the last event seq seen, so the gateway
+# replays any acks/fills/position updates missed while disconnected.
+HEADER = struct.Struct("!I")
+MAX_FRAME = 1 << 20
+STREAM_CONNECT_TIMEOUT_S = float(os.getenv("MT5_STREAM_CONNECT_TIMEOUT_S", "2"))
+STREAM_RECONNECT_MAX_S = float(os.getenv("MT5_STREAM_RECONNECT_MAX_S", "5"))
+
+def encode(msg: dict) -> bytes:
+    data = json.dumps(msg, separators=(",", ":")).encode()
+    return HEADER.pack(len(data)) + data
+
+def _read_exact(f, n: int) -> bytes:
+    data = f.read(n)
+    if len(data) < n:
+        raise ConnectionError("stream closed")
+    return data
+
+def read_frame(f) -> dict:
+    (n,) = HEADER.unpack(_read_exact(f, HEADER.size))
+    if n > MAX_FRAME:
+        raise ConnectionError(f"frame too large: {n}")
+    return json.loads(_read_exact(f, n))
+
+class GatewayStream:
+    def __init__(self, host: str, port: int, on_event: Optional[Callable[[dict], None]] = None):
+        self.host, self.port = host, port
+        self.on_event = on_event
+        self.session = uuid.uuid4().hex
+        self.last_seq = 0
+        self.reconnects = 0
+        self._cid = count(1)
+        self._pending: dict[int, tuple[bytes, Future]] = {}
+        self._lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"gw-stream-{host}:{port}", daemon=True)
+        self._thread.start()
+
+    def send_many(self, orders: list[tuple[str, dict, str]], timeout: float) -> list[Optional[dict]]:
+        """Pipeline (account_external_id, intent, key) orders; returns acks in order, None on timeout."""
+        subs = [self._submit(acc, intent, key) for acc, intent, key in orders]
+        deadline = time.monotonic() + timeout
+        acks = []
+        for cid, fut in subs:
+            try:
+                acks.append(fut.result(timeout=max(0.0, deadline - time.monotonic())))
+            except FutureTimeout:
+                with self._lock:
+                    self._pending.pop(cid, None)
+                acks.append(None)
+        return acks
+
+    def _submit(self, account_external_id: str, intent: dict, key: str) -> tuple[int, Future]:
+        cid = next(self._cid)
+        frame = encode({"t": "order", "cid": cid, "key": key, "account_external_id": account_external_id, "intent": intent})
+        fut: Future = Future()
+        with self._lock:
+            self._pending[cid] = (frame, fut)
+            sock = self._sock
+            if sock is not None:
+                try:
+                    sock.sendall(frame)
+                except OSError:
+                    pass  # resent by _connect() after the reader notices the drop
+        return cid, fut
+
+    def close(self) -> None:
+        self._closed = True
+        with self._lock:
+            sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)  # the reader's makefile keeps the fd open past close()
+            except OSError:
+                pass
+            sock.close()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=STREAM_CONNECT_TIMEOUT_S)
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            f = sock.makefile("rb")
+            sock.sendall(encode({"t": "hello", "session": self.session, "last_seq": self.last_seq}))
+            welcome = read_frame(f)
+            if welcome.get("t") != "welcome":
+                raise ConnectionError(f"unexpected handshake reply: {welcome}")
+            if not welcome.get("resumed"):
+                self.last_seq = 0  # gateway restarted and lost our session: its seq starts over
+            sock.settimeout(None)
+            with self._lock:
+                for frame, _ in self._pending.values():
+                    sock.sendall(frame)
+                self._sock = sock
+        except BaseException:
+            sock.close()
+            raise
+        return f
+
+    def _run(self) -> None:
+        backoff = 0.05
+        while not self._closed:
+            try:
+                f = self._connect()
+                backoff = 0.05
+                while True:
+                    msg = read_frame(f)
+                    seq = msg.get("seq")
+                    if seq is not None:
+                        if seq <= self.last_seq:
+                            continue  # replayed event already handled
+                        self.last_seq = seq
+                    if msg.get("t") == "ack":
+                        with self._lock:
+                            entry = self._pending.pop(msg.get("cid"), None)
+                        if entry is not None:
+                            entry[1].set_result(msg)
+                    elif self.on_event is not None and msg.get("t") != "pong":
+                        try:
+                            self.on_event(msg)
+                        except Exception as e:
+                            print(f"WARN: gateway event handler failed: {e}", flush=True)
+            except (OSError, ValueError):
+                pass
+            with self._lock:
+                sock, self._sock = self._sock, None
+            if sock is not None:
+                sock.close()
+            if self._closed:
+                break
+            self.reconnects += 1
+            time.sleep(backoff)
+            backoff = min(backoff * 2, STREAM_RECONNECT_MAX_S)
@@ -0,0 +1,7 @@
+import os, sys
+
+# the services are not installed packages: put each one's import root on the path,
+# as their Dockerfiles do (PYTHONPATH=/opt/dupli + WORKDIR /app)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in ("services/common", "services/worker", "services/api", "services/telegram", "windows/mt5-gateway"):
+    sys.path.insert(0, os.path.join(ROOT, path))
@@ -0,0 +1,82 @@
+import json
+from dataclasses import asdict
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from worker import account_state
+from worker.account_state import ACCOUNT_STATE_KEY, AccountState, AccountStateCache, state_key
+
+NOW = 1_800_000_000.0
+
+def route(platform: str, external_id: str):
+    return SimpleNamespace(platform=platform, external_id=external_id)
+
+@pytest.fixture
+def cache():
+    return AccountStateCache(fakeredis.FakeRedis())
+
+def put(cache, platform, external_id, **state):
+    cache.update(platform, external_id, AccountState(updated_at=state.pop("updated_at", NOW - 1), **state))
+
+def test_state_key_normalizes_the_platform():
+    assert state_key("ctrader", "42") == "CTRADER:42" == state_key("CTRADER", "42")
+    assert state_key(None, "42") == ":42"
+
+def test_equity_vector_is_aligned_with_routes_and_nan_when_unknown(cache, monkeypatch):
+    monkeypatch.setattr(account_state, "ACCOUNT_STATE_MAX_AGE_S", 120)
+    put(cache, "MT5", "1", equity=1000.0)
+    put(cache, "CTRADER", "1", equity=2000.0)  # same login number, other platform
+    put(cache, "MT5", "2", equity=3000.0, updated_at=NOW - 121)  # stale
+    put(cache, "MT5", "3")  # no equity reported
+    routes = [route("MT5", "1"), route("ctrader", "1"), route("MT5", "2"), route("MT5", "3"), route("MT5", "404")]
+    eq = cache.equity_vector(routes, now=NOW)
+    assert eq.shape == (5,)
+    assert eq[:2].tolist() == [1000.0, 2000.0] and np.isnan(eq[2:]).all()
+
+def test_rule_inputs_read_positions_day_start_equity_and_spread(cache):
+    put(cache, "MT5", "1", equity=9600.0, day_start_equity=10000.0, spreads={"XAUUSD": 0.3},
+        positions=[{"symbol": "xauusd", "volume": 0.5}, {"symbol": "XAUUSD", "volume": 1.0},
+                   {"symbol": "EURUSD", "volume": 2.0}])
+    put(cache, "MT5", "2", equity=5000.0)  # no day-start equity: daily loss unknown
+    put(cache, "MT5", "3", equity=1.0, positions=[{"symbol": "XAUUSD", "volume": 9}], updated_at=NOW - 10_000)
+    inputs = cache.rule_inputs([route("MT5", "1"), route("MT5", "2"), route("MT5", "3")], "xauusd", now=NOW)
+    assert inputs.open_trades[:2].tolist() == [3, 0]
+    assert inputs.daily_loss[0] == 400.0 and np.isnan(inputs.daily_loss[1])
+    assert inputs.symbol_lots[:2].tolist() == [1.5, 0.0]
+    assert inputs.spread[0] == 0.3 and np.isnan(inputs.spread[1])
+    assert all(np.isnan(c[2]) for c in (inputs.open_trades, inputs.daily_loss, inputs.symbol_lots, inputs.spread))
+
+def test_older_or_duplicate_updates_are_ignored(cache):
+    put(cache, "MT5", "1", equity=1000.0, updated_at=NOW)
+    put(cache, "MT5", "1", equity=500.0, updated_at=NOW - 5)
+    put(cache, "MT5", "1", equity=700.0, updated_at=NOW)
+    assert cache.get("MT5", "1").equity == 1000.0
+
+def test_states_are_shared_through_the_redis_hash_and_pubsub(cache, monkeypatch):
+    put(cache, "MT5", "1", equity=1000.0)
+    other = AccountStateCache(cache.r)
+    monkeypatch.setattr(account_state, "gateway_urls", lambda: set())
+    other.refresh()  # snapshot reload from the hash
+    assert other.get("MT5", "1").equity == 1000.0
+
+    third = AccountStateCache(cache.r)
+    st = AccountState(equity=1500.0, updated_at=NOW)
+    third._on_message({"data": json.dumps({"key": "MT5:1", "state": asdict(st)})})
+    third._on_message({"data": "not json"})  # logged, ignored
+    assert third.get("MT5", "1").equity == 1500.0
+    assert json.loads(cache.r.hget(ACCOUNT_STATE_KEY, "MT5:1"))["equity"] == 1000.0
+
+def test_gateway_poll_fills_states_and_a_failing_gateway_is_skipped(cache, monkeypatch):
+    def fetch(url):
+        if url == "http://down":
+            raise ConnectionError("refused")
+        return [{"account_external_id": 7, "equity": 321.0, "ts": NOW, "spreads": {"xauusd": 0.2}}, {"equity": 1.0}]
+    monkeypatch.setattr(account_state, "gateway_urls", lambda: {"http://down", "http://gw"})
+    monkeypatch.setattr(account_state, "fetch_gateway_accounts", fetch)
+    cache.refresh()
+    st = cache.get("MT5", "7")
+    assert st.equity == 321.0 and st.spreads == {"XAUUSD": 0.2} and st.source == "poll"
@@ -0,0 +1,79 @@
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from dupli_core.models import Master, TradeIntent
+from app import main
+
+OPERATOR = {"X-Auth-Request-Preferred-Username": "op", "X-Auth-Request-Groups": "operator"}
+
+@pytest.fixture
+def api(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    for table in (Master.__table__, TradeIntent.__table__):
+        table.create(engine)
+    Session = sessionmaker(bind=engine)
+    enqueued, events = [], []
+    monkeypatch.setattr(main, "enqueue_execution",
+                        lambda intent_id, timings, created_at: enqueued.append((intent_id, created_at)) or "1-0")
+    monkeypatch.setattr(main, "publish_events", events.extend)
+
+    def db_dep():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+    main.app.dependency_overrides[main.db_dep] = db_dep
+    yield TestClient(main.app), Session, enqueued, events
+    main.app.dependency_overrides.clear()
+
+def intent(Session, status: str) -> str:
+    db = Session()
+    m = Master(id=uuid.uuid4(), name="m", source="telegram")
+    t = TradeIntent(id=uuid.uuid4(), master_id=m.id, symbol="XAUUSD", side="BUY", order_type="MARKET", status=status)
+    db.add_all([m, t]); db.commit()
+    return str(t.id)
+
+def status_of(Session, intent_id: str) -> str:
+    db = Session()
+    try:
+        return db.execute(select(TradeIntent.status).where(TradeIntent.id == uuid.UUID(intent_id))).scalar()
+    finally:
+        db.close()
+
+@pytest.mark.parametrize("status", ["NEW", "FAILED"])
+def test_new_and_failed_intents_are_queued(api, status):
+    client, Session, enqueued, events = api
+    i = intent(Session, status)
+    r = client.post(f"/api/trade_intents/{i}/queue", headers=OPERATOR)
+    assert r.status_code == 200 and r.json() == {"job_id": "1-0"}
+    assert status_of(Session, i) == "QUEUED"
+    assert [e[0] for e in enqueued] == [i] and enqueued[0][1] is not None and events[0]["status"] == "QUEUED"
+
+@pytest.mark.parametrize("status", ["QUEUED", "DISPATCHED", "DONE"])
+def test_queued_or_executed_intents_are_not_queued_again(api, status):
+    client, Session, enqueued, events = api
+    i = intent(Session, status)
+    r = client.post(f"/api/trade_intents/{i}/queue", headers=OPERATOR)
+    assert r.status_code == 409 and status in r.json()["detail"]
+    assert status_of(Session, i) == status
+    assert enqueued == [] and events == []
+
+def test_second_click_does_not_enqueue_twice(api):
+    client, Session, enqueued, _ = api
+    i = intent(Session, "NEW")
+    assert client.post(f"/api/trade_intents/{i}/queue", headers=OPERATOR).status_code == 200
+    assert client.post(f"/api/trade_intents/{i}/queue", headers=OPERATOR).status_code == 409
+    assert [e[0] for e in enqueued] == [i]
+
+def test_unknown_intent_and_viewer_role(api):
+    client, Session, _, _ = api
+    assert client.post(f"/api/trade_intents/{uuid.uuid4()}/queue", headers=OPERATOR).json() == {"error": "not_found"}
+    i = intent(Session, "NEW")
+    viewer = {**OPERATOR, "X-Auth-Request-Groups": "viewer"}
+    assert client.post(f"/api/trade_intents/{i}/queue", headers=viewer).status_code == 403
@@ -0,0 +1,89 @@
+import json, time, uuid
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from dupli_core.models import Master, TradeIntent
+from worker import consumer, jobs
+from worker.consumer import EXEC_GROUP, EXEC_STREAM, ExecConsumer
+
+@pytest.fixture
+def r():
+    return fakeredis.FakeRedis()
+
+def pending(r) -> int:
+    return r.xpending(EXEC_STREAM, EXEC_GROUP)["pending"]
+
+def enqueue(r, intent_id: str, **fields) -> None:
+    r.xadd(EXEC_STREAM, {"intent_id": intent_id, "timings": json.dumps({"received": 1.0}), **fields})
+
+def drain(c: ExecConsumer) -> None:
+    c.run(lambda: c.processed + c.failed >= len(c.r.xrange(EXEC_STREAM)))
+
+def test_handled_entries_are_acked(r):
+    seen = []
+    c = ExecConsumer(r, lambda *entry: seen.append(entry), lambda *a: None, name="c1")
+    enqueue(r, "i1")
+    enqueue(r, "i2", created_at="2026-10-18T09:00:00+00:00")
+    drain(c)
+    assert seen == [("i1", {"received": 1.0}, None), ("i2", {"received": 1.0}, "2026-10-18T09:00:00+00:00")]
+    assert pending(r) == 0
+
+def test_failed_entry_is_redelivered_then_dead_lettered(r, monkeypatch):
+    monkeypatch.setattr(consumer, "EXEC_CLAIM_IDLE_MS", 1)
+    monkeypatch.setattr(consumer, "EXEC_MAX_DELIVERIES", 3)
+    dead = []
+
+    def fail(intent_id, timings, created_at):
+        raise RuntimeError("db down")
+    c = ExecConsumer(r, fail, lambda intent_id, reason, created_at: dead.append((intent_id, created_at)), name="c1")
+    enqueue(r, "i1", created_at="2026-10-18T09:00:00+00:00")
+    drain(c)
+    assert pending(r) == 1  # left for reclaim()
+
+    def reclaim():
+        time.sleep(0.01)  # idle past EXEC_CLAIM_IDLE_MS
+        c.reclaim()
+    reclaim()  # delivery 2
+    reclaim()  # delivery 3
+    assert pending(r) == 1 and not dead
+    reclaim()
+    assert dead == [("i1", "2026-10-18T09:00:00+00:00")] and pending(r) == 0
+    assert r.xlen(consumer.EXEC_DEAD_STREAM) == 1
+
+@pytest.fixture
+def Session(monkeypatch):
+    engine = create_engine("sqlite://")
+    for table in (Master.__table__, TradeIntent.__table__):
+        table.create(engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(jobs, "SessionLocal", Session)
+    return Session
+
+@pytest.mark.parametrize("status", ["DONE", "FAILED", "DISPATCHED"])
+def test_redelivered_intent_in_a_final_state_is_not_executed(Session, monkeypatch, status):
+    monkeypatch.setattr(jobs, "get_routes", lambda *a: pytest.fail("re-executed a finished intent"))
+    db = Session()
+    m = Master(id=uuid.uuid4(), name="m", source="telegram")
+    t = TradeIntent(id=uuid.uuid4(), master_id=m.id, symbol="XAUUSD", side="BUY", order_type="MARKET", status=status)
+    db.add_all([m, t]); db.commit()
+    assert jobs.execute_trade_intent(t.id) == {"skipped": f"already {status}"}
+    db.close()
+
+def test_stream_created_at_narrows_the_intent_lookup(Session, monkeypatch):
+    monkeypatch.setattr(jobs, "get_routes", lambda *a: pytest.fail("re-executed a finished intent"))
+    db = Session()
+    m = Master(id=uuid.uuid4(), name="m", source="telegram")
+    t = TradeIntent(id=uuid.uuid4(), master_id=m.id, symbol="XAUUSD", side="BUY", order_type="MARKET", status="DONE")
+    db.add_all([m, t]); db.commit()
+    intent_id, created_at = str(t.id), t.created_at.isoformat()  # as the stream entry carries them
+    statements = []
+    event.listen(Session.kw["bind"], "before_cursor_execute", lambda conn, cur, stmt, *a: statements.append(stmt))
+    assert jobs.execute_trade_intent(intent_id, None, created_at) == {"skipped": "already DONE"}
+    (lookup,) = statements
+    assert lookup.endswith("WHERE trade_intents.id = ? AND trade_intents.created_at = ?")  # one partition on Postgres
+    db.close()
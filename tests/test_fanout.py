@@ -0,0 +1,44 @@
+import random, threading, time
+
+from worker.executors import ExecResult
+from worker.fanout import OrderTask, run_fanout
+
+def tasks(n: int, platform: str = "MT5", gateway=None) -> list[OrderTask]:
+    return [OrderTask(account_id=i, platform=platform, external_id=str(i), payload={"gw": gateway}) for i in range(n)]
+
+def test_outcomes_follow_task_order_whatever_finishes_first():
+    def send(t):
+        time.sleep(random.random() * 0.02)
+        return ExecResult(ok=True, message=t.external_id)
+    outcomes = run_fanout(tasks(20) + tasks(5, "CTRADER"), send)
+    assert [o.task.external_id for o in outcomes] == [str(i) for i in range(20)] + [str(i) for i in range(5)]
+    assert all(o.result.message == o.task.external_id for o in outcomes)
+
+def test_groups_are_split_by_max_group_and_map_results_back():
+    calls = []
+
+    def send_group(key, group):
+        calls.append((key, [t.external_id for t in group]))
+        return [ExecResult(ok=True, message=f"{key}:{t.external_id}") for t in group]
+    mixed = tasks(5, gateway="gw1") + tasks(2, "CTRADER")
+    outcomes = run_fanout(mixed, lambda t: ExecResult(ok=True, message="single"),
+                          group_key=lambda t: t.payload["gw"], send_group=send_group, max_group=2)
+    assert sorted(calls) == [("gw1", ["0", "1"]), ("gw1", ["2", "3"]), ("gw1", ["4"])]
+    assert [o.result.message for o in outcomes] == [f"gw1:{i}" for i in range(5)] + ["single", "single"]
+
+def test_a_failing_send_becomes_an_error_outcome():
+    def send(t):
+        if t.external_id == "1":
+            raise ConnectionError("gateway down")
+        return ExecResult(ok=True, message="ok")
+    outcomes = run_fanout(tasks(3), send)
+    assert [o.result.ok for o in outcomes] == [True, False, True]
+    assert outcomes[1].result.message == "gateway down"
+
+def test_orders_are_sent_concurrently():
+    barrier = threading.Barrier(4, timeout=5)
+
+    def send(t):
+        barrier.wait()  # only returns once all four sends are in flight together
+        return ExecResult(ok=True, message="ok")
+    assert all(o.result.ok for o in run_fanout(tasks(4), send))
@@ -0,0 +1,56 @@
+import threading, time
+
+from mt5_gateway import orders
+
+def test_resend_returns_the_remembered_reply():
+    first = orders.place("1001", {"id": "i1"}, "i1:1001")
+    assert orders.place("1001", {"id": "i1"}, "i1:1001") is first
+
+def test_concurrent_requests_with_one_key_dispatch_once(monkeypatch):
+    dispatched = []
+    remember = orders._remember
+
+    def slow_remember(key, reply):
+        dispatched.append(key)
+        time.sleep(0.1)  # the first request is still in flight while the others arrive
+        remember(key, reply)
+    monkeypatch.setattr(orders, "_remember", slow_remember)
+
+    replies = []
+    threads = [threading.Thread(target=lambda: replies.append(orders.place("1002", {"id": "i2"}, "i2:1002")))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert dispatched == ["i2:1002"]
+    assert len(replies) == 5 and all(r is replies[0] for r in replies)
+    assert "i2:1002" not in orders._inflight
+
+def test_failed_dispatch_lets_a_waiting_resend_retry(monkeypatch):
+    calls = []
+    remember = orders._remember
+
+    def flaky_remember(key, reply):
+        calls.append(key)
+        if len(calls) == 1:
+            time.sleep(0.05)
+            raise RuntimeError("EA bridge down")
+        remember(key, reply)
+    monkeypatch.setattr(orders, "_remember", flaky_remember)
+
+    errors, replies = [], []
+    def first():
+        try:
+            orders.place("1003", {"id": "i3"}, "i3:1003")
+        except RuntimeError as e:
+            errors.append(e)
+    t = threading.Thread(target=first)
+    t.start()
+    time.sleep(0.01)
+    replies.append(orders.place("1003", {"id": "i3"}, "i3:1003"))
+    t.join()
+    assert len(errors) == 1 and replies[0]["ok"] and len(calls) == 2
+
+def test_orders_without_key_are_not_deduplicated():
+    assert orders.place("1004", {}, None) is not orders.place("1004", {}, None)
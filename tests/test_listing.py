@@ -0,0 +1,115 @@
+import base64, uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from dupli_core.models import Account, Master, PropFirm, RiskProfile, TradeIntent
+from app import listing, main
+from app.listing import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, parse_ts, split_page
+
+VIEWER = {"X-Auth-Request-Preferred-Username": "v", "X-Auth-Request-Groups": "viewer"}
+T0 = datetime(2024, 3, 1, 12, 0, 0)
+
+def test_cursor_round_trip():
+    i = uuid.uuid4()
+    assert decode_cursor(encode_cursor(T0, i), parse_ts) == (T0, i)
+
+@pytest.mark.parametrize("cursor", ["not-base64!", base64.urlsafe_b64encode(b"[1]").decode(),
+                                    base64.urlsafe_b64encode(b'["2024-01-01", "no-uuid"]').decode(),
+                                    base64.urlsafe_b64encode(b'[5, "%s"]' % str(uuid.uuid4()).encode()).decode()])
+def test_bad_or_tampered_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as e:
+        decode_cursor(cursor, parse_ts)
+    assert e.value.status_code == 400
+
+def test_split_page_has_no_next_on_the_last_page():
+    rows = [{"id": uuid.uuid4(), "created_at": T0} for _ in range(3)]
+    assert split_page(rows, 3, "created_at") == (rows, None)
+    page, next_cursor = split_page(rows, 2, "created_at")
+    assert page == rows[:2] and decode_cursor(next_cursor, parse_ts) == (T0, rows[1]["id"])
+
+@pytest.fixture
+def api(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    for model in (PropFirm, RiskProfile, Account, Master, TradeIntent):
+        model.__table__.create(engine)
+    Session = sessionmaker(bind=engine)
+
+    def db_dep():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+    main.app.dependency_overrides[main.db_dep] = db_dep
+    listing.invalidate_cache()
+    yield TestClient(main.app), Session
+    main.app.dependency_overrides.clear()
+    listing.invalidate_cache()
+
+def add_intents(Session, created: list[datetime]) -> list[str]:
+    db = Session()
+    m = Master(id=uuid.uuid4(), name="m", source="telegram")
+    rows = [TradeIntent(id=uuid.uuid4(), master_id=m.id, symbol="XAUUSD", side="BUY", order_type="MARKET",
+                        status="NEW", created_at=t) for t in created]
+    db.add_all([m, *rows]); db.commit()
+    ids = [str(r.id) for r in rows]
+    db.close()
+    return ids
+
+def all_pages(client, url: str, limit: int) -> list[list[str]]:
+    pages, cursor = [], None
+    while True:
+        r = client.get(url, params={"limit": limit, **({"cursor": cursor} if cursor else {})}, headers=VIEWER)
+        assert r.status_code == 200
+        pages.append([i["id"] for i in r.json()])
+        cursor = r.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return pages
+
+def test_intent_pages_resolve_created_at_ties_by_id(api):
+    client, Session = api
+    # five intents sharing one timestamp straddle the page boundaries
+    created = [T0 + timedelta(minutes=1)] + [T0] * 5 + [T0 - timedelta(minutes=1)]
+    ids = add_intents(Session, created)
+    pages = all_pages(client, "/api/trade_intents", 3)
+    expected = [ids[0]] + sorted(ids[1:6], key=uuid.UUID, reverse=True) + [ids[6]]
+    assert [i for p in pages for i in p] == expected
+    assert [len(p) for p in pages] == [3, 3, 1]
+
+def test_malformed_uuid_filters_are_rejected(api):
+    client, _ = api
+    assert client.get("/api/trade_intents", params={"master_id": "abc"}, headers=VIEWER).status_code == 422
+    assert client.get("/api/accounts", params={"prop_firm_id": "abc"}, headers=VIEWER).status_code == 422
+    assert client.get("/api/trade_intents", params={"cursor": "abc"}, headers=VIEWER).status_code == 400
+
+def test_etag_answers_304_and_a_write_drops_the_cached_page(api):
+    client, Session = api
+    add_intents(Session, [T0])
+    first = client.get("/api/trade_intents", headers=VIEWER)
+    etag = first.headers["ETag"]
+    assert client.get("/api/trade_intents", headers={**VIEWER, "If-None-Match": etag}).status_code == 304
+
+    add_intents(Session, [T0 + timedelta(minutes=1)])  # not seen through the API: cached until the TTL
+    assert len(client.get("/api/trade_intents", headers=VIEWER).json()) == 1
+    listing.invalidate_cache()  # what API writes do
+    r = client.get("/api/trade_intents", headers={**VIEWER, "If-None-Match": etag})
+    assert r.status_code == 200 and len(r.json()) == 2 and r.headers["ETag"] != etag
+
+def test_a_page_built_across_a_write_is_not_cached(api, monkeypatch):
+    client, Session = api
+    add_intents(Session, [T0])
+    build_page = listing.dumps
+
+    def write_during_build(obj):
+        listing.invalidate_cache()  # a write lands while the page is being rendered
+        return build_page(obj)
+    monkeypatch.setattr(listing, "dumps", write_during_build)
+    client.get("/api/trade_intents", headers=VIEWER)
+    monkeypatch.setattr(listing, "dumps", build_page)
+    assert not listing._cache
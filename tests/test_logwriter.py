@@ -0,0 +1,76 @@
+import time, uuid
+
+import pytest
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.pool import StaticPool
+
+from dupli_core.models import ExecutionLog
+from worker import logwriter
+from worker.logwriter import ExecutionLogWriter
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    ExecutionLog.__table__.create(engine)
+    engine.batches = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record_insert(conn, cur, stmt, params, ctx, many):
+        if stmt.startswith("INSERT"):
+            engine.batches.append(len(params) if many else 1)
+    engine.events = []
+    monkeypatch.setattr(logwriter, "publish_events", engine.events.extend)
+    return engine
+
+def row(status: str = "OK") -> dict:
+    return {"trade_intent_id": uuid.uuid4(), "account_id": uuid.uuid4(), "status": status}
+
+def count(engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(ExecutionLog)).scalar()
+
+def wait_for(cond) -> None:
+    deadline = time.time() + 5
+    while not cond() and time.time() < deadline:
+        time.sleep(0.01)
+    assert cond()
+
+def test_rows_within_the_interval_go_out_in_one_insert(engine):
+    w = ExecutionLogWriter(engine, flush_interval_ms=100)
+    started = time.monotonic()
+    w.submit([row(), row()])
+    w.submit([row()])
+    w.submit([])  # nothing to queue
+    wait_for(lambda: count(engine) == 3)
+    assert time.monotonic() - started >= 0.1  # waited out the interval for more rows
+    assert engine.batches == [3] and len(engine.events) == 3
+    w.close()
+
+def test_a_full_batch_is_written_without_waiting_for_the_interval(engine):
+    w = ExecutionLogWriter(engine, flush_interval_ms=60_000, max_batch=3)
+    for _ in range(7):
+        w.submit([row()])
+    wait_for(lambda: count(engine) == 6)
+    assert engine.batches == [3, 3]  # the seventh row is still waiting for company
+    w.close()
+    assert engine.batches == [3, 3, 1]
+
+def test_close_drains_every_queued_row(engine):
+    w = ExecutionLogWriter(engine, flush_interval_ms=60_000)
+    for _ in range(5):
+        w.submit([row() for _ in range(10)])
+    started = time.monotonic()
+    w.close()
+    assert time.monotonic() - started < 5  # the stop marker cuts the interval short
+    assert count(engine) == 50 and not w._thread.is_alive()
+    assert {e["type"] for e in engine.events} == {"exec"} and len(engine.events) == 50
+
+def test_close_log_writer_drains_the_shared_writer(engine, monkeypatch):
+    monkeypatch.setattr(logwriter, "get_engine", lambda: engine)
+    monkeypatch.setattr(logwriter, "EXECLOG_FLUSH_INTERVAL_MS", 60_000)
+    w = logwriter.get_log_writer()
+    assert logwriter.get_log_writer() is w
+    w.submit([row("OK"), row("ERROR"), row("SKIPPED")])
+    logwriter.close_log_writer()
+    assert count(engine) == 3 and logwriter._writer is None
+    logwriter.close_log_writer()  # second call (atexit) is a no-op
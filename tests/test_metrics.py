@@ -0,0 +1,47 @@
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import CollectorRegistry, Counter, Histogram
+
+from dupli_core import metrics
+
+@pytest.fixture
+def reg(monkeypatch):
+    reg = CollectorRegistry()
+    b = metrics.LATENCY_BUCKETS
+    monkeypatch.setattr(metrics, "STAGE_SECONDS", Histogram("dupli_stage_seconds", "", ["stage"], buckets=b, registry=reg))
+    monkeypatch.setattr(metrics, "ORDER_SECONDS", Histogram("dupli_order_seconds", "", ["platform", "gateway", "account"],
+                                                            buckets=b, registry=reg))
+    monkeypatch.setattr(metrics, "SIGNAL_TO_ACK_SECONDS", Histogram("dupli_signal_to_ack_seconds", "",
+                                                                    ["platform", "gateway"], buckets=b, registry=reg))
+    monkeypatch.setattr(metrics, "ORDERS", Counter("dupli_orders", "", ["platform", "result"], registry=reg))
+    return reg
+
+def test_stage_durations_are_measured_from_the_previous_stamped_stage(reg):
+    timings = {"received": 1.0, "parsed": 1.1, "persisted": 1.15,  # no "enqueued" stamp
+               "dequeued": 1.3, "sized": 1.2, "rules": 1.25}  # "sized" stamped by a skewed clock
+    metrics._observe_stages(timings, metrics.WORKER_STAGES)
+    stage = lambda s, suffix: reg.get_sample_value(f"dupli_stage_seconds_{suffix}", {"stage": s})
+    assert stage("dequeued", "sum") == pytest.approx(0.15)  # since "persisted"
+    assert stage("sized", "count") is None  # went backwards: not observed
+    assert stage("rules", "sum") == pytest.approx(0.05)
+    assert stage("parsed", "count") is None  # stamped by the ingest, not this process
+
+def test_record_orders_counts_results_and_signal_to_ack(reg):
+    metrics.record_orders([("MT5", "gw1", "1001", True, 10.0, 0.2), ("MT5", "gw1", "1002", False, 10.0, 0.5)],
+                          received=9.5)
+    assert reg.get_sample_value("dupli_orders_total", {"platform": "MT5", "result": "ok"}) == 1
+    assert reg.get_sample_value("dupli_orders_total", {"platform": "MT5", "result": "error"}) == 1
+    assert reg.get_sample_value("dupli_signal_to_ack_seconds_sum", {"platform": "MT5", "gateway": "gw1"}) == \
+        pytest.approx(0.7 + 1.0)
+    # per-account series are opt-in
+    assert reg.get_sample_value("dupli_order_seconds_count", {"platform": "MT5", "gateway": "gw1", "account": ""}) == 2
+
+def test_account_labels_when_enabled(reg, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ACCOUNT_LABELS", True)
+    metrics.record_orders([("MT5", "gw1", "1001", True, 10.0, 0.2)])
+    assert reg.get_sample_value("dupli_order_seconds_count", {"platform": "MT5", "gateway": "gw1", "account": "1001"}) == 1
+    assert reg.get_sample_value("dupli_signal_to_ack_seconds_count", {"platform": "MT5", "gateway": "gw1"}) is None
+
+def test_api_port_does_not_serve_metrics():
+    from app import main
+    assert TestClient(main.app).get("/metrics").status_code == 404
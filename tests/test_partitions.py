@@ -0,0 +1,98 @@
+import csv, gzip, os, uuid
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from dupli_core import retention
+from dupli_core.migrate import autocommit_connection, discover, migrate, split_statements
+from dupli_core.retention import add_months
+
+def test_add_months_crosses_years_both_ways():
+    assert add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    assert add_months(date(2024, 5, 17), -12) == date(2023, 5, 1)
+
+def test_partition_migration_splits_into_whole_statements():
+    m = {m.version: m for m in discover()}[4]
+    stmts = split_statements(m.sql)
+    assert sum(s.startswith("CREATE OR REPLACE FUNCTION dupli_ensure_month_partition") for s in stmts) == 1
+    assert sum(s.startswith("DO $$") and s.endswith("END $$") for s in stmts) == 1
+    assert not any(s.startswith("--") for s in stmts)
+
+# The rest needs a Postgres (POSTGRES_* as for the services); each test works in a scratch schema.
+needs_postgres = pytest.mark.skipif(not os.getenv("POSTGRES_DB"), reason="POSTGRES_DB not set")
+
+@pytest.fixture
+def scratch():
+    from sqlalchemy import create_engine
+    from dupli_core.db import dsn
+    engine = create_engine(dsn(), pool_size=1, max_overflow=0)
+    schema = f"test_partitions_{os.getpid()}"
+    with autocommit_connection(engine) as conn:
+        conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        conn.execute(f"CREATE SCHEMA {schema}")
+    try:
+        yield engine, schema
+    finally:
+        with autocommit_connection(engine) as conn:
+            conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        engine.dispose()
+
+def partition_of(conn, table: str, row_id) -> str:
+    return conn.execute(f"SELECT tableoid::regclass::text FROM {table} WHERE id = %s", (row_id,)).fetchone()[0]
+
+@needs_postgres
+def test_migration_moves_rows_into_monthly_partitions_and_retention_archives_old_months(scratch, tmp_path):
+    engine, schema = scratch
+    now = datetime.now(timezone.utc)
+    old = now - timedelta(days=450)  # past both retentions
+    master, account = uuid.uuid4(), uuid.uuid4()
+    intents = {uuid.uuid4(): old, uuid.uuid4(): now}
+    logs = {uuid.uuid4(): (i, t) for i, t in intents.items()}
+    migrate(engine, target=3, search_path=schema)
+    with autocommit_connection(engine, schema) as conn:
+        conn.execute("INSERT INTO masters (id, name, source) VALUES (%s, 'm', 'telegram')", (master,))
+        conn.execute("INSERT INTO accounts (id, name, platform, external_id) VALUES (%s, 'a', 'MT5', '1')", (account,))
+        for i, t in intents.items():
+            conn.execute("INSERT INTO trade_intents (id, master_id, symbol, side, order_type, status, created_at) "
+                         "VALUES (%s, %s, 'XAUUSD', 'BUY', 'MARKET', 'DONE', %s)", (i, master, t))
+        for log_id, (i, t) in logs.items():
+            conn.execute("INSERT INTO execution_logs (id, trade_intent_id, account_id, status, created_at) "
+                         "VALUES (%s, %s, %s, 'OK', %s)", (log_id, i, account, t))
+
+    assert [m.version for m in migrate(engine, target=4, search_path=schema)] == [4]
+    with autocommit_connection(engine, schema) as conn:
+        for i, t in intents.items():
+            assert partition_of(conn, "trade_intents", i) == f"trade_intents_p{t:%Y%m}"
+        for log_id, (_, t) in logs.items():
+            assert partition_of(conn, "execution_logs", log_id) == f"execution_logs_p{t:%Y%m}"
+        ahead = add_months(now.date().replace(day=1), 3)
+        assert conn.execute("SELECT to_regclass(%s)", (f"trade_intents_p{ahead:%Y%m}",)).fetchone()[0]
+
+        # a month without its partition lands in the default and moves when it is created
+        late = uuid.uuid4()
+        far = add_months(now.date(), 12)
+        conn.execute("INSERT INTO trade_intents (id, master_id, symbol, side, order_type, status, created_at) "
+                     "VALUES (%s, %s, 'XAUUSD', 'BUY', 'MARKET', 'NEW', %s)",
+                     (late, master, datetime(far.year, far.month, 15, tzinfo=timezone.utc)))
+        assert partition_of(conn, "trade_intents", late) == "trade_intents_default"
+        retention.ensure_partitions(conn, "trade_intents", far, ahead=0)
+        assert partition_of(conn, "trade_intents", late) == f"trade_intents_p{far:%Y%m}"
+
+        retention.run_once(conn, today=now.date(), archive_dir=str(tmp_path))
+        for table in ("trade_intents", "execution_logs"):
+            part = f"{table}_p{old:%Y%m}"
+            assert conn.execute("SELECT to_regclass(%s)", (part,)).fetchone()[0] is None
+            with gzip.open(tmp_path / f"{part}.csv.gz", "rt", newline="") as f:
+                rows = list(csv.DictReader(f))
+            assert len(rows) == 1
+        kept = {i for i, t in intents.items() if t == now} | {late}
+        assert {r[0] for r in conn.execute("SELECT id FROM trade_intents").fetchall()} == kept
+
+@needs_postgres
+def test_fresh_schema_defaults_auto_execute_to_false(scratch):
+    engine, schema = scratch
+    migrate(engine, search_path=schema)
+    with autocommit_connection(engine, schema) as conn:
+        conn.execute("INSERT INTO masters (id, name, source) VALUES (%s, 'm', 'telegram')", (uuid.uuid4(),))
+        assert conn.execute("SELECT auto_execute FROM masters").fetchone()[0] is False
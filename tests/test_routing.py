@@ -0,0 +1,97 @@
+import uuid
+
+import pytest
+import redis
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from dupli_core.models import (Account, CopySet, CopySetSlave, Master, PropFirm, RiskProfile, RuleSet)
+from worker import routing
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+class RedisDown:
+    def get(self, key):
+        raise redis.ConnectionError("redis down")
+
+@pytest.fixture
+def world(monkeypatch):
+    engine = create_engine("sqlite://")
+    for model in (PropFirm, RiskProfile, Account, Master, CopySet, CopySetSlave, RuleSet):
+        model.__table__.create(engine)
+    queries = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cur, stmt, *a: queries.append(stmt))
+    db = sessionmaker(bind=engine)()
+    prop = PropFirm(id=uuid.uuid4(), name="FTMO", weekend_trading=False)
+    rp = RiskProfile(id=uuid.uuid4(), name="1%", method="risk_per_trade", risk_percent=1.0, fixed_lot=0.01, max_lot=5.0)
+    acc = Account(id=uuid.uuid4(), name="slave", platform="mt5", external_id="1001",
+                  prop_firm_id=prop.id, risk_profile_id=rp.id)
+    m = Master(id=uuid.uuid4(), name="m", source="telegram")
+    cs = CopySet(id=uuid.uuid4(), name="cs", master_id=m.id, is_active=True)
+    db.add_all([prop, rp, acc, m, cs, CopySetSlave(id=uuid.uuid4(), copy_set_id=cs.id, account_id=acc.id),
+                RuleSet(id=uuid.uuid4(), name="prop rules", prop_firm_id=prop.id, rules='{"max_open_trades": 3}')])
+    db.commit()
+    r = fakeredis.FakeRedis()
+    clock = Clock()
+    monkeypatch.setattr(routing, "get_redis", lambda: r)
+    monkeypatch.setattr(routing, "time", clock)
+    routing.invalidate()
+    master_id = m.id  # loaded now: the session expired it on commit
+    queries.clear()
+    yield db, master_id, r, clock, queries
+    routing.invalidate()
+    db.close()
+
+def test_snapshot_resolves_the_slave_with_prop_risk_and_rules(world):
+    db, master_id, r, clock, queries = world
+    (route,) = routing.get_routes(db, master_id)
+    assert route.platform == "MT5" and route.external_id == "1001" and route.prop_name == "FTMO"
+    assert route.risk_method == "risk_per_trade" and route.max_lot == 5.0
+    assert [s.max_open_trades for s in route.rules] == [3]
+    assert routing.get_routes(db, uuid.uuid4()) is None  # master without an active copyset
+
+def test_one_load_per_version_and_a_reload_after_a_bump(world):
+    db, master_id, r, clock, queries = world
+    first = routing.get_routes(db, master_id)
+    loads = len(queries)
+    assert loads == 2  # rule sets + one joined routes query
+    for _ in range(5):
+        assert routing.get_routes(db, master_id) is first
+    assert len(queries) == loads
+
+    r.incr(routing.ROUTING_VERSION_KEY)  # what the API's notify_routing_change() does
+    db.get(Account, first[0].account_id).external_id = "2002"
+    db.commit()
+    queries.clear()
+    (route,) = routing.get_routes(db, master_id)
+    assert route.external_id == "2002" and len(queries) == 2
+    routing.get_routes(db, master_id)
+    assert len(queries) == 2
+
+def test_redis_down_falls_back_to_max_age(world, monkeypatch):
+    db, master_id, r, clock, queries = world
+    monkeypatch.setattr(routing, "get_redis", lambda: RedisDown())
+    first = routing.get_routes(db, master_id)
+    clock.now += routing.ROUTING_MAX_AGE_S  # not older than the max age yet
+    assert routing.get_routes(db, master_id) is first
+    queries.clear()
+    clock.now += 1
+    assert routing.get_routes(db, master_id) is not first and len(queries) == 2
+
+def test_redis_coming_back_reloads_once(world, monkeypatch):
+    db, master_id, r, clock, queries = world
+    monkeypatch.setattr(routing, "get_redis", lambda: RedisDown())
+    routing.get_routes(db, master_id)
+    monkeypatch.setattr(routing, "get_redis", lambda: r)
+    queries.clear()
+    routing.get_routes(db, master_id)
+    routing.get_routes(db, master_id)
+    assert len(queries) == 2  # snapshot of an unknown version: reloaded once, then kept
@@ -0,0 +1,53 @@
+import uuid
+
+import numpy as np
+
+from worker.routing import SlaveRoute
+from worker.rulesets import RuleInputs, RuleSpec, evaluate, rule_table
+
+PROP = RuleSpec.from_json("prop", '{"symbol_whitelist": ["xauusd", "EURUSD"], "max_open_trades": 5, '
+                                  '"daily_loss_limit": 500, "max_lot_per_symbol": {"XAUUSD": 2, "*": 5}, '
+                                  '"max_spread": {"XAUUSD": 0.5}}')
+
+def route(*rules: RuleSpec) -> SlaveRoute:
+    return SlaveRoute(copy_set_id=None, account_id=uuid.uuid4(), account_name="s", platform="MT5", external_id="1",
+                      prop_firm_id=None, prop_name=None, weekend_trading=True, news_red_block=False,
+                      news_blackout=False, risk_profile_id=None, risk_method=None, risk_percent=None,
+                      fixed_lot=None, max_lot=None, rules=rules)
+
+def inputs(open_trades, daily_loss, symbol_lots, spread) -> RuleInputs:
+    return RuleInputs(*(np.array(c, dtype=float) for c in (open_trades, daily_loss, symbol_lots, spread)))
+
+def test_each_rule_blocks_only_its_slave():
+    routes = tuple(route(PROP) for _ in range(5))
+    blocked = evaluate(rule_table(routes), "xauusd", [0.5] * 5,
+                       inputs([1, 5, 1, 1, 1], [0, 0, 500, 0, 0], [0, 0, 0, 1.8, 0], [0.1, 0.1, 0.1, 0.1, 0.9]))
+    assert sorted(blocked) == [1, 2, 3, 4]
+    assert blocked[1] == "Rule max_open_trades of rule set 'prop': 5 open >= 5"
+    assert blocked[2].startswith("Rule daily_loss_limit of rule set 'prop'")
+    assert blocked[3] == "Rule max_lot_per_symbol of rule set 'prop': 1.8 open + 0.5 > 2 lots on XAUUSD"
+    assert blocked[4] == "Rule max_spread of rule set 'prop': spread 0.9 > 0.5 on XAUUSD"
+
+def test_first_failing_rule_is_reported_and_symbol_rules_are_per_symbol():
+    routes = (route(PROP),)
+    table = rule_table(routes)
+    state = inputs([9], [0], [4.8], [9])
+    assert evaluate(table, "US30", [1], state) == {0: "Rule symbol_whitelist of rule set 'prop': US30 not in whitelist"}
+    assert evaluate(table, "EURUSD", [0.1], state)[0].startswith("Rule max_open_trades")
+    assert evaluate(table, "EURUSD", [0.3], inputs([0], [0], [4.8], [9]))[0].endswith("> 5 lots on EURUSD")  # "*" cap
+
+def test_strictest_of_the_prop_and_account_sets_wins():
+    account = RuleSpec.from_json("account", '{"max_open_trades": 2}')
+    loose = RuleSpec.from_json("loose", '{"max_open_trades": 50}')
+    routes = (route(PROP, account), route(loose))
+    blocked = evaluate(rule_table(routes), "XAUUSD", [0.1, 0.1], inputs([3, 3], [0, 0], [0, 0], [0, 0]))
+    assert blocked == {0: "Rule max_open_trades of rule set 'account': 3 open >= 2"}
+
+def test_unknown_account_state_never_blocks():
+    routes = (route(PROP),)
+    assert evaluate(rule_table(routes), "XAUUSD", [0.1], None) == {}
+    assert evaluate(rule_table(routes), "XAUUSD", None, inputs([np.nan], [np.nan], [np.nan], [np.nan])) == {}
+
+def test_routes_without_rules_skip_evaluation():
+    table = rule_table((route(), route()))
+    assert not table.active and evaluate(table, "XAUUSD", [100, 100], inputs([99, 99], [1e9, 1e9], [0, 0], [9, 9])) == {}
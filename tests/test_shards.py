@@ -0,0 +1,162 @@
+import json, time, uuid
+
+import pytest
+import redis
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from dupli_core.models import Master, TradeIntent
+from worker import jobs, shards
+
+@pytest.fixture
+def r():
+    return fakeredis.FakeRedis()
+
+def entries(r, n: int) -> list[dict]:
+    return [{k.decode(): v.decode() for k, v in fields.items()} for _, fields in r.xrange(shards.shard_stream(n))]
+
+def test_dispatch_appends_every_subjob_once(r):
+    subjobs = [("gw:a", {"orders": [1]}), ("acc:b", {"orders": [2]})]
+    assert shards.dispatch(r, "i1", subjobs)
+    assert not shards.dispatch(r, "i1", subjobs)  # redelivered intent entry
+    sent = [e for n in range(shards.EXEC_SHARDS) for e in entries(r, n)]
+    assert sorted(e["key"] for e in sent) == ["acc:b", "gw:a"]
+    assert int(r.hget(shards.PROGRESS_PREFIX + "i1", "remaining")) == 2
+
+def test_complete_counts_a_rerun_once_and_returns_every_subjob(r):
+    shards.dispatch(r, "i2", [("gw:a", {}), ("gw:b", {})])
+    assert shards.complete(r, "i2", "gw:a", {"orders": 1}) is None
+    assert shards.complete(r, "i2", "gw:a", {"orders": 1}) is None  # re-run by the next owner
+    subs = shards.complete(r, "i2", "gw:b", {"orders": 3})
+    assert sorted(s["orders"] for s in subs) == [1, 3]
+    assert not r.exists(shards.PROGRESS_PREFIX + "i2")
+
+def test_renew_lease_never_shortens_and_needs_the_owner(r):
+    key = shards.lease_key(0)
+    r.set(key, "me", px=60000)
+    assert shards.renew_lease(r, key, "me", 15000)
+    assert r.pttl(key) > 15000
+    assert shards.renew_lease(r, key, "me", 120000) and r.pttl(key) > 60000
+    assert not shards.renew_lease(r, key, "other", 15000)
+
+def run_shard(r, handle, n: int = 0) -> shards.ShardRunner:
+    runner = shards.ShardRunner(r, n, "me", handle)
+    runner.start()
+    return runner
+
+def stop(runner: shards.ShardRunner) -> None:
+    runner.stopping.set()
+    runner.join(5)
+    assert not runner.is_alive()
+
+def add(r, n: int, intent_id: str, key: str) -> None:
+    r.xadd(shards.shard_stream(n), {"intent_id": intent_id, "key": key, "sub": json.dumps({"orders": []})})
+
+def wait_for(cond) -> None:
+    deadline = time.time() + 5
+    while not cond() and time.time() < deadline:
+        time.sleep(0.01)
+    assert cond()
+
+def test_runner_handles_entries_in_order_and_acks_them(r):
+    r.set(shards.lease_key(0), "me", px=15000)
+    for i in range(3):
+        add(r, 0, f"i{i}", "gw:a")
+    seen = []
+    runner = run_shard(r, lambda intent_id, sub: seen.append(intent_id))
+    wait_for(lambda: len(seen) == 3)
+    stop(runner)
+    assert seen == ["i0", "i1", "i2"]
+    assert r.xpending(shards.shard_stream(0), shards.SHARD_GROUP)["pending"] == 0
+
+def test_retry_entry_stays_pending_for_the_next_owner(r):
+    r.set(shards.lease_key(0), "me", px=15000)
+    add(r, 0, "i1", "gw:a")
+    add(r, 0, "i2", "gw:a")
+    seen = []
+
+    def handle(intent_id, sub):
+        seen.append(intent_id)
+        raise shards.RetryEntry("redis down")
+    runner = run_shard(r, handle)
+    runner.join(5)
+    assert not runner.is_alive() and seen == ["i1"]  # stopped before the next entry
+    assert r.xpending(shards.shard_stream(0), shards.SHARD_GROUP)["pending"] == 1
+
+    seen.clear()
+    runner = run_shard(r, lambda intent_id, sub: seen.append(intent_id))  # takeover claims it first
+    wait_for(lambda: len(seen) == 2)
+    stop(runner)
+    assert seen == ["i1", "i2"]
+
+def test_runner_without_the_lease_does_not_process(r):
+    r.set(shards.lease_key(0), "other", px=15000)
+    add(r, 0, "i1", "gw:a")
+    seen = []
+    runner = run_shard(r, lambda intent_id, sub: seen.append(intent_id))
+    runner.join(5)
+    assert not runner.is_alive() and seen == []
+
+def test_manager_hands_over_a_lost_shard_without_waiting(r, monkeypatch):
+    monkeypatch.setattr(shards, "EXEC_SHARDS", 1)
+    manager = shards.ShardManager(r, "me", lambda intent_id, sub: None)
+    manager._tick()
+    runner = manager.runners[0]
+    r.set(shards.lease_key(0), "other", px=15000)  # expired and taken over elsewhere
+    manager._tick()
+    assert manager.retired[0] == (runner, False) and runner.stopping.is_set()
+    runner.join(5)
+    manager._tick()
+    assert not manager.retired and r.get(shards.lease_key(0)) == b"other"
+
+def test_unrecorded_completion_leaves_the_entry_pending(monkeypatch):
+    def down(*args):
+        raise redis.ConnectionError("redis down")
+    monkeypatch.setattr(jobs, "run_fanout", lambda tasks, *args, **kwargs: [])
+    monkeypatch.setattr(jobs, "complete", down)
+    monkeypatch.setattr(jobs, "get_redis", lambda: None)
+    monkeypatch.setattr(jobs.metrics, "defer", lambda *args: None)
+    monkeypatch.setattr(jobs, "get_log_writer", lambda: type("W", (), {"submit": lambda self, rows: None})())
+    monkeypatch.setattr(jobs.time, "sleep", lambda s: None)
+    with pytest.raises(shards.RetryEntry):
+        jobs.execute_shard_job(str(uuid.uuid4()), {"key": "gw:a", "orders": []})
+
+def test_finishing_an_intent_twice_is_harmless(monkeypatch):
+    engine = create_engine("sqlite://")
+    for table in (Master.__table__, TradeIntent.__table__):
+        table.create(engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(jobs, "SessionLocal", Session)
+    events = []
+    monkeypatch.setattr(jobs, "publish_events", events.extend)
+    db = Session()
+    m = Master(id=uuid.uuid4(), name="m", source="telegram")
+    t = TradeIntent(id=uuid.uuid4(), master_id=m.id, symbol="XAUUSD", side="BUY", order_type="MARKET",
+                    status="DISPATCHED")
+    db.add_all([m, t]); db.commit()
+    subs = [{"orders": 2, "first_order": 1.0, "first_ack": 1.1, "last_ack": 1.5}]
+    jobs._finish_intent(str(t.id), subs, t.created_at.isoformat())
+    jobs._finish_intent(str(t.id), subs)  # an entry without created_at: looked up by id alone
+    db.expire_all()
+    assert db.get(TradeIntent, (t.id, t.created_at)).status == "DONE"
+    assert [e["status"] for e in events] == ["DONE"]
+    db.close()
+
+def test_sizing_fallback_note_reaches_the_execution_log(monkeypatch):
+    logged = []
+    monkeypatch.setattr(jobs, "run_fanout", lambda tasks, *args, **kwargs: [
+        jobs.OrderOutcome(task=t, result=jobs.ExecResult(ok=True, message="filled"), started_ms=0.0, latency_ms=1.0)
+        for t in tasks])
+    monkeypatch.setattr(jobs, "complete", lambda *args: None)
+    monkeypatch.setattr(jobs, "get_redis", lambda: None)
+    monkeypatch.setattr(jobs.metrics, "defer", lambda *args: None)
+    monkeypatch.setattr(jobs, "get_log_writer", lambda: type("W", (), {"submit": lambda self, rows: logged.extend(rows)})())
+    order = {"platform": "MT5", "external_id": "1", "payload": {"lot": 0.05}}
+    jobs.execute_shard_job(str(uuid.uuid4()), {"key": "gw:a", "orders": [
+        {**order, "account_id": str(uuid.uuid4()), "note": "risk_per_trade sized as fixed_lot: no entry price in the signal"},
+        {**order, "account_id": str(uuid.uuid4())}]})
+    assert [r["message"] for r in logged] == [
+        "filled (risk_per_trade sized as fixed_lot: no entry price in the signal)", "filled"]
@@ -0,0 +1,39 @@
+import uuid
+
+from telegram_ingest.dedup import RecentSignalIndex, fingerprint
+from telegram_ingest.parser import parse
+
+SIGNAL = parse("XAUUSD SELL ZONE 5187.5-5190 SL 5205 TP1 5170 TP2 5150")
+
+def test_redelivered_message_and_repost_in_the_window_are_duplicates():
+    index = RecentSignalIndex(window_s=600)
+    fp = fingerprint(SIGNAL)
+    assert not index.is_duplicate(-100, 1, fp, now=1000.0)
+    index.add(-100, 1, uuid.uuid4(), SIGNAL, now=1000.0)
+    assert index.is_duplicate(-100, 1, fp, now=1001.0)  # same message again
+    assert index.is_duplicate(-100, 2, fp, now=1500.0)  # repost
+    assert not index.is_duplicate(-100, 3, fp, now=1700.0)  # window over
+    assert not index.is_duplicate(-200, 1, fp, now=1001.0)  # other chat
+    assert index.duplicates == 2
+
+def test_followups_do_not_hide_a_later_identical_signal():
+    index = RecentSignalIndex()
+    index.add(-100, 5, uuid.uuid4(), SIGNAL, now=1000.0, remember_content=False)
+    assert not index.is_duplicate(-100, 6, fingerprint(SIGNAL), now=1001.0)
+
+def test_edit_updates_the_content_the_next_edit_compares_against():
+    index = RecentSignalIndex()
+    entry = index.add(-100, 1, uuid.uuid4(), SIGNAL, now=1000.0)
+    edited = parse("XAUUSD SELL ZONE 5187.5-5190 SL 5210 TP1 5170 TP2 5150")
+    index.update(-100, entry, edited, now=1010.0)
+    assert index.get(-100, 1).signal == edited
+    assert index.is_duplicate(-100, 9, fingerprint(edited), now=1020.0)
+
+def test_index_is_bounded_and_evicts_the_least_recently_used():
+    index = RecentSignalIndex(max_entries=2)
+    for message_id in (1, 2):
+        index.add(-100, message_id, uuid.uuid4(), SIGNAL, now=1000.0)
+    index.get(-100, 1)  # touch: 2 is now the oldest
+    index.add(-100, 3, uuid.uuid4(), SIGNAL, now=1000.0)
+    assert len(index) == 2
+    assert index.get(-100, 2) is None and index.get(-100, 1) is not None
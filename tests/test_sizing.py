@@ -0,0 +1,67 @@
+import uuid
+
+import numpy as np
+
+from worker.routing import SlaveRoute
+from worker.sizing import fallback_reasons, reference_price, risk_table, size_lots
+
+def route(method="risk_per_trade", risk=1.0, fixed=0.05, max_lot=None, profile=True) -> SlaveRoute:
+    return SlaveRoute(copy_set_id=None, account_id=uuid.uuid4(), account_name="s", platform="MT5", external_id="1",
+                      prop_firm_id=None, prop_name=None, weekend_trading=True, news_red_block=False,
+                      news_blackout=False, risk_profile_id=uuid.uuid4() if profile else None, risk_method=method,
+                      risk_percent=risk, fixed_lot=fixed, max_lot=max_lot)
+
+def lots(routes, equity, entry=2000.0, sl=1990.0, symbol="XAUUSD") -> list:
+    # XAUUSD: 100 oz per lot, so a 10-point SL risks 1000 per lot
+    return size_lots(risk_table(tuple(routes)), symbol, entry, sl, np.array(equity, dtype=float)).tolist()
+
+def test_each_method_in_one_pass():
+    routes = [route("risk_per_trade", 1.0), route("percent_equity", 2.0), route("fixed_lot", fixed=0.3)]
+    assert lots(routes, [10000, 1000000, 10000]) == [0.1, 0.1, 0.3]
+
+def test_lots_are_floored_to_the_step_capped_and_zeroed_below_min_lot():
+    routes = [route(risk=1.55), route(risk=10.0, max_lot=5.0), route(risk=0.001)]
+    assert lots(routes, [10000, 100000, 10000]) == [0.15, 5.0, 0.0]
+
+def test_missing_equity_or_sl_falls_back_to_fixed_lot():
+    assert lots([route(fixed=0.05)], [np.nan]) == [0.05]
+    assert lots([route(fixed=0.05)], [10000], sl=None) == [0.05]
+    assert lots([route(fixed=0.05)], [10000], sl=2000.0) == [0.05]  # zero distance
+
+def test_slave_without_risk_profile_gets_no_lot():
+    assert np.isnan(lots([route(profile=False)], [10000])[0])
+
+def test_table_is_built_once_per_routes_tuple():
+    routes = (route(), route("fixed_lot"))
+    assert risk_table(routes) is risk_table(routes)
+    assert risk_table(routes[:1] + routes[1:]) is not risk_table(routes)
+
+def test_reference_price_uses_the_zone_middle_without_an_entry():
+    assert reference_price(None, 2000.0, 2010.0) == 2005.0
+    assert reference_price(1999.0, 2000.0, 2010.0) == 1999.0
+    assert reference_price(None, None, 2010.0) is None
+
+def test_market_signal_without_a_price_reports_the_fixed_lot_fallback():
+    from telegram_ingest.parser import parse
+    ps = parse("XAUUSD BUY NOW\nSL 2342.2")
+    assert ps is not None and ps.entry is None
+    routes = (route("risk_per_trade"), route("percent_equity"), route("fixed_lot"), route(profile=False))
+    table = risk_table(routes)
+    equity = np.array([10000.0] * 4)
+    ref = reference_price(ps.entry, ps.zone_low, ps.zone_high)
+    assert lots(routes, equity, entry=ref, sl=ps.sl)[:3] == [0.05, 0.05, 0.05]
+    assert fallback_reasons(table, ref, ps.sl, equity) == {
+        0: "risk_per_trade sized as fixed_lot: no entry price in the signal",
+        1: "percent_equity sized as fixed_lot: no entry price in the signal"}
+
+def test_fallback_reasons_name_the_missing_input():
+    routes = (route("risk_per_trade"), route("risk_per_trade"), route("percent_equity", risk=None))
+    table = risk_table(routes)
+    assert fallback_reasons(table, 2000.0, None, np.array([np.nan, 10000.0, 10000.0])) == {
+        0: "risk_per_trade sized as fixed_lot: no SL distance",
+        1: "risk_per_trade sized as fixed_lot: no SL distance",
+        2: "percent_equity sized as fixed_lot: no risk %"}
+    assert fallback_reasons(table, 2000.0, 1990.0, np.array([np.nan, 10000.0, 10000.0]))[0].endswith(
+        "no live equity for the account")
+    assert fallback_reasons(table, 2000.0, 1990.0, np.array([10000.0] * 3)) == {
+        2: "percent_equity sized as fixed_lot: no risk %"}
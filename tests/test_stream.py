@@ -0,0 +1,93 @@
+import asyncio, socket, threading, time
+from collections import Counter, OrderedDict
+from itertools import count
+
+import pytest
+
+from mt5_gateway import orders, stream as gw_stream
+from worker import stream
+from worker.stream import GatewayStream
+
+@pytest.fixture
+def hub(monkeypatch):
+    monkeypatch.setattr(orders, "_recent", OrderedDict())
+    hub = gw_stream.StreamHub()
+    hub.fills = Counter()  # orders that reached the EA bridge, per idempotency key
+    remember = orders._remember
+
+    def dispatched(key, reply):
+        hub.fills[key] += 1
+        remember(key, reply)
+    monkeypatch.setattr(orders, "_remember", dispatched)
+    started = threading.Event()
+
+    async def serve():
+        hub.loop = asyncio.get_running_loop()
+        hub.server = await asyncio.start_server(hub.handle, "127.0.0.1", 0)
+        hub.port = hub.server.sockets[0].getsockname()[1]
+        started.set()
+        await hub.server.serve_forever()
+    threading.Thread(target=lambda: asyncio.run(serve()), daemon=True).start()
+    assert started.wait(5)
+    yield hub
+    hub.loop.call_soon_threadsafe(hub.server.close)
+
+def drop(hub):
+    """Cut every CORE connection from the gateway side, as a network blip would."""
+    for s in hub.sessions.values():
+        if s.writer is not None:
+            s.writer.transport.abort()
+
+def wait_for(cond) -> None:
+    deadline = time.time() + 5
+    while not cond() and time.time() < deadline:
+        time.sleep(0.01)
+    assert cond()
+
+def test_hello_resumes_the_session_and_replays_after_last_seq(hub):
+    def hello(session, last_seq):
+        sock = socket.create_connection(("127.0.0.1", hub.port), timeout=5)
+        f = sock.makefile("rb")
+        sock.sendall(stream.encode({"t": "hello", "session": session, "last_seq": last_seq}))
+        return sock, f, stream.read_frame(f)
+
+    sock, f, welcome = hello("s1", 0)
+    assert welcome["t"] == "welcome" and not welcome["resumed"]
+    f.close(); sock.close()
+    wait_for(lambda: hub.sessions["s1"].writer is None)
+    hub.loop.call_soon_threadsafe(lambda: [hub.sessions["s1"].emit({"t": "fill", "n": n}) for n in range(3)])
+    wait_for(lambda: hub.sessions["s1"].seq == 3)
+
+    sock, f, welcome = hello("s1", 1)
+    assert welcome["resumed"] and welcome["seq"] == 3
+    assert [stream.read_frame(f)["seq"] for _ in range(2)] == [2, 3]  # missed while disconnected
+    f.close(); sock.close()
+
+def test_dropped_connection_mid_batch_acks_every_order_once(hub, monkeypatch):
+    calls = count(1)
+    place = gw_stream.place
+
+    def place_and_drop(account_external_id, intent, key):
+        if next(calls) == 5:
+            hub.loop.call_soon_threadsafe(drop, hub)
+            time.sleep(0.05)  # the ack is emitted while the connection is down
+        return place(account_external_id, intent, key)
+    monkeypatch.setattr(gw_stream, "place", place_and_drop)
+    events = []
+    client = GatewayStream("127.0.0.1", hub.port, on_event=events.append)
+    try:
+        keys = [f"i{n}:1001" for n in range(20)]
+        acks = client.send_many([("1001", {"id": k}, k) for k in keys], timeout=5)
+        assert [a and a["key"] for a in acks] == keys and all(a["ok"] for a in acks)
+        assert client.reconnects >= 1 and len(hub.sessions) == 1  # resumed, not a new session
+        # resends of already placed orders were answered from the idempotency cache
+        assert hub.fills == Counter(keys)
+
+        hub.publish({"t": "fill", "key": keys[0]})
+        wait_for(lambda: events)
+        assert [(e["t"], e["key"]) for e in events] == [("fill", keys[0])]
+        assert client._thread.is_alive() and not client._pending
+    finally:
+        client.close()
+    client._thread.join(5)
+    assert not client._thread.is_alive()
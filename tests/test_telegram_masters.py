@@ -0,0 +1,107 @@
+import time, uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from dupli_core.models import Master, TelegramChannel
+from telegram_ingest.channels import load_channel_masters
+from telegram_ingest import masters
+from telegram_ingest.masters import MASTERS_CHANNEL, MasterCache
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    for table in (Master.__table__, TelegramChannel.__table__):
+        table.create(engine)
+    s = sessionmaker(bind=engine)()
+    yield s
+    s.close()
+
+def master(db, name, active=True, age_days=0, source="telegram"):
+    m = Master(id=uuid.uuid4(), name=name, source=source, is_active=active, created_at=T0 - timedelta(days=age_days))
+    db.add(m)
+    return m
+
+def channel(db, chat_id, m):
+    db.add(TelegramChannel(id=uuid.uuid4(), chat_id=chat_id, session_name="default", master_id=m.id if m else None,
+                           is_active=True))
+
+def cache(db):
+    return MasterCache(lambda: db, loader=load_channel_masters, ttl_s=60)
+
+def test_default_master_is_the_oldest_active_telegram_master(db):
+    master(db, "newer", age_days=1)
+    master(db, "oldest", age_days=5)
+    master(db, "inactive", active=False, age_days=9)
+    master(db, "manual", age_days=9, source="manual")
+    db.commit()
+    assert cache(db).get(-100).name == "oldest"
+
+def test_chat_with_inactive_master_is_not_routed_to_the_default(db):
+    master(db, "default", age_days=5)
+    a = master(db, "channel-a")
+    off = master(db, "channel-b", active=False)
+    channel(db, -1, a)
+    channel(db, -2, off)
+    channel(db, -3, None)  # no own master: the default takes it
+    db.commit()
+    c = cache(db)
+    assert c.get(-1).name == "channel-a"
+    assert c.get(-2) is None
+    assert c.get(-3).name == "default"
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(masters, "time", clock)
+    return clock
+
+def test_master_is_reloaded_once_the_ttl_runs_out(db, clock):
+    m = master(db, "default")
+    db.commit()
+    c = cache(db)
+    assert c.get(-1).name == "default"
+    db.get(Master, m.id).is_active = False  # the cache closed the session: m is detached
+    db.commit()
+    clock.now += 59
+    assert c.get(-1).name == "default"  # still cached: a lost invalidation costs at most the TTL
+    clock.now += 1
+    assert c.get(-1) is None
+
+def test_change_notification_invalidates_the_cache(db, clock):
+    m = master(db, "default")
+    db.commit()
+    c = cache(db)
+    assert c.get(-1).name == "default"
+    db.get(Master, m.id).name = "renamed"
+    db.commit()
+    c._on_message({"type": "message", "channel": MASTERS_CHANNEL.encode(), "data": str(m.id).encode()})
+    assert c.get(-1).name == "renamed"
+
+def test_listen_subscribes_to_the_masters_channel(db, monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    r = fakeredis.FakeRedis()
+    monkeypatch.setattr(masters.redis, "from_url", lambda url: r)
+    invalidated = []
+    c = cache(db)
+    monkeypatch.setattr(c, "invalidate", lambda: invalidated.append(True))
+    c.listen("redis://fake")
+    try:
+        deadline = time.time() + 5
+        while not invalidated and time.time() < deadline:
+            r.publish(MASTERS_CHANNEL, str(uuid.uuid4()))  # what app/notify.py sends
+            time.sleep(0.05)
+        assert invalidated
+    finally:
+        c._pubsub_thread.stop()
@@ -0,0 +1,111 @@
+import json
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from dupli_core.trading_windows import TradingCalendar, _merge
+
+CALENDAR = {
+    "timezone": "Europe/Rome",
+    "holidays": ["2026-12-25"],
+    "news": [{"start": "2026-03-04T13:30:00Z", "title": "US NFP", "impact": "red"},
+             {"start": "2026-03-04T15:00:00Z", "title": "Speech", "impact": "orange"},
+             {"start": "2026-03-07T09:00:00Z", "end": "2026-03-07T10:00:00Z", "title": "G7", "impact": "red"}],
+    "news_buffer_min": 5,
+    "sessions": {"Split": [{"days": [0, 1, 2, 3, 4], "start": "01:05", "end": "12:00"},
+                           {"days": [0, 1, 2, 3, 4], "start": "13:00", "end": "23:50"}],
+                 "Overlap": [{"days": [2], "start": "00:00", "end": "14:00"},
+                             {"days": [2], "start": "10:00", "end": "23:59"}]},
+}
+
+@pytest.fixture
+def cal(tmp_path):
+    path = tmp_path / "trading_calendar.json"
+    path.write_text(json.dumps(CALENDAR))
+    return TradingCalendar(str(path))
+
+def utc(*args) -> float:
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+def blocked(cal, t: float, prop="Any", weekend_trading=False, news_blackout=False):
+    return cal.windows(prop, weekend_trading, news_blackout, t).blocked(t)
+
+@pytest.mark.parametrize("open_at, closed_at", [
+    # winter (CET, UTC+1): Saturday 00:00 Rome is Friday 23:00 UTC
+    (utc(2026, 3, 6, 22, 59, 59), utc(2026, 3, 6, 23)),
+    # weekend of the spring change: closes in CET, reopens Monday 00:00 CEST (UTC+2)
+    (utc(2026, 3, 27, 22, 59, 59), utc(2026, 3, 27, 23)),
+    # weekend of the autumn change: closes in CEST, reopens Monday 00:00 CET
+    (utc(2026, 10, 23, 21, 59, 59), utc(2026, 10, 23, 22)),
+])
+def test_friday_close_in_rome_time(cal, open_at, closed_at):
+    assert blocked(cal, open_at) is None
+    assert blocked(cal, closed_at) == "Weekend"
+
+@pytest.mark.parametrize("closed_at, open_at", [
+    (utc(2026, 3, 8, 22, 59, 59), utc(2026, 3, 8, 23)),
+    (utc(2026, 3, 29, 21, 59, 59), utc(2026, 3, 29, 22)),  # clocks went forward on Sunday
+    (utc(2026, 10, 25, 22, 59, 59), utc(2026, 10, 25, 23)),  # clocks went back on Sunday
+])
+def test_sunday_open_in_rome_time(cal, closed_at, open_at):
+    assert blocked(cal, closed_at) == "Weekend"
+    assert blocked(cal, open_at) is None
+
+def test_weekend_trading_props_ignore_weekends_and_holidays(cal):
+    assert blocked(cal, utc(2026, 3, 7, 12), weekend_trading=True) is None
+    assert blocked(cal, utc(2026, 12, 25, 12), weekend_trading=True) is None
+
+def test_holiday_is_the_whole_rome_day(cal):
+    assert blocked(cal, utc(2026, 12, 24, 22, 59)) is None
+    assert blocked(cal, utc(2026, 12, 24, 23)) == "Holiday 2026-12-25"
+    assert blocked(cal, utc(2026, 12, 25, 22, 59)) == "Holiday 2026-12-25"
+
+def test_session_gap_and_out_of_hours(cal):
+    # Wednesday 4 March, CET: sessions 01:05-12:00 and 13:00-23:50 local
+    assert blocked(cal, utc(2026, 3, 4, 10, 59), "Split") is None
+    assert blocked(cal, utc(2026, 3, 4, 11, 0), "Split") == "Outside session hours"
+    assert blocked(cal, utc(2026, 3, 4, 11, 59), "Split") == "Outside session hours"
+    assert blocked(cal, utc(2026, 3, 4, 12, 0), "Split") is None
+    assert blocked(cal, utc(2026, 3, 4, 0, 0), "Split") == "Outside session hours"  # 01:00 local
+    assert blocked(cal, utc(2026, 3, 4, 0, 5), "Split") is None
+    assert blocked(cal, utc(2026, 3, 4, 22, 50), "Split") == "Outside session hours"  # 23:50 local
+
+def test_red_news_blocks_with_buffers(cal):
+    assert blocked(cal, utc(2026, 3, 4, 13, 24, 59), news_blackout=True) is None
+    assert blocked(cal, utc(2026, 3, 4, 13, 25), news_blackout=True) == "Red news: US NFP"
+    assert blocked(cal, utc(2026, 3, 4, 13, 34, 59), news_blackout=True) == "Red news: US NFP"
+    assert blocked(cal, utc(2026, 3, 4, 13, 35), news_blackout=True) is None
+    assert blocked(cal, utc(2026, 3, 4, 15), news_blackout=True) is None  # not red
+    assert blocked(cal, utc(2026, 3, 4, 13, 30)) is None  # prop without news blackout
+
+def test_overlapping_intervals_are_merged(cal):
+    # G7 (09:00-10:00 UTC +/- 5 min) falls inside Saturday: one interval, both reasons
+    t = utc(2026, 3, 7, 9, 30)
+    w = cal.windows("Any", False, True, t)
+    i = w.starts.index(utc(2026, 3, 6, 23))
+    assert w.ends[i] == utc(2026, 3, 7, 23) and w.reasons[i] == "Weekend; Red news: G7"
+    assert all(e <= s for e, s in zip(w.ends, w.starts[1:]))
+    # overlapping sessions leave no gap on their day
+    assert blocked(cal, utc(2026, 3, 4, 12, 30), "Overlap", weekend_trading=True) is None
+    assert _merge([(0, 10, "a"), (5, 20, "b"), (20, 30, "a")]) == [[0, 20, "a; b"], [20, 30, "a"]]
+
+def test_windows_are_rebuilt_once_the_horizon_runs_out(cal):
+    t = utc(2026, 3, 4, 12)
+    w = cal.windows("Any", False, False, t)
+    assert cal.windows("Any", False, False, t + 3600) is w
+    saturday = utc(2026, 3, 21, 12)  # past the first horizon
+    assert w.valid_until < saturday and w.blocked(saturday) is None
+    rebuilt = cal.windows("Any", False, False, saturday)
+    assert rebuilt is not w and rebuilt.valid_from <= saturday < rebuilt.valid_until
+    assert rebuilt.blocked(saturday) == "Weekend"
+
+def test_blocked_props_checks_each_prop_once(cal):
+    prop = dict(prop_firm_id=1, prop_name="Any", weekend_trading=False, news_blackout=False, news_red_block=False)
+    routes = [SimpleNamespace(**prop), SimpleNamespace(**prop),
+              SimpleNamespace(**{**prop, "prop_firm_id": 2, "weekend_trading": True}),
+              SimpleNamespace(**{**prop, "prop_firm_id": 3, "news_red_block": True})]
+    saturday = datetime(2026, 3, 7, 12, tzinfo=timezone.utc)
+    assert cal.blocked_props(routes, saturday) == {1: "Weekend blocked by prop 'Any'",
+                                                   3: "NEWS_RED block active for prop 'Any'"}
+    assert cal.blocked_props(routes, saturday + timedelta(days=2)) == {3: "NEWS_RED block active for prop 'Any'"}
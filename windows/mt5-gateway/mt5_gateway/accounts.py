@@ -0,0 +1,22 @@
+from threading import Lock
+import time
+
+# Latest equity / balance / free margin / open positions / spreads per login, pushed by the
+# EA bridge. Served to CORE on GET /v1/accounts (its periodic refresh) and pushed on
+# the order stream as {"t": "account", ...} events as soon as they arrive.
+_states: dict = {}
+_lock = Lock()
+
+def update(account_external_id, state: dict) -> dict:
+    acc = {"account_external_id": str(account_external_id),
+           "equity": state.get("equity"), "balance": state.get("balance"),
+           "free_margin": state.get("free_margin"), "positions": state.get("positions") or [],
+           "day_start_equity": state.get("day_start_equity"), "spreads": state.get("spreads") or {},
+           "ts": state.get("ts") or time.time()}
+    with _lock:
+        _states[acc["account_external_id"]] = acc
+    return acc
+
+def snapshot() -> list:
+    with _lock:
+        return list(_states.values())
@@ -1,15 +1,47 @@
 from flask import Flask, request, jsonify
 from waitress import serve
 import os, time
+from .orders import place
+from . import accounts
+from .stream import hub
 
 app = Flask(__name__)
 
 @app.post("/v1/orders")
 def orders():
     body = request.get_json(force=True, silent=False)
-    # v0.1: just acknowledge. Replace with dispatch to EA bridge.
-    return jsonify({"ok": True, "received": body, "ts": time.time()})
+    return jsonify(place(body.get("account_external_id"), body.get("intent"), request.headers.get("Idempotency-Key")))
+
+@app.post("/v1/orders:batch")
+def orders_batch():
+    # Orders for many accounts in one round trip; results keep the request order.
+    body = request.get_json(force=True, silent=False)
+    results = []
+    for o in body.get("orders") or []:
+        try:
+            reply = place(o.get("account_external_id"), o.get("intent"), o.get("idempotency_key"))
+        except Exception as e:
+            reply = {"ok": False, "error": str(e)}
+        results.append({"account_external_id": o.get("account_external_id"), **reply})
+    return jsonify({"ok": True, "results": results, "ts": time.time()})
+
+@app.post("/v1/accounts/state")
+def account_state():
+    # EA bridge -> gateway: equity/margin/positions of one login; forwarded to CORE
+    body = request.get_json(force=True, silent=False)
+    acc = accounts.update(body.get("account_external_id"), body)
+    hub.publish({"t": "account", **acc})
+    return jsonify({"ok": True})
+
+@app.get("/v1/accounts")
+def accounts_list():
+    return jsonify({"accounts": accounts.snapshot(), "ts": time.time()})
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", "8090"))
-    serve(app, host="0.0.0.0", port=port)
+    stream_port = int(os.getenv("STREAM_PORT", "0"))
+    if stream_port:
+        from .stream import serve_in_thread
+        serve_in_thread("0.0.0.0", stream_port)
+    # keep-alive sockets from CORE's pooled client each hold a waitress channel
+    serve(app, host="0.0.0.0", port=port, threads=int(os.getenv("THREADS", "16")))
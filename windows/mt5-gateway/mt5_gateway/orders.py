@@ -0,0 +1,55 @@
+from collections import OrderedDict
+from threading import Event, Lock
+import os, time
+
+# CORE retries POSTs on dropped connections / 5xx and resends unacked orders after
+# a stream reconnect; replies are remembered per idempotency key so a resend never
+# reaches the EA bridge twice. Shared by the HTTP endpoints and the stream channel.
+# A key is reserved before dispatch: a concurrent request with the same key (HTTP
+# retry racing a stream resend, duplicate batch item) waits for the first reply.
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+_recent: "OrderedDict[str, dict]" = OrderedDict()
+_inflight: dict = {}  # key -> Event, set once the first request for it has finished
+_recent_lock = Lock()
+
+def _reserve(key):
+    """(remembered reply, None) or (None, Event to wait on) or (None, None) when reserved by us."""
+    with _recent_lock:
+        prev = _recent.get(key)
+        if prev is not None:
+            return prev, None
+        ev = _inflight.get(key)
+        if ev is None:
+            _inflight[key] = Event()
+        return None, ev
+
+def _remember(key, reply):
+    if not key:
+        return
+    with _recent_lock:
+        _recent[key] = reply
+        while len(_recent) > IDEMPOTENCY_CACHE_SIZE:
+            _recent.popitem(last=False)
+
+def _release(key):
+    with _recent_lock:
+        ev = _inflight.pop(key, None)
+    if ev is not None:
+        ev.set()
+
+def place(account_external_id, intent, key):
+    while key:
+        prev, ev = _reserve(key)
+        if prev is not None:
+            return prev
+        if ev is None:
+            break
+        ev.wait()  # then the reply is remembered, or the first attempt failed and we retry
+    try:
+        # v0.1: just acknowledge. Replace with dispatch to EA bridge.
+        reply = {"ok": True, "received": {"account_external_id": account_external_id, "intent": intent}, "ts": time.time()}
+        _remember(key, reply)
+        return reply
+    finally:
+        if key:
+            _release(key)
@@ -0,0 +1,124 @@
+"""Persistent order/event channel between CORE and the gateway.
+
+Framing: 4-byte big-endian length + compact JSON object. CORE opens one TCP
+connection per gateway and says {"t":"hello","session":..,"last_seq":..};
+the gateway answers {"t":"welcome","resumed":..} and replays every event of
+that session with seq > last_seq, so a reconnect resumes without losing acks, fills or
+position updates. Orders ({"t":"order","cid":..,"key":..}) are acked with
+{"t":"ack","cid":..}; the EA bridge pushes fills/positions through publish().
+
+Run standalone as a local stand-in gateway:  py -m mt5_gateway.stream
+"""
+import asyncio, json, os, struct, threading, time, uuid
+from collections import deque
+from .orders import place
+
+HEADER = struct.Struct("!I")
+MAX_FRAME = 1 << 20
+STREAM_REPLAY_BUFFER = int(os.getenv("STREAM_REPLAY_BUFFER", "10000"))
+STREAM_SESSION_TTL_S = float(os.getenv("STREAM_SESSION_TTL_S", "3600"))
+
+def encode(msg: dict) -> bytes:
+    data = json.dumps(msg, separators=(",", ":")).encode()
+    return HEADER.pack(len(data)) + data
+
+async def read_frame(reader: asyncio.StreamReader) -> dict:
+    (n,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if n > MAX_FRAME:
+        raise ValueError(f"frame too large: {n}")
+    return json.loads(await reader.readexactly(n))
+
+class Session:
+    def __init__(self, sid: str):
+        self.sid = sid
+        self.seq = 0
+        self.buffer: deque = deque(maxlen=STREAM_REPLAY_BUFFER)
+        self.writer = None
+        self.last_seen = time.monotonic()
+
+    def emit(self, msg: dict) -> None:
+        self.seq += 1
+        msg["seq"] = self.seq
+        self.buffer.append(msg)
+        if self.writer is not None:
+            self.writer.write(encode(msg))
+
+class StreamHub:
+    def __init__(self):
+        self.sessions: dict[str, Session] = {}
+        self.loop = None
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for sid, s in list(self.sessions.items()):
+            if s.writer is None and now - s.last_seen > STREAM_SESSION_TTL_S:
+                del self.sessions[sid]
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        sess = None
+        try:
+            hello = await read_frame(reader)
+            if hello.get("t") != "hello":
+                return
+            self._expire()
+            sid = hello.get("session") or uuid.uuid4().hex
+            resumed = sid in self.sessions
+            sess = self.sessions.get(sid) or self.sessions.setdefault(sid, Session(sid))
+            if sess.writer is not None:
+                sess.writer.close()  # a reconnect replaces the stale connection
+            sess.writer = writer
+            last = int(hello.get("last_seq") or 0)
+            writer.write(encode({"t": "welcome", "session": sid, "seq": sess.seq, "resumed": resumed}))
+            for m in sess.buffer:
+                if m["seq"] > last:
+                    writer.write(encode(m))
+            await writer.drain()
+
+            loop = asyncio.get_running_loop()
+            while True:
+                msg = await read_frame(reader)
+                t = msg.get("t")
+                if t == "order":
+                    asyncio.ensure_future(self._order(loop, sess, msg))
+                elif t == "ping":
+                    writer.write(encode({"t": "pong", "ts": time.time()}))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            if sess is not None and sess.writer is writer:
+                sess.writer = None
+                sess.last_seen = time.monotonic()
+            writer.close()
+
+    async def _order(self, loop, sess: Session, msg: dict) -> None:
+        try:
+            reply = await loop.run_in_executor(None, place, msg.get("account_external_id"), msg.get("intent"), msg.get("key"))
+            ack = {"t": "ack", "cid": msg.get("cid"), "key": msg.get("key"), "ok": bool(reply.get("ok")), "ts": reply.get("ts")}
+        except Exception as e:
+            ack = {"t": "ack", "cid": msg.get("cid"), "key": msg.get("key"), "ok": False, "error": str(e)}
+        sess.emit(ack)
+
+    def publish(self, msg: dict) -> None:
+        """Push an event (fill, position, account state) to every CORE session. Thread-safe."""
+        def _emit():
+            for s in self.sessions.values():
+                s.emit(dict(msg))
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(_emit)
+
+hub = StreamHub()
+
+async def serve(host: str, port: int) -> None:
+    hub.loop = asyncio.get_running_loop()
+    server = await asyncio.start_server(hub.handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+def serve_in_thread(host: str, port: int) -> threading.Thread:
+    th = threading.Thread(target=lambda: asyncio.run(serve(host, port)), name="order-stream", daemon=True)
+    th.start()
+    return th
+
+if __name__ == "__main__":
+    asyncio.run(serve("0.0.0.0", int(os.getenv("STREAM_PORT", "8091"))))